@@ -78,6 +78,7 @@ class SpeechASR extends EventEmitter {
     this.activeOptions = this.options;
     this.child = null;
     this.stdoutBuffer = '';
+    this.partialText = '';
     this.manualMode = false;
     this.controlled = false;
   }
@@ -137,6 +138,7 @@ class SpeechASR extends EventEmitter {
     }
 
     this.stdoutBuffer = '';
+    this.partialText = '';
     this._emitEvent('two-pass-start', { type: 'log', message: 'Starting two-pass ASR session' });
 
     this.child.stdout.on('data', (data) => this._handleStdout(data));
@@ -210,6 +212,7 @@ class SpeechASR extends EventEmitter {
     }
 
     this.stdoutBuffer = '';
+    this.partialText = '';
     this._emitEvent('two-pass-start', { type: 'log', message: '启动按键录音模式（仅二次识别）' });
 
     this.child.stdout.on('data', (data) => this._handleStdout(data));
@@ -458,7 +461,23 @@ class SpeechASR extends EventEmitter {
         this._emitEvent('ready', payload);
         break;
       case 'first-pass':
-        this._emitEvent('partial', { type: 'first-pass', text: payload.text || '' });
+        if (typeof payload.keep === 'number') {
+          // --partial-mode diff: keep the first `keep` characters, append the suffix.
+          // Python counts code points, so slice by code point rather than UTF-16 unit.
+          this.partialText = Array.from(this.partialText).slice(0, payload.keep).join('') + (payload.text || '');
+          this._emitEvent('partial', {
+            type: 'first-pass',
+            text: this.partialText,
+            keep: payload.keep,
+            append: payload.text || '',
+            tokenIndex: payload.token_index,
+            tokens: payload.tokens || [],
+            timestamps: payload.timestamps || []
+          });
+        } else {
+          this.partialText = payload.text || '';
+          this._emitEvent('partial', { type: 'first-pass', text: this.partialText });
+        }
         break;
       case 'result':
         this._emitEvent('two-pass-result', payload);
@@ -608,6 +627,12 @@ class SpeechASR extends EventEmitter {
     if (runtime.tailPadding) {
       args.push('--tail-padding', String(runtime.tailPadding));
     }
+    if (runtime.partialMode) {
+      args.push('--partial-mode', runtime.partialMode);
+    }
+    if (runtime.partialMaxRate) {
+      args.push('--partial-max-rate', String(runtime.partialMaxRate));
+    }
     if (runtime.device) {
       args.push('--device', runtime.device);
     }
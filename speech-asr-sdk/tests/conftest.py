@@ -0,0 +1,134 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import wave
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+SDK_DIR = Path(__file__).resolve().parent.parent
+SCRIPT = SDK_DIR / "two_pass_microphone_asr_electron.py"
+FAKES_DIR = Path(__file__).resolve().parent / "fakes"
+
+sys.path.insert(0, str(SDK_DIR))
+try:
+    import sherpa_onnx  # noqa: F401  pylint: disable=unused-import
+
+    USING_FAKES = False
+except ImportError:
+    sys.path.insert(0, str(FAKES_DIR))
+    USING_FAKES = True
+
+import two_pass_microphone_asr_electron as asr_module  # noqa: E402  pylint: disable=wrong-import-position
+
+
+@pytest.fixture
+def asr():
+    return asr_module
+
+
+@pytest.fixture
+def events(monkeypatch):
+    """Capture emit() payloads instead of writing NDJSON to stdout."""
+    captured = []
+    monkeypatch.setattr(asr_module, "emit", lambda payload, level="info": captured.append(payload))
+    return captured
+
+
+def write_wav(path: Path, samples: np.ndarray, sample_rate: int = 16000) -> Path:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return path
+
+
+def speech_like(seconds: float, sample_rate: int = 16000, amplitude: float = 0.3, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (amplitude * rng.standard_normal(int(seconds * sample_rate))).astype(np.float32)
+
+
+def silence(seconds: float, sample_rate: int = 16000, amplitude: float = 0.001, seed: int = 1) -> np.ndarray:
+    return speech_like(seconds, sample_rate, amplitude, seed)
+
+
+@pytest.fixture
+def model_args(tmp_path):
+    """Command-line model arguments pointing at empty placeholder files."""
+    models = tmp_path / "models"
+    models.mkdir()
+    for name in ("encoder.onnx", "decoder.onnx", "joiner.onnx", "sense_voice.onnx", "tokens.txt", "silero_vad.onnx"):
+        (models / name).write_bytes(b"")
+    return [
+        "--first-encoder", str(models / "encoder.onnx"),
+        "--first-decoder", str(models / "decoder.onnx"),
+        "--first-joiner", str(models / "joiner.onnx"),
+        "--first-tokens", str(models / "tokens.txt"),
+        "--second-model", str(models / "sense_voice.onnx"),
+        "--second-tokens", str(models / "tokens.txt"),
+        "--silero-vad-model", str(models / "silero_vad.onnx"),
+    ]
+
+
+@pytest.fixture
+def make_args(model_args, monkeypatch):
+    """Parse a command line the way main() does, with the placeholder models filled in."""
+
+    def make(*argv):
+        monkeypatch.setattr(sys, "argv", [str(SCRIPT), *model_args, *argv])
+        return asr_module.get_args()
+
+    return make
+
+
+@pytest.fixture
+def run_asr(model_args):
+    """Run the helper as Electron does and return its parsed NDJSON events."""
+
+    def run(*args, env=None, commands="", audio=None, timeout=120):
+        """Write `commands` (text) or raw `audio` bytes to stdin.
+
+        Stdin stays open, as it does under Electron, until the process exits;
+        with `audio` it is closed right away so the PCM source sees EOF.
+        """
+        full_env = dict(os.environ)
+        if USING_FAKES:
+            full_env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(FAKES_DIR), full_env.get("PYTHONPATH", "")]))
+        full_env.update(env or {})
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as stderr:
+            proc = subprocess.Popen(
+                [sys.executable, str(SCRIPT), *model_args, *args],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=stderr,
+                env=full_env,
+            )
+            try:
+                if audio is not None:
+                    proc.stdin.write(audio)
+                    proc.stdin.close()
+                elif commands:
+                    proc.stdin.write(commands.encode("utf-8"))
+                    proc.stdin.flush()
+                timer = threading.Timer(timeout, proc.kill)
+                timer.start()
+                try:
+                    output = proc.stdout.read().decode("utf-8")
+                finally:
+                    timer.cancel()
+            finally:
+                proc.stdin.close()
+                returncode = proc.wait()
+            stderr.seek(0)
+            errors = stderr.read()
+        assert "Traceback" not in errors, errors
+        parsed = [json.loads(line) for line in output.splitlines() if line.startswith("{")]
+        return returncode, parsed
+
+    return run
@@ -0,0 +1,207 @@
+"""Minimal stand-in for sherpa_onnx so the helper can run without the models.
+
+Only the calls two_pass_microphone_asr_electron.py makes are implemented:
+- The "streaming" recognizer produces one "HELLO" token per second of voiced
+  audio (blocks with a mean |x| above 0.01) fed, timed from the first voiced
+  block, and reports an endpoint after two seconds of any audio.
+- The offline recognizer returns "seg<n>" for n samples, with one token per
+  0.1 s.
+- The VAD treats 512-sample windows with a mean |x| above 0.01 as speech.
+  It closes a segment after 0.5 s of silence.
+
+Environment knobs used by the tests:
+  FAKE_DECODE_SLEEP    seconds slept per first-pass decode_stream() call
+  FAKE_VAD_FAIL_UNFED  make VoiceActivityDetector.accept_waveform() raise when
+                       the first pass was not fed since the previous call,
+                       i.e. once the loop runs the VAD on its own
+"""
+
+import os
+import time
+
+import numpy as np
+
+_first_pass_fed = False
+_first_pass_seen = False
+
+
+class _Result:
+    def __init__(self):
+        self.text = ""
+        self.tokens = []
+        self.timestamps = []
+
+
+class OfflineStream:
+    def __init__(self):
+        self.chunks = []
+        self.result = _Result()
+
+    def accept_waveform(self, sample_rate, samples):
+        self.chunks.append(np.asarray(samples, dtype=np.float32).copy())
+
+
+class OfflineRecognizer:
+    @classmethod
+    def from_sense_voice(cls, **kwargs):
+        return cls()
+
+    def create_stream(self):
+        return OfflineStream()
+
+    def decode_stream(self, stream):
+        audio = np.concatenate(stream.chunks) if stream.chunks else np.zeros(0, dtype=np.float32)
+        count = max(1, len(audio) // 1600)
+        stream.result.text = f"seg{len(audio)}"
+        stream.result.tokens = [f"t{i}" for i in range(count)]
+        stream.result.timestamps = [i * 0.1 for i in range(count)]
+
+    def decode_streams(self, streams):
+        for stream in streams:
+            self.decode_stream(stream)
+
+
+class OnlineStream:
+    def __init__(self):
+        self.fed = 0
+        self.pending = 0
+        self.voiced = 0
+        self.first_voiced = None
+        self.finished = False
+
+    def accept_waveform(self, sample_rate, samples):
+        global _first_pass_fed, _first_pass_seen
+        _first_pass_fed = _first_pass_seen = True
+        if len(samples) and float(np.abs(samples).mean()) > 0.01:
+            if self.first_voiced is None:
+                self.first_voiced = self.fed
+            self.voiced += len(samples)
+        self.fed += len(samples)
+        self.pending += len(samples)
+
+    def input_finished(self):
+        self.finished = True
+
+
+class OnlineRecognizer:
+    @classmethod
+    def from_transducer(cls, **kwargs):
+        recognizer = cls()
+        recognizer.decoding_method = kwargs.get("decoding_method")
+        return recognizer
+
+    def create_stream(self):
+        return OnlineStream()
+
+    def is_ready(self, stream):
+        return stream.pending >= 1600
+
+    def decode_stream(self, stream):
+        stream.pending -= 1600
+        delay = float(os.environ.get("FAKE_DECODE_SLEEP", "0"))
+        if delay:
+            time.sleep(delay)
+
+    def decode_streams(self, streams):
+        for stream in streams:
+            self.decode_stream(stream)
+
+    def get_result(self, stream):
+        return "HELLO " * (stream.voiced // 16000)
+
+    def get_result_all(self, stream):
+        result = _Result()
+        count = stream.voiced // 16000
+        result.tokens = ["HELLO"] * count
+        result.timestamps = [(stream.first_voiced or 0) / 16000 + i for i in range(count)]
+        result.text = " ".join(result.tokens)
+        return result
+
+    def is_endpoint(self, stream):
+        return stream.fed >= 32000
+
+    def reset(self, stream):
+        stream.fed = 0
+        stream.pending = 0
+        stream.voiced = 0
+        stream.first_voiced = None
+
+
+class _SileroConfig:
+    def __init__(self):
+        self.model = ""
+        self.threshold = 0.5
+        self.min_silence_duration = 0.5
+        self.min_speech_duration = 0.25
+        self.max_speech_duration = 20.0
+        self.window_size = 512
+
+
+class VadModelConfig:
+    def __init__(self):
+        self.silero_vad = _SileroConfig()
+        self.sample_rate = 16000
+        self.num_threads = 1
+        self.provider = "cpu"
+        self.debug = False
+
+    def validate(self):
+        return True
+
+
+class _Segment:
+    def __init__(self, start, samples):
+        self.start = start
+        self.samples = list(samples)
+
+
+class VoiceActivityDetector:
+    def __init__(self, config, buffer_size_in_seconds=60):
+        self.reset()
+
+    def reset(self):
+        self.queue = []
+        self.current = []
+        self.current_start = None
+        self.position = 0
+        self.silence = 0
+
+    def accept_waveform(self, samples):
+        global _first_pass_fed
+        if os.environ.get("FAKE_VAD_FAIL_UNFED") and _first_pass_seen and not _first_pass_fed:
+            raise RuntimeError("fake VAD failure")
+        _first_pass_fed = False
+        samples = np.asarray(samples, dtype=np.float32)
+        for i in range(0, len(samples), 512):
+            window = samples[i : i + 512]
+            if len(window) and float(np.abs(window).mean()) > 0.01:
+                if self.current_start is None:
+                    self.current_start = self.position
+                self.current.append(window)
+                self.silence = 0
+            elif self.current_start is not None:
+                self.silence += len(window)
+                self.current.append(window)
+                if self.silence >= 8000:
+                    self.flush()
+            self.position += len(window)
+
+    def flush(self):
+        if self.current_start is not None:
+            self.queue.append(_Segment(self.current_start, np.concatenate(self.current)))
+        self.current = []
+        self.current_start = None
+        self.silence = 0
+
+    def empty(self):
+        return not self.queue
+
+    @property
+    def front(self):
+        return self.queue[0]
+
+    def pop(self):
+        self.queue.pop(0)
+
+    def is_speech_detected(self):
+        return self.current_start is not None
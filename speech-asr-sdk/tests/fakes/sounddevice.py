@@ -0,0 +1,25 @@
+"""Stand-in for sounddevice: no audio devices, so only file/stdin/socket input works."""
+
+
+class _Default:
+    def __init__(self):
+        self.device = [None, None]
+        self.samplerate = None
+
+
+default = _Default()
+
+
+class PortAudioError(Exception):
+    pass
+
+
+def query_devices(device=None, kind=None):
+    if device is not None or kind is not None:
+        raise PortAudioError("No audio devices in the test stand-in")
+    return []
+
+
+class InputStream:
+    def __init__(self, *args, **kwargs):
+        raise PortAudioError("No audio devices in the test stand-in")
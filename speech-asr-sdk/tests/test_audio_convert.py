@@ -0,0 +1,116 @@
+import io
+import tracemalloc
+import wave
+
+import numpy as np
+import pytest
+
+from conftest import silence, speech_like
+
+
+def tone(seconds, rate, freq=440.0, amplitude=0.5):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+@pytest.mark.parametrize(
+    "sampwidth, raw, expected",
+    [
+        (1, bytes([128, 192, 64]), [0.0, 0.5, -0.5]),
+        (2, np.array([0, 16384, -16384], dtype="<i2").tobytes(), [0.0, 0.5, -0.5]),
+        (3, bytes([0, 0, 0, 0, 0, 0x40, 0, 0, 0xC0]), [0.0, 0.5, -0.5]),
+        (4, np.array([0, 1 << 30, -(1 << 30)], dtype="<i4").tobytes(), [0.0, 0.5, -0.5]),
+    ],
+)
+def test_pcm_widths(asr, sampwidth, raw, expected):
+    out = asr.pcm_to_float32(raw, sampwidth)
+    assert out.dtype == np.float32
+    np.testing.assert_allclose(out, expected, atol=1e-6)
+
+
+def test_pcm_downmix_and_float(asr):
+    stereo = np.array([16384, 0, -16384, -16384, 7], dtype="<i2").tobytes()  # trailing half frame is dropped
+    np.testing.assert_allclose(asr.pcm_to_float32(stereo, 2, channels=2), [0.25, -0.5])
+    floats = np.array([0.25, -1.0], dtype="<f4").tobytes()
+    np.testing.assert_array_equal(asr.pcm_to_float32(floats, 4, is_float=True), [0.25, -1.0])
+
+
+@pytest.mark.parametrize("in_rate, out_rate", [(48000, 16000), (44100, 16000), (8000, 16000)])
+def test_resampler_output_does_not_depend_on_block_size(asr, in_rate, out_rate):
+    audio = speech_like(0.5, sample_rate=in_rate, amplitude=0.1)
+    whole = np.concatenate(list(asr.resample_blocks(iter([audio]), in_rate, out_rate)))
+    rng = np.random.default_rng(3)
+    cuts = np.sort(rng.choice(np.arange(1, len(audio)), size=40, replace=False))
+    pieces = np.split(audio, cuts)
+    blocked = np.concatenate(list(asr.resample_blocks(iter(pieces), in_rate, out_rate)))
+    assert len(whole) == len(blocked) == -(-len(audio) * out_rate // in_rate)
+    np.testing.assert_allclose(blocked, whole, atol=1e-5)
+
+
+def test_resampler_memory_does_not_grow_with_the_block(asr):
+    block = speech_like(10.0, sample_rate=48000, amplitude=0.1)
+    resampler = asr.StreamingResampler(48000, 16000)
+    tracemalloc.start()
+    try:
+        out = resampler.process(block)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert len(out) > 150000
+    # One 10 s block used to gather an n_out x taps matrix (~100 MB)
+    assert peak < 16 * 1024 * 1024
+
+
+def test_resampler_keeps_a_tone_in_phase(asr):
+    out = np.concatenate(list(asr.resample_blocks(iter(np.split(tone(1.0, 48000), 10)), 48000, 16000)))
+    expected = tone(1.0, 16000)
+    # Ignore the filter's edge transients
+    np.testing.assert_allclose(out[400:-400], expected[400:-400], atol=0.01)
+
+
+def test_resampler_passes_matching_rates_through(asr):
+    block = speech_like(0.1)
+    resampler = asr.StreamingResampler(16000, 16000)
+    assert resampler.process(block) is block
+    assert resampler.flush().size == 0
+
+
+def test_stereo_48k_wav_is_decoded_to_16k_mono(asr, tmp_path):
+    left = tone(0.5, 48000)
+    path = tmp_path / "stereo.wav"
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(2)
+        wf.setsampwidth(2)
+        wf.setframerate(48000)
+        wf.writeframes((np.stack([left, left], axis=1) * 32767).astype("<i2").tobytes())
+    out = np.concatenate(list(asr.iter_wav_float_mono(path, 16000, 4800)))
+    assert len(out) == 8000
+    np.testing.assert_allclose(out[400:-400], tone(0.5, 16000)[400:-400], atol=0.01)
+
+
+def test_raw_pcm_reads_split_frames(asr):
+    class Trickle(io.RawIOBase):
+        """Returns odd-sized reads so frames straddle read boundaries."""
+
+        def __init__(self, data):
+            self.data = data
+
+        def read(self, n=-1):
+            chunk, self.data = self.data[:3], self.data[3:]
+            return chunk
+
+    frames = np.array([[100, 300], [-200, -400], [8, 8]], dtype="<i2")
+    blocks = asr.iter_pcm_float_mono(Trickle(frames.tobytes()), "s16le", 2, 16000, 16000, 1600)
+    np.testing.assert_allclose(np.concatenate(list(blocks)), np.array([200, -300, 8]) / 32768.0)
+    with pytest.raises(ValueError, match="Unsupported PCM format"):
+        list(asr.iter_pcm_float_mono(io.BytesIO(), "s24be", 1, 16000, 16000, 1600))
+
+
+def test_piped_pcm_is_transcribed(run_asr):
+    mono = np.concatenate([silence(0.5, 48000), speech_like(1.5, 48000, amplitude=0.1), silence(1.0, 48000)])
+    stereo = (np.repeat(mono[:, None], 2, axis=1) * 32767).astype("<i2")
+    returncode, events = run_asr("--wav-input", "-", "--pcm-rate", "48000", "--pcm-channels", "2", audio=stereo.tobytes())
+    assert returncode == 0
+    assert [seg["text"] for e in events if e["type"] == "result" for seg in e["segments"]]
+    stats = next(e for e in events if e.get("name") == "wav-decode")
+    assert stats["audio_seconds"] == pytest.approx(3.0, abs=0.01)
@@ -0,0 +1,108 @@
+import io
+import socket
+import time
+
+import numpy as np
+import pytest
+
+from conftest import speech_like, write_wav
+
+RATE = 16000
+
+
+def collect(source, timeout=10.0):
+    """Start a source and gather everything it delivers until it finishes."""
+    blocks = []
+    source.start(lambda indata, frames, time_info, status: blocks.append(indata.reshape(-1).copy()), lambda n: True)
+    assert source.finished.wait(timeout)
+    source.stop()
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+def test_sources_must_implement_their_hooks(asr):
+    with pytest.raises(TypeError):
+        asr.AudioSource(RATE, 1600)  # pylint: disable=abstract-class-instantiated
+
+    class Incomplete(asr.BlockSource):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete(RATE, 1600)
+
+
+def test_block_source_appends_a_silence_gap(asr):
+    class Ramp(asr.BlockSource):
+        def blocks(self):
+            yield np.full(1000, 0.5, dtype=np.float32)
+            yield from self.silence()
+
+    source = Ramp(RATE, 1600, gap_seconds=0.25)
+    audio = collect(source)
+    assert len(audio) == 1000 + 3 * 1600
+    assert source.fed_samples == len(audio)
+    assert np.all(audio[:1000] == 0.5) and not np.any(audio[1000:])
+
+
+def test_file_source_replays_wavs_back_to_back(asr, tmp_path):
+    first = speech_like(0.5, amplitude=0.1)
+    second = speech_like(0.3, amplitude=0.1, seed=2)
+    files = [write_wav(tmp_path / "a.wav", first), write_wav(tmp_path / "b.wav", second)]
+    audio = collect(asr.FileSource(files, RATE, 1600, speed=0.0, gap_seconds=0.1))
+    assert len(audio) == 8000 + 1600 + 4800 + 1600
+    np.testing.assert_allclose(audio[:8000], first, atol=1e-4)
+    np.testing.assert_allclose(audio[9600:14400], second, atol=1e-4)
+
+
+def test_paced_replay_follows_real_time(asr, tmp_path):
+    wav = write_wav(tmp_path / "a.wav", speech_like(0.5))
+    started = time.monotonic()
+    collect(asr.FileSource([wav], RATE, 1600, speed=2.0, gap_seconds=0.0))
+    assert time.monotonic() - started >= 0.2
+
+
+def test_max_speed_replay_waits_for_room(asr, tmp_path):
+    wav = write_wav(tmp_path / "a.wav", speech_like(0.5))
+    ring = asr.AudioRingBuffer(3200)
+    source = asr.FileSource([wav], RATE, 1600, speed=0.0, gap_seconds=0.0)
+    source.start(lambda indata, *_: ring.write(indata.reshape(-1)), lambda n: ring.free() >= n)
+    received = 0
+    while received < 8000:
+        block = ring.read(1600, timeout=2.0)
+        assert block is not None
+        received += len(block)
+    assert source.finished.wait(2.0)
+    assert ring.stats()["dropped_samples"] == 0
+
+
+def test_pcm_stream_source_converts_s16le(asr):
+    samples = np.array([0, 16384, -16384, 32767], dtype="<i2")
+    source = asr.PcmStreamSource(io.BytesIO(samples.tobytes()), "s16le", 1, RATE, RATE, 1600)
+    source.gap_samples = 0
+    np.testing.assert_allclose(collect(source), [0.0, 0.5, -0.5, 32767 / 32768], atol=1e-6)
+
+
+def test_socket_source_accepts_one_connection_at_a_time(asr):
+    probe = socket.socket()
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    source = asr.SocketSource(f"tcp://127.0.0.1:{port}", "s16le", 1, RATE, RATE, 1600)
+    source.gap_samples = 0
+    blocks = []
+    source.start(lambda indata, *_: blocks.append(indata.reshape(-1).copy()), lambda n: True)
+    try:
+        for _ in range(50):
+            try:
+                client = socket.create_connection(("127.0.0.1", port))
+                break
+            except OSError:
+                time.sleep(0.05)
+        with client:
+            client.sendall(np.full(800, 8192, dtype="<i2").tobytes())
+        deadline = time.monotonic() + 5
+        while sum(map(len, blocks)) < 800 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        source.stop()
+    assert sum(map(len, blocks)) == 800
+    assert np.allclose(np.concatenate(blocks), 0.25)
@@ -0,0 +1,50 @@
+import json
+
+import numpy as np
+
+from conftest import silence, speech_like, write_wav
+
+
+def benchmark_event(events):
+    reports = [e for e in events if e["type"] == "benchmark"]
+    assert len(reports) == 1
+    return reports[0]
+
+
+def test_benchmark_replays_a_corpus_and_reports(tmp_path, run_asr):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    write_wav(corpus / "a.wav", np.concatenate([silence(0.5), speech_like(2.5), silence(1.0)]))
+    write_wav(corpus / "b.wav", np.concatenate([speech_like(1.5, seed=3), silence(1.0)]))
+    output = tmp_path / "report.json"
+    returncode, events = run_asr("--benchmark", str(corpus), "--benchmark-output", str(output), "--silero-vad-model", str(tmp_path / "none.onnx"))
+    assert returncode == 0
+    report = benchmark_event(events)
+    assert report["files"] == 2
+    # Each file is followed by a one-second gap of silence
+    assert report["audio_seconds"] == 8.5
+    assert report["segments"] >= 2
+    assert set(report["cpu_seconds"]) >= {"first_pass", "second_pass"}
+    assert "final_ms" in report["latency"] or "endpoint_to_final_ms" in report["latency"]
+    saved = json.loads(output.read_text(encoding="utf-8"))
+    assert saved["audio_seconds"] == report["audio_seconds"]
+
+
+def test_first_partial_latency_is_measured_from_the_first_voiced_sample(tmp_path, run_asr):
+    # The fake first pass emits its first token after one second of voiced audio
+    wav = write_wav(tmp_path / "late.wav", np.concatenate([silence(1.0), speech_like(1.5)]))
+    returncode, events = run_asr("--benchmark", str(wav), "--disable-endpoint")
+    assert returncode == 0
+    first_partial = benchmark_event(events)["latency"]["first_partial_ms"]
+    assert first_partial["count"] == 1
+    assert 1000.0 <= first_partial["p50"] < 1500.0
+
+
+def test_short_tail_of_a_pcm_source_is_decoded(tmp_path, run_asr):
+    # 2.05 s of audio plus the 1 s end-of-input gap leaves a 50 ms tail, less than one chunk
+    pcm = (speech_like(2.05) * 32767).astype("<i2").tobytes()
+    returncode, events = run_asr("--source", "stdin", "--silero-vad-model", str(tmp_path / "none.onnx"), audio=pcm)
+    assert returncode == 0
+    segments = [seg for e in events if e["type"] == "result" for seg in e["segments"]]
+    assert [seg["start_time"] for seg in segments] == [0.0, 2.0]
+    assert segments[-1]["end_time"] == 3.05
@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import silence, speech_like, write_wav
+from test_sessions import Server
+
+
+@pytest.mark.parametrize(
+    "line, parsed",
+    [
+        ("start\n", ("start", "", None)),
+        ("Mode  manual \n", ("mode", "manual", None)),
+        ('{"id": 7, "cmd": "DEVICE", "arg": 2}', ("device", "2", "7")),
+        ('{"cmd": "stop"}', ("stop", "", None)),
+        ("{not json", ("{not", "json", None)),
+        ("   \n", ("", "", None)),
+    ],
+)
+def test_parse(asr, line, parsed):
+    assert asr.ControlPlane.parse(line) == parsed
+
+
+def test_dispatch_acks_json_commands(asr, events):
+    def fail(arg):
+        raise RuntimeError(f"no device {arg}")
+
+    calls = []
+    wake = threading.Event()
+    plane = asr.ControlPlane({"start": calls.append, "mode": lambda arg: arg == "manual", "device": fail}, lambda: None, wake)
+    assert plane.dispatch("start") == "start"
+    assert calls == [""] and wake.is_set()
+    plane.dispatch('{"id": "1", "cmd": "mode", "arg": "manual"}')
+    plane.dispatch('{"id": "2", "cmd": "mode", "arg": "bogus"}')
+    plane.dispatch('{"id": "3", "cmd": "device", "arg": "9"}')
+    plane.dispatch('{"id": "4", "cmd": "dance"}')
+    plane.dispatch('{"id": "5", "cmd": "quit"}')
+    acks = [e for e in events if e["type"] == "ack"]
+    assert acks == [
+        {"type": "ack", "id": "1", "cmd": "mode", "ok": True},
+        {"type": "ack", "id": "2", "cmd": "mode", "ok": False},
+        {"type": "ack", "id": "3", "cmd": "device", "ok": False, "message": "no device 9"},
+        {"type": "ack", "id": "4", "cmd": "dance", "ok": False, "message": "unknown command"},
+        {"type": "ack", "id": "5", "cmd": "quit", "ok": True},
+    ]
+
+
+def test_commands_from_a_pipe_run_in_order_until_eof(asr, events, monkeypatch):
+    read_fd, write_fd = os.pipe()
+    stdin = os.fdopen(read_fd, "r")
+    monkeypatch.setattr(sys, "stdin", stdin)
+    seen = []
+    closed = threading.Event()
+    plane = asr.ControlPlane({"start": lambda arg: seen.append("start"), "stop": lambda arg: seen.append("stop")}, closed.set)
+    plane.start()
+    with os.fdopen(write_fd, "w") as writer:
+        writer.write('start\n{"id": "a", "cmd": "stop"}\n')
+    assert closed.wait(5.0)
+    stdin.close()
+    assert seen == ["start", "stop"]
+    assert {"type": "ack", "id": "a", "cmd": "stop", "ok": True} in events
+
+
+def test_quit_ends_the_loop_before_later_commands(asr, monkeypatch):
+    read_fd, write_fd = os.pipe()
+    stdin = os.fdopen(read_fd, "r")
+    monkeypatch.setattr(sys, "stdin", stdin)
+    seen = []
+    closed = threading.Event()
+    asr.ControlPlane({"start": seen.append}, closed.set).start()
+    writer = os.fdopen(write_fd, "w")
+    writer.write("quit\nstart\n")
+    writer.flush()
+    assert closed.wait(5.0)
+    writer.close()
+    stdin.close()
+    assert not seen
+
+
+def test_stop_mid_utterance_flushes_between_chunks(model_args, tmp_path):
+    wav = write_wav(tmp_path / "long.wav", np.concatenate([speech_like(6.0), silence(0.5)]))
+    helper = Server(model_args, "--source", f"file:{wav}", "--source-speed", "1")
+    helper.wait_for(lambda e: e["type"] == "first-pass" and e.get("text"))
+    helper.proc.stdin.write(b'{"id": "s", "cmd": "stop"}\n')
+    helper.proc.stdin.flush()
+    helper.wait_for(lambda e: e["type"] == "ack")
+    assert helper.stop() == 0
+    events = helper.events
+    assert {"type": "ack", "id": "s", "cmd": "stop", "ok": True} in events
+    flushed = [i for i, e in enumerate(events) if e.get("message", "").startswith("Flushing buffered audio on stop")]
+    assert len(flushed) == 1
+    # A chunk read while the stop was pending must not reopen the utterance
+    assert not [e for e in events[flushed[0] :] if e["type"] == "first-pass" and e.get("text")]
+    assert [e for e in events[flushed[0] :] if e["type"] == "result"]
@@ -0,0 +1,62 @@
+import numpy as np
+
+from conftest import silence, speech_like, write_wav
+
+CHUNK = 1600
+
+
+def chunks(audio):
+    return [audio[i : i + CHUNK] for i in range(0, len(audio), CHUNK)]
+
+
+def make_gate(asr):
+    # Hangover of three chunks, two chunks of pre-roll
+    return asr.EnergyGate(16000, CHUNK, margin_db=9.0, hangover_seconds=0.3, preroll_seconds=0.2)
+
+
+def test_gate_closes_after_hangover_and_replays_preroll(asr):
+    gate = make_gate(asr)
+    quiet = chunks(silence(1.0))
+    outputs = [gate.process(chunk) for chunk in quiet]
+    # Starts open, then closes once the hangover runs out on steady silence
+    assert [out is not None for out in outputs[:3]] == [True, True, False]
+    assert all(out is None for out in outputs[2:]) and not gate.is_open
+    loud = speech_like(0.1, seed=5)
+    out = gate.process(loud)
+    np.testing.assert_array_equal(out, np.concatenate(quiet[-2:] + [loud]))
+    assert gate.openings == 1 and gate.is_open
+    stats = gate.stats(model_cpu_seconds=1.1)
+    assert stats["gated_seconds"] == 0.8 and stats["open_seconds"] == 0.3
+    assert stats["gated_ratio"] == round(8 / 11, 3)
+    assert -70.0 < stats["noise_floor_db"] < -55.0
+
+
+def test_quiet_hiss_opens_the_gate(asr):
+    gate = make_gate(asr)
+    for chunk in chunks(silence(1.0)):
+        gate.process(chunk)
+    assert not gate.is_open
+    # Below the loudness margin but above half of it, and every sample crosses zero
+    level = 10 ** ((gate.floor_db + 0.75 * gate.margin_db) / 20)
+    hiss = (level * np.where(np.arange(CHUNK) % 2, 1.0, -1.0)).astype(np.float32)
+    steady = (level * np.ones(CHUNK)).astype(np.float32)
+    assert gate.process(steady) is None
+    assert gate.process(hiss) is not None
+
+
+def test_reset_reopens_and_forgets_the_floor(asr):
+    gate = make_gate(asr)
+    for chunk in chunks(silence(1.0)):
+        gate.process(chunk)
+    gate.reset()
+    assert gate.is_open and gate.floor_db == gate.MIN_FLOOR_DB
+
+
+def test_gated_benchmark_keeps_the_speech(tmp_path, run_asr):
+    wav = write_wav(tmp_path / "a.wav", np.concatenate([silence(3.0), speech_like(1.5), silence(3.0)]))
+    returncode, events = run_asr("--benchmark", str(wav), "--energy-gate")
+    assert returncode == 0
+    report = next(e for e in events if e["type"] == "benchmark")
+    assert report["energy_gate"]["gated_seconds"] >= 3.0
+    assert report["energy_gate"]["openings"] >= 1
+    assert [seg for e in events if e["type"] == "result" for seg in e["segments"] if seg["text"]]
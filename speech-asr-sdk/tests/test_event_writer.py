@@ -0,0 +1,84 @@
+import io
+import json
+import sys
+import threading
+
+
+class SlowStdout:
+    """Binary stdout that blocks every write until released."""
+
+    def __init__(self):
+        self.buffer = self
+        self.writes = []
+        self.release = threading.Event()
+        self.entered = threading.Event()
+
+    def write(self, data):
+        self.entered.set()
+        self.release.wait(5.0)
+        self.writes.append(data)
+
+    def flush(self):
+        pass
+
+
+def decode(writes):
+    return [json.loads(line) for line in b"".join(writes).decode("utf-8").splitlines()]
+
+
+def test_encode_event_is_one_utf8_line(asr):
+    line = asr.encode_event({"type": "result", "text": "你好"})
+    assert line.endswith(b"\n") and line.count(b"\n") == 1
+    assert "你好" in line.decode("utf-8")
+    assert json.loads(line) == {"type": "result", "text": "你好"}
+
+
+def test_events_are_coalesced_and_lossy_types_dropped_under_backpressure(asr, monkeypatch):
+    stdout = SlowStdout()
+    monkeypatch.setattr(sys, "stdout", stdout)
+    writer = asr.EventWriter(limit=3)
+    writer.put({"type": "log", "message": "first"})
+    assert stdout.entered.wait(5.0)  # the writer thread is now stuck in write()
+    for i in range(3):
+        writer.put({"type": "first-pass", "text": str(i)})
+    writer.put({"type": "metrics", "name": "latency"})
+    writer.put({"type": "result", "segments": []})
+    writer.put({"type": "ack", "id": "1", "ok": True})
+    stdout.release.set()
+    writer.close()
+    assert len(stdout.writes) == 2
+    assert decode(stdout.writes) == [
+        {"type": "log", "message": "first"},
+        {"type": "first-pass", "text": "0"},
+        {"type": "first-pass", "text": "1"},
+        {"type": "first-pass", "text": "2"},
+        {"type": "result", "segments": []},
+        {"type": "ack", "id": "1", "ok": True},
+        {"type": "log", "message": "Dropped 1 event(s) while stdout was backed up"},
+    ]
+
+
+def test_text_only_stdout_is_supported(asr, monkeypatch):
+    out = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", out)
+    writer = asr.EventWriter()
+    writer.put({"type": "ready"})
+    writer.close()
+    assert json.loads(out.getvalue()) == {"type": "ready"}
+
+
+def test_log_level_filters_only_log_events(asr, monkeypatch):
+    queued = []
+
+    class Collect:
+        put = staticmethod(queued.append)
+
+    monkeypatch.setattr(asr, "_writer", Collect())
+    monkeypatch.setattr(asr, "_log_threshold", asr.LOG_LEVELS["info"])
+    asr.emit({"type": "log", "message": "chunk"}, level="debug")
+    asr.emit({"type": "log", "message": "hello"})
+    asr.set_log_level("error")
+    asr.emit({"type": "log", "message": "hidden"}, level="warning")
+    asr.emit({"type": "result", "segments": []}, level="debug")
+    assert queued == [{"type": "log", "message": "hello"}, {"type": "result", "segments": []}]
+    assert asr.log_enabled("error") and not asr.log_enabled("warning")
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from conftest import silence, speech_like
+
+
+def test_segment_timings_skips_missing_marks(asr):
+    marks = {"capture": 10.0, "endpoint": 10.05, "enqueue": 10.0501, "second_pass_start": 10.2, "second_pass_end": 10.5}
+    assert asr.segment_timings(marks) == {
+        "endpoint_ms": 50.0,
+        "enqueue_ms": 0.1,
+        "queue_wait_ms": 149.9,
+        "second_pass_ms": 300.0,
+    }
+
+
+def test_latency_summary_percentiles_and_window_reset(asr):
+    stats = asr.LatencyStats()
+    for value in range(1, 101):
+        stats.record("second_pass_ms", float(value))
+    stats.record_timings({"emit_ms": 2.0})
+    summary = stats.summary()
+    assert summary["stages"]["second_pass_ms"] == {
+        "count": 100,
+        "mean": 50.5,
+        "p50": 50.5,
+        "p95": 95.0,
+        "p99": 99.0,
+        "max": 100.0,
+    }
+    assert summary["stages"]["emit_ms"]["count"] == 1
+    assert stats.summary()["stages"] == {}
+
+
+def test_summary_without_reset_keeps_samples(asr):
+    stats = asr.LatencyStats()
+    stats.record("emit_ms", 1.0)
+    stats.summary(reset=False)
+    assert stats.summary()["stages"]["emit_ms"]["count"] == 1
+
+
+def test_results_carry_timings_and_latency_metrics(tmp_path, run_asr):
+    audio = np.concatenate([speech_like(1.5), silence(1.0), speech_like(1.0)])
+    pcm = (audio * 32767).astype("<i2").tobytes()
+    returncode, events = run_asr("--source", "stdin", "--silero-vad-model", str(tmp_path / "none.onnx"), audio=pcm)
+    assert returncode == 0
+    results = [e for e in events if e["type"] == "result"]
+    assert results
+    for result in results:
+        timings = result["timings"]
+        assert timings["endpoint_to_final_ms"] == pytest.approx(
+            timings["enqueue_ms"] + timings["queue_wait_ms"] + timings["second_pass_ms"] + timings["emit_ms"], abs=0.5
+        )
+    latency = [e for e in events if e.get("name") == "latency"]
+    assert latency and latency[-1]["stages"]["endpoint_to_final_ms"]["count"] >= 1
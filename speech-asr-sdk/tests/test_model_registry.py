@@ -0,0 +1,117 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+
+def touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"")
+    return path
+
+
+@pytest.fixture
+def model_tree(tmp_path):
+    zipformer = tmp_path / "sherpa-onnx-streaming-zipformer"
+    for name in ("encoder-epoch-99.onnx", "encoder-epoch-99.int8.onnx", "decoder-epoch-99.onnx", "joiner-epoch-99.onnx", "tokens.txt"):
+        touch(zipformer / name)
+    sense_voice = tmp_path / "sherpa-onnx-sense-voice"
+    for name in ("model.onnx", "model.int8.onnx", "tokens.txt"):
+        touch(sense_voice / name)
+    touch(tmp_path / "silero_vad.onnx")
+    return tmp_path
+
+
+def test_discover_models_pairs_int8_encoder_with_fp32_decoder(asr, model_tree):
+    found = asr.discover_models(model_tree)
+    first = found["first"]
+    assert first["int8"]["encoder"].name == "encoder-epoch-99.int8.onnx"
+    assert first["int8"]["decoder"].name == "decoder-epoch-99.onnx"
+    assert first["fp32"]["encoder"].name == "encoder-epoch-99.onnx"
+    assert found["second"]["int8"]["model"].name == "model.int8.onnx"
+    assert found["vad"] == model_tree / "silero_vad.onnx"
+
+
+def budget(max_rtf=0.0, max_cer=0.1):
+    return argparse.Namespace(model_max_rtf=max_rtf, model_max_cer=max_cer, second_model="", second_tokens="")
+
+
+def fake_profiles(asr, monkeypatch, results):
+    """results: variant -> (rtf, text) returned by profile_variant."""
+    entry = {"tokens": "tokens.txt", "fp32": {"model": "model.onnx"}, "int8": {"model": "model.int8.onnx"}}
+    monkeypatch.setattr(asr, "profile_variant", lambda args, kind, clip: results[asr.model_variant(Path(args.second_model))])
+    return entry
+
+
+def test_profile_picks_fastest_variant_within_budget(asr, events, monkeypatch):
+    entry = fake_profiles(asr, monkeypatch, {"fp32": (0.2, "hello world"), "int8": (0.1, "hello world")})
+    choice, report = asr.profile_variants(budget(), "second", entry, np.zeros(16000, dtype=np.float32), True)
+    assert choice == "int8"
+    assert report == {"fp32": {"rtf": 0.2, "cer": 0.0}, "int8": {"rtf": 0.1, "cer": 0.0}}
+    assert not events
+
+
+def test_profile_names_the_cer_constraint(asr, events, monkeypatch):
+    entry = fake_profiles(asr, monkeypatch, {"fp32": (0.2, "hello world"), "int8": (0.1, "jello wor")})
+    choice, report = asr.profile_variants(budget(), "second", entry, np.zeros(16000, dtype=np.float32), True)
+    assert choice == "fp32"
+    assert report["int8"]["rejected"] == ["cer 0.2727 > --model-max-cer 0.1"]
+    messages = [e["message"] for e in events]
+    assert messages == ["second-pass int8 variant rejected: cer 0.2727 > --model-max-cer 0.1"]
+
+
+def test_profile_names_the_rtf_constraint(asr, events, monkeypatch):
+    entry = fake_profiles(asr, monkeypatch, {"fp32": (0.4, "hello"), "int8": (0.3, "hello")})
+    choice, report = asr.profile_variants(budget(max_rtf=0.25), "second", entry, np.zeros(16000, dtype=np.float32), True)
+    assert choice == "int8"
+    assert report["fp32"]["rejected"] == ["rtf 0.4000 > --model-max-rtf 0.25"]
+    messages = [e["message"] for e in events]
+    assert messages[-1] == "No second-pass variant within --model-max-cer meets --model-max-rtf 0.25; using the fastest accurate one"
+
+
+def test_profile_reports_both_constraints(asr, events, monkeypatch):
+    entry = fake_profiles(asr, monkeypatch, {"fp32": (0.4, "hello"), "int8": (0.3, "help")})
+    choice, report = asr.profile_variants(budget(max_rtf=0.35, max_cer=0.1), "second", entry, np.zeros(16000, dtype=np.float32), True)
+    # int8 is fast enough but inaccurate; fp32 is accurate but too slow
+    assert choice == "fp32"
+    assert report["int8"]["rejected"] == ["cer 0.4000 > --model-max-cer 0.1"]
+    assert report["fp32"]["rejected"] == ["rtf 0.4000 > --model-max-rtf 0.35"]
+
+
+def test_resolve_model_dir_caches_the_profiling_decision(asr, events, monkeypatch, model_tree, tmp_path):
+    calls = []
+    monkeypatch.setattr(asr, "profile_variant", lambda args, kind, clip: calls.append(kind) or (0.1, ""))
+    args = argparse.Namespace(
+        model_dir=str(model_tree), model_variant="auto", model_profile=True, model_max_rtf=0.0, model_max_cer=0.1,
+        model_profile_cache=str(tmp_path / "cache.json"), silero_vad_model="", second_model="", second_tokens="",
+        first_encoder="", first_decoder="", first_joiner="", first_tokens="", num_threads_first=1, num_threads_second=1,
+        provider_first="cpu", provider_second="cpu", chunk_duration=0.1, sample_rate=16000,
+    )
+    asr.resolve_model_dir(args, need_first_pass=True)
+    assert sorted(calls) == ["first", "first", "second", "second"]
+    first_run = [e for e in events if e.get("name") == "models"][-1]
+    assert first_run["profiled"] and not first_run["cached"]
+
+    args.second_model = args.first_encoder = ""
+    asr.resolve_model_dir(args, need_first_pass=True)
+    assert len(calls) == 4
+    second_run = [e for e in events if e.get("name") == "models"][-1]
+    assert second_run["cached"]
+    assert second_run["second_variant"] == first_run["second_variant"]
+    assert args.second_model.endswith(".onnx")
+
+
+def test_main_profiles_with_the_planned_thread_counts(asr, events, monkeypatch, model_tree, tmp_path, make_args):
+    threads = []
+    monkeypatch.setattr(asr, "profile_variant", lambda args, kind, clip: threads.append(args.num_threads_second) or (0.1, ""))
+    monkeypatch.setattr(asr, "available_cpus", lambda: (list(range(8)), 8))
+    monkeypatch.setattr(asr, "cpu_sets", {})
+    monkeypatch.setattr(asr, "load_models", lambda args, need_first_pass: (_ for _ in ()).throw(RuntimeError("stop here")))
+    make_args(
+        "--second-model", "", "--model-dir", str(model_tree), "--model-profile",
+        "--model-profile-cache", str(tmp_path / "cache.json"), "--thread-allocation", "auto", "--wav-input", "x.wav",
+    )
+    with pytest.raises(SystemExit):
+        asr.main()
+    assert threads == [8, 8]
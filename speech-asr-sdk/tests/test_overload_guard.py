@@ -0,0 +1,65 @@
+import numpy as np
+
+from conftest import silence, speech_like, write_wav
+
+
+def test_escalates_one_step_per_overloaded_window(asr):
+    guard = asr.OverloadGuard(["long-chunks", "pause-partials"], chunk_seconds=0.1, backlog_limit=0.5)
+    changes = [guard.observe(0.05, 0.1, 0.8) for _ in range(5)]
+    assert changes == [False, False, False, False, True]
+    assert guard.active("long-chunks") and not guard.active("pause-partials")
+    for _ in range(5):
+        guard.observe(0.05, 0.1, 0.8)
+    assert guard.active("pause-partials")
+    assert guard.event()["state"] == "degraded"
+    assert guard.event()["actions"] == ["long-chunks", "pause-partials"]
+    # Top of the ladder: further overload changes nothing
+    assert not any(guard.observe(0.05, 0.1, 0.8) for _ in range(20))
+    assert guard.stats() == {"level": 2, "escalations": 2, "deadline_misses": 0, "peak_backlog_ms": 800.0}
+
+
+def test_smoothed_deadline_misses_count_as_overload(asr):
+    guard = asr.OverloadGuard(["long-chunks"], chunk_seconds=0.1, backlog_limit=0.5)
+    levels = []
+    for _ in range(12):
+        guard.observe(0.2, 0.1, 0.0)
+        levels.append(guard.level)
+    # The ratio average needs a few chunks to pass 1.0, then escalate_chunks more
+    assert levels[:5] == [0] * 5
+    assert levels[-1] == 1
+    assert guard.stats()["deadline_misses"] == 12
+
+
+def test_relaxes_after_sustained_headroom(asr):
+    guard = asr.OverloadGuard(["long-chunks"], chunk_seconds=0.1, backlog_limit=0.5)
+    for _ in range(5):
+        guard.observe(0.05, 0.1, 0.8)
+    assert guard.level == 1
+    changes = [guard.observe(0.01, 0.1, 0.0) for _ in range(30)]
+    assert changes.index(True) == 29
+    assert guard.level == 0
+    assert guard.event()["state"] == "recovered"
+
+
+def test_middling_backlog_holds_level(asr):
+    guard = asr.OverloadGuard(["long-chunks"], chunk_seconds=0.1, backlog_limit=0.5)
+    for _ in range(5):
+        guard.observe(0.05, 0.1, 0.8)
+    assert not any(guard.observe(0.05, 0.1, 0.3) for _ in range(100))
+    assert guard.level == 1
+
+
+def test_vad_failure_in_vad_only_mode_falls_back_to_first_pass(tmp_path, run_asr):
+    wav = write_wav(tmp_path / "speech.wav", np.concatenate([silence(0.5), speech_like(6.0), silence(1.0)]))
+    returncode, events = run_asr(
+        "--source", f"file:{wav}",
+        "--overload-guard",
+        env={"FAKE_DECODE_SLEEP": "0.15", "FAKE_VAD_FAIL_UNFED": "1"},
+    )
+    assert returncode == 0
+    overloads = [e for e in events if e["type"] == "overload"]
+    assert any("vad-only" in e["actions"] for e in overloads)
+    messages = [e.get("message", "") for e in events]
+    assert any(m.startswith("VAD processing error, disabling VAD") for m in messages)
+    assert any(e["type"] == "result" for e in events)
+    assert any(e["type"] == "complete" for e in events)
@@ -0,0 +1,133 @@
+import json
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import SDK_DIR
+from test_event_writer import SlowStdout, decode
+
+
+class FakeResult:
+    def __init__(self, text, tokens=(), timestamps=()):
+        self.text = text
+        self.tokens = list(tokens)
+        self.timestamps = list(timestamps)
+
+
+class ScriptedRecognizer:
+    """Returns the next scripted result on every call, like a growing partial."""
+
+    def __init__(self, results):
+        self.results = list(results)
+
+    def get_result(self, stream):
+        return self.results.pop(0).text
+
+    def get_result_all(self, stream):
+        return self.results.pop(0)
+
+
+def partials(events):
+    return [e for e in events if e["type"] == "first-pass"]
+
+
+def test_full_mode_resends_only_on_change(asr, events):
+    tracker = asr.PartialTracker("full")
+    recognizer = ScriptedRecognizer([FakeResult("HELLO"), FakeResult("HELLO"), FakeResult("HELLO WORLD")])
+    for _ in range(3):
+        tracker.update(recognizer, None)
+    assert [e["text"] for e in partials(events)] == ["hello", "hello world"]
+
+
+def test_diff_mode_sends_common_prefix_and_suffix(asr, events):
+    tracker = asr.PartialTracker("diff")
+    recognizer = ScriptedRecognizer(
+        [
+            FakeResult("HELLO WORD", ["HELLO", " WORD"], [0.0, 0.5]),
+            FakeResult("HELLO WORLD", ["HELLO", " WORLD"], [0.0, 0.5]),
+        ]
+    )
+    tracker.update(recognizer, None)
+    tracker.update(recognizer, None)
+    tracker.reset()
+    first, second, reset = partials(events)
+    assert first == {"type": "first-pass", "keep": 0, "text": "hello word", "token_index": 0, "tokens": ["hello", " word"], "timestamps": [0.0, 0.5]}
+    assert second == {"type": "first-pass", "keep": 9, "text": "ld", "token_index": 1, "tokens": [" world"], "timestamps": [0.5]}
+    assert reset["keep"] == 0 and reset["text"] == ""
+
+
+def test_max_rate_holds_back_updates_but_not_the_first(asr, events, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(asr.time, "monotonic", lambda: clock[0])
+    tracker = asr.PartialTracker("full", max_rate=2.0)
+    recognizer = ScriptedRecognizer([FakeResult("A"), FakeResult("A B"), FakeResult("A B C")])
+    tracker.update(recognizer, None)
+    clock[0] += 0.1
+    tracker.update(recognizer, None)
+    clock[0] += 0.5
+    tracker.update(recognizer, None)
+    assert [e["text"] for e in partials(events)] == ["a", "a b c"]
+
+
+def test_paused_tracker_tracks_without_sending(asr, events):
+    tracker = asr.PartialTracker("full")
+    tracker.paused = True
+    assert tracker.update(ScriptedRecognizer([FakeResult("HELLO")]), None) == "hello"
+    assert not partials(events)
+
+
+def test_diff_mode_resyncs_after_the_writer_drops_a_partial(asr, monkeypatch):
+    stdout = SlowStdout()
+    monkeypatch.setattr(sys, "stdout", stdout)
+    writer = asr.EventWriter(limit=1)
+    monkeypatch.setattr(asr, "_writer", writer)
+    writer.put({"type": "log", "message": "first"})
+    assert stdout.entered.wait(5.0)
+    tracker = asr.PartialTracker("diff")
+    texts = ["HELLO", "HELLO WOR", "HELLO WORLD"]
+    recognizer = ScriptedRecognizer([FakeResult(text, text.split()) for text in texts])
+    tracker.update(recognizer, None)
+    tracker.update(recognizer, None)  # dropped: one event is already pending
+    assert writer.partials_dropped == 1
+    stdout.release.set()
+    deadline = time.monotonic() + 5.0
+    while writer.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    tracker.update(recognizer, None)
+    writer.close()
+    received = [e for e in decode(stdout.writes) if e["type"] == "first-pass"]
+    assert received[-1]["keep"] == 0 and received[-1]["token_index"] == 0
+    text, tokens = "", []
+    for event in received:
+        text = text[: event["keep"]] + event["text"]
+        tokens = tokens[: event["token_index"]] + event["tokens"]
+    assert text == "hello world" and tokens == ["hello", "world"]
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_index_js_rebuilds_diff_partials_with_non_bmp_text(asr, events):
+    tracker = asr.PartialTracker("diff")
+    texts = ["好😀", "好😀世", "好😀世界", "好😃"]
+    recognizer = ScriptedRecognizer([FakeResult(text, list(text)) for text in texts])
+    for _ in texts:
+        tracker.update(recognizer, None)
+    script = (
+        "const { SpeechASR } = require(process.argv[1]);"
+        "const asr = new SpeechASR();"
+        "const out = [];"
+        "asr.on('partial', (p) => out.push(p.text));"
+        "for (const line of require('fs').readFileSync(0, 'utf8').split('\\n').filter(Boolean)) asr._routePayload(JSON.parse(line));"
+        "process.stdout.write(JSON.stringify(out));"
+    )
+    proc = subprocess.run(
+        ["node", "-e", script, str(SDK_DIR / "index.js")],
+        input="\n".join(json.dumps(e, ensure_ascii=False) for e in partials(events)),
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        check=True,
+    )
+    assert json.loads(proc.stdout) == texts
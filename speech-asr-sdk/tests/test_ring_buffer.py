@@ -0,0 +1,62 @@
+import threading
+
+import numpy as np
+
+from conftest import speech_like
+
+
+def ramp(start, n):
+    return np.arange(start, start + n, dtype=np.float32)
+
+
+def test_reads_wrap_around_the_end(asr):
+    ring = asr.AudioRingBuffer(10)
+    ring.write(ramp(0, 7))
+    np.testing.assert_array_equal(ring.read(5, timeout=0), ramp(0, 5))
+    ring.write(ramp(7, 6))
+    assert ring.available() == 8 and ring.free() == 2
+    np.testing.assert_array_equal(ring.read(8, timeout=0), ramp(5, 8))
+    assert ring.stats() == {"overflows": 0, "dropped_samples": 0, "underflows": 0, "buffered_samples": 0}
+
+
+def test_overflow_drops_the_newest_samples(asr):
+    ring = asr.AudioRingBuffer(8)
+    ring.write(ramp(0, 6))
+    ring.write(ramp(6, 5))
+    assert ring.stats()["overflows"] == 1 and ring.stats()["dropped_samples"] == 3
+    np.testing.assert_array_equal(ring.read(8, timeout=0), ramp(0, 8))
+
+
+def test_underflow_times_out_and_is_counted(asr):
+    ring = asr.AudioRingBuffer(8)
+    ring.write(ramp(0, 3))
+    assert ring.read(4, timeout=0.01) is None
+    assert ring.stats()["underflows"] == 1
+    ring.clear()
+    assert ring.available() == 0
+
+
+def test_reader_thread_sees_every_sample_in_order(asr):
+    ring = asr.AudioRingBuffer(1000)
+    total = 50 * 160
+
+    def producer():
+        for i in range(50):
+            while ring.free() < 160:
+                pass
+            ring.write(ramp(i * 160, 160))
+
+    thread = threading.Thread(target=producer)
+    thread.start()
+    received = [ring.read(400, timeout=2.0) for _ in range(total // 400)]
+    thread.join()
+    np.testing.assert_array_equal(np.concatenate(received), ramp(0, total))
+    assert ring.stats()["dropped_samples"] == 0
+
+
+def test_streaming_mode_reports_capture_stats(tmp_path, run_asr):
+    pcm = (speech_like(1.0) * 32767).astype("<i2").tobytes()
+    returncode, events = run_asr("--source", "stdin", "--silero-vad-model", str(tmp_path / "none.onnx"), audio=pcm)
+    assert returncode == 0
+    capture = [e for e in events if e.get("name") == "capture"]
+    assert capture and capture[-1]["dropped_samples"] == 0 and capture[-1]["overflows"] == 0
@@ -0,0 +1,61 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class CountingRecognizer:
+    """Wraps the (fake) OfflineRecognizer and records how streams were decoded."""
+
+    def __init__(self, asr):
+        self.inner = asr.sherpa_onnx.OfflineRecognizer.from_sense_voice()
+        self.calls = []
+
+    def create_stream(self):
+        return self.inner.create_stream()
+
+    def decode_stream(self, stream):
+        self.calls.append(1)
+        self.inner.decode_stream(stream)
+
+    def decode_streams(self, streams):
+        self.calls.append(len(streams))
+        self.inner.decode_streams(streams)
+
+
+def test_batch_decodes_in_one_call_and_keeps_order(asr):
+    recognizer = CountingRecognizer(asr)
+    batch = [np.ones(n, dtype=np.float32) for n in (1600, 3200, 800)]
+    texts = asr.run_second_pass_batch(recognizer, batch, 16000)
+    assert texts == ["seg1600", "seg3200", "seg800"]
+    assert recognizer.calls == [3]
+
+
+def test_empty_segments_are_skipped(asr):
+    recognizer = CountingRecognizer(asr)
+    texts = asr.run_second_pass_batch(recognizer, [np.zeros(0, dtype=np.float32), np.ones(1600, dtype=np.float32)], 16000)
+    assert texts == ["", "seg1600"]
+    assert recognizer.calls == [1]
+
+
+def test_collect_batch_drains_what_is_queued(asr):
+    tasks = queue.Queue()
+    for i in range(5):
+        tasks.put(i)
+    assert asr.collect_batch(tasks, max_items=3, max_wait=0.0) == ([0, 1, 2], False)
+    assert asr.collect_batch(tasks, max_items=3, max_wait=0.0) == ([3, 4], False)
+
+
+def test_collect_batch_waits_for_late_tasks_and_stops_on_sentinel(asr):
+    tasks = queue.Queue()
+    tasks.put("a")
+    threading.Timer(0.05, tasks.put, args=("b",)).start()
+    started = time.monotonic()
+    assert asr.collect_batch(tasks, max_items=2, max_wait=1.0) == (["a", "b"], False)
+    assert time.monotonic() - started < 0.9
+    tasks.put("c")
+    tasks.put(None)
+    assert asr.collect_batch(tasks, max_items=8, max_wait=0.0) == (["c"], True)
+    tasks.put(None)
+    assert asr.collect_batch(tasks, max_items=8, max_wait=0.0) == ([], True)
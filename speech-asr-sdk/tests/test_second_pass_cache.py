@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+
+from conftest import silence, speech_like, write_wav
+from test_second_pass_batch import CountingRecognizer
+
+
+def test_hits_skip_the_decode(asr, tmp_path, monkeypatch):
+    cache = asr.SecondPassCache(str(tmp_path), 1 << 20, {"model": "a"})
+    monkeypatch.setattr(asr, "second_pass_cache", cache)
+    recognizer = CountingRecognizer(asr)
+    batch = [np.full(1600, 0.1, dtype=np.float32), np.full(800, 0.2, dtype=np.float32)]
+    assert asr.run_second_pass_batch(recognizer, batch, 16000) == ["seg1600", "seg800"]
+    assert asr.run_second_pass_batch(recognizer, batch + [np.ones(400, dtype=np.float32)], 16000) == ["seg1600", "seg800", "seg400"]
+    assert recognizer.calls == [2, 1]
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 3
+
+
+def test_keys_depend_on_audio_and_options(asr, tmp_path):
+    audio = speech_like(0.1)
+    cache = asr.SecondPassCache(str(tmp_path), 1 << 20, {"model": "a"})
+    assert cache.key(audio) == cache.key(audio.copy())
+    assert cache.key(audio) != cache.key(audio * 0.5)
+    assert cache.key(audio) != asr.SecondPassCache(str(tmp_path), 1 << 20, {"model": "b"}).key(audio)
+
+
+def test_least_recently_used_entries_are_evicted(asr, tmp_path):
+    cache = asr.SecondPassCache(str(tmp_path), 1000, {})
+    entry = {"text": "x" * 200, "tokens": [], "timestamps": []}
+    keys = [cache.key(np.full(10, i, dtype=np.float32)) for i in range(6)]
+    for i, key in enumerate(keys[:4]):
+        cache.put(key, entry)
+        os.utime(cache._path(key), (1000 + i, 1000 + i))  # pylint: disable=protected-access
+    assert cache.get(keys[0]) is not None  # refreshed: now the newest
+    cache.put(keys[4], entry)
+    cache.put(keys[5], entry)
+    # The fifth entry crossed the cap and the two oldest went to get under 90%
+    assert cache.stats()["bytes"] <= 1000
+    assert [cache.get(key) is not None for key in keys] == [True, False, False, True, True, True]
+
+
+def test_existing_entries_count_towards_the_cap(asr, tmp_path):
+    cache = asr.SecondPassCache(str(tmp_path), 1 << 20, {})
+    cache.put(cache.key(np.ones(4, dtype=np.float32)), {"text": "abc"})
+    assert asr.SecondPassCache(str(tmp_path), 1 << 20, {}).stats()["bytes"] == cache.stats()["bytes"] > 0
+
+
+def test_overwriting_a_key_counts_only_the_new_entry(asr, tmp_path):
+    cache = asr.SecondPassCache(str(tmp_path), 1 << 20, {})
+    key = cache.key(np.ones(4, dtype=np.float32))
+    cache.put(key, {"text": "a much longer first transcript"})
+    cache.put(key, {"text": "short"})
+    assert cache.stats()["bytes"] == cache._path(key).stat().st_size  # pylint: disable=protected-access
+    assert asr.SecondPassCache(str(tmp_path), 1 << 20, {}).stats()["bytes"] == cache.stats()["bytes"]
+
+
+def test_repeated_file_is_answered_from_the_cache(tmp_path, run_asr):
+    wav = write_wav(tmp_path / "a.wav", np.concatenate([silence(0.5), speech_like(1.0), silence(1.0)]))
+    cache_dir = tmp_path / "cache"
+    runs = [run_asr("--wav-input", str(wav), "--second-cache-dir", str(cache_dir)) for _ in range(2)]
+    stats = [next(e for e in events if e.get("name") == "wav-decode")["cache"] for _, events in runs]
+    assert stats[0]["hits"] == 0 and stats[0]["misses"] >= 1
+    assert stats[1] == {"hits": stats[0]["misses"], "misses": 0, "bytes": stats[0]["bytes"]}
+    texts = [[e["segments"] for e in events if e["type"] == "result"] for _, events in runs]
+    assert texts[0] == texts[1]
@@ -0,0 +1,37 @@
+import numpy as np
+
+
+def test_append_grows_by_doubling_and_keeps_contents(asr):
+    buf = asr.SegmentBuffer(4)
+    for i in range(5):
+        buf.append(np.full(3, i, dtype=np.float32))
+    assert len(buf) == 15
+    np.testing.assert_array_equal(buf.view(), np.repeat(np.arange(5, dtype=np.float32), 3))
+    assert buf._data.size == 16  # pylint: disable=protected-access
+
+
+def test_view_is_zero_copy(asr):
+    buf = asr.SegmentBuffer(8)
+    buf.append(np.ones(5, dtype=np.float32))
+    assert buf.view().base is buf._data  # pylint: disable=protected-access
+
+
+def test_detached_audio_survives_further_appends(asr):
+    buf = asr.SegmentBuffer(8)
+    buf.append(np.ones(6, dtype=np.float32))
+    out = buf.detach()
+    assert len(buf) == 0
+    buf.append(np.full(8, 2.0, dtype=np.float32))
+    np.testing.assert_array_equal(out, np.ones(6))
+    assert not np.shares_memory(out, buf.view())
+    assert buf.detach().tolist() == [2.0] * 8
+    assert buf.detach().size == 0
+
+
+def test_clear_reuses_storage(asr):
+    buf = asr.SegmentBuffer(8)
+    buf.append(np.ones(6, dtype=np.float32))
+    storage = buf._data  # pylint: disable=protected-access
+    buf.clear()
+    buf.append(np.zeros(2, dtype=np.float32))
+    assert buf._data is storage and len(buf) == 2  # pylint: disable=protected-access
@@ -0,0 +1,28 @@
+import numpy as np
+
+from conftest import silence, speech_like, write_wav
+
+
+def test_parse_transcribe_command(asr, tmp_path):
+    assert asr.parse_transcribe_command("job-7 /data/a.wav", 1) == ("job-7", "/data/a.wav")
+    assert asr.parse_transcribe_command("/data/a.wav", 3) == ("job-3", "/data/a.wav")
+    spaced = tmp_path / "with space.wav"
+    spaced.write_bytes(b"")
+    assert asr.parse_transcribe_command(str(spaced), 2) == ("job-2", str(spaced))
+
+
+def test_serve_keeps_models_loaded_across_jobs(tmp_path, run_asr):
+    wav = write_wav(tmp_path / "a.wav", np.concatenate([silence(0.5), speech_like(1.5), silence(1.0), speech_like(1.0), silence(0.8)]))
+    commands = f'transcribe job-a {wav}\n{{"id": "9", "cmd": "transcribe", "arg": "{tmp_path / "missing.wav"}"}}\ntranscribe {wav}\nquit\n'
+    returncode, events = run_asr("--serve", commands=commands)
+    assert returncode == 0
+    assert sum(e["type"] == "ready" for e in events) == 1
+    results = [e for e in events if e["type"] == "result"]
+    assert {e["job_id"] for e in results} == {"job-a", "job-3"}
+    assert len([e for e in results if e["job_id"] == "job-a"]) == 2
+    completes = [e for e in events if e["type"] == "complete"]
+    assert [e.get("job_id") for e in completes] == ["job-a", "job-3", None]
+    assert completes[-1]["message"] == "Batch server stopped after 3 job(s)"
+    error = next(e for e in events if e["type"] == "error")
+    assert error["job_id"] == "job-2" and "not found" in error["message"]
+    assert {"type": "ack", "id": "9", "cmd": "transcribe", "ok": False} in events
@@ -0,0 +1,90 @@
+import json
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from conftest import FAKES_DIR, SCRIPT, USING_FAKES, silence, speech_like
+
+
+class Server:
+    """The helper in --sessions-listen mode, with its events read on a thread."""
+
+    def __init__(self, model_args, *args):
+        env = dict(os.environ)
+        if USING_FAKES:
+            env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(FAKES_DIR), env.get("PYTHONPATH", "")]))
+        self.proc = subprocess.Popen(
+            [sys.executable, str(SCRIPT), *model_args, *args],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+        )
+        self.events = []
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            if line.startswith(b"{"):
+                self._lines.put(json.loads(line))
+
+    def wait_for(self, predicate, timeout=30.0):
+        deadline = time.monotonic() + timeout
+        while not any(predicate(e) for e in self.events):
+            self.events.append(self._lines.get(timeout=max(0.0, deadline - time.monotonic())))
+
+    def stop(self):
+        self.proc.stdin.write(b"quit\n")
+        self.proc.stdin.close()
+        returncode = self.proc.wait(timeout=30)
+        while not self._lines.empty():
+            self.events.append(self._lines.get())
+        return returncode
+
+
+def utterance(seconds, seed):
+    audio = np.concatenate([silence(0.3), speech_like(seconds, seed=seed), silence(1.0)])
+    return (audio * 32767).astype("<i2").tobytes()
+
+
+def accepted_or_rejected(events):
+    return sum(e["type"] == "session" or (e["type"] == "log" and "Rejecting connection" in e["message"]) for e in events)
+
+
+def test_concurrent_sessions_share_models(model_args, tmp_path):
+    address = f"unix://{tmp_path / 'asr.sock'}"
+    server = Server(model_args, "--sessions-listen", address, "--max-sessions", "2")
+    try:
+        server.wait_for(lambda e: e["type"] == "ready")
+        time.sleep(0.2)
+        clients = []
+        for _ in range(3):
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.connect(str(tmp_path / "asr.sock"))
+            clients.append(client)
+            # Connect one at a time so the third is the one rejected
+            server.wait_for(lambda e, n=len(clients): accepted_or_rejected(server.events) >= n)
+        for client, (seconds, seed) in zip(clients[:2], [(1.0, 3), (2.0, 4)]):
+            client.sendall(utterance(seconds, seed))
+        for client in clients:
+            client.close()
+        server.wait_for(lambda e: sum(x.get("state") == "closed" for x in server.events) == 2)
+    finally:
+        returncode = server.stop()
+    assert returncode == 0
+    assert sum(e["type"] == "ready" for e in server.events) == 1
+    assert any(e["type"] == "log" and "Rejecting connection" in e["message"] for e in server.events)
+    closed = {e["session"]: e["audio_seconds"] for e in server.events if e.get("state") == "closed"}
+    assert closed == {"s1": 2.3, "s2": 3.3}
+    results = [e for e in server.events if e["type"] == "result"]
+    assert {e["session"] for e in results} == {"s1", "s2"}
+    for result in results:
+        assert all(seg["speaker"] == result["session"] for seg in result["segments"])
+    assert server.events[-1] == {"type": "complete", "message": "Multi-session server stopped"}
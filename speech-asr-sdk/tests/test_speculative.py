@@ -0,0 +1,29 @@
+import numpy as np
+
+from conftest import silence, speech_like, write_wav
+
+
+def run(tmp_path, run_asr, *extra):
+    # One token after a second of speech, then silence until the fake endpoint at 2 s
+    wav = write_wav(tmp_path / "a.wav", np.concatenate([speech_like(1.2), silence(0.8)]))
+    returncode, events = run_asr("--benchmark", str(wav), "--silero-vad-model", str(tmp_path / "none.onnx"), *extra)
+    assert returncode == 0
+    results = [seg for e in events if e["type"] == "result" for seg in e["segments"]]
+    report = next(e for e in events if e["type"] == "benchmark")
+    return results, report
+
+
+def test_pause_commits_the_speculative_decode(tmp_path, run_asr):
+    results, report = run(tmp_path, run_asr, "--speculative-pause", "0.3")
+    assert report["speculative"] == {"launched": 1, "committed": 1, "discarded": 0}
+    first = results[0]
+    assert (first["start_time"], first["end_time"]) == (0.0, 2.0)
+    # The fake names its text after the audio length: the partial settled at 1.0 s,
+    # so the decode started 0.3 s later and covered 1.3 s of audio
+    assert first["text"] == "seg20800"
+
+
+def test_speculation_is_off_by_default(tmp_path, run_asr):
+    results, report = run(tmp_path, run_asr)
+    assert "speculative" not in report
+    assert results[0]["text"] == "seg32000"
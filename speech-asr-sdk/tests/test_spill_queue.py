@@ -0,0 +1,63 @@
+import os
+import queue
+import threading
+
+import numpy as np
+import pytest
+
+
+def task(n, value):
+    return (np.full(n, value, dtype=np.float32), f"meta-{value}")
+
+
+def test_overflow_is_spooled_and_read_back_in_order(asr, tmp_path):
+    spill = asr.SpillQueue(2, str(tmp_path))
+    spilled = [spill.put_nowait(task(100 + i, i)) for i in range(5)]
+    assert spilled == [False, False, True, True, True]
+    stats = spill.stats(16000)
+    assert stats["queue_depth"] == 2 and stats["spooled_segments"] == 3
+    assert stats["spool_bytes"] == (102 + 103 + 104) * 4
+    assert len(os.listdir(tmp_path)) == 1
+    for i in range(5):
+        audio, meta = spill.get_nowait()
+        assert meta == f"meta-{i}"
+        np.testing.assert_array_equal(audio, np.full(100 + i, i, dtype=np.float32))
+    with pytest.raises(queue.Empty):
+        spill.get_nowait()
+    spill.close()
+    assert not os.listdir(tmp_path)
+
+
+def test_spool_keeps_fifo_after_memory_frees_up(asr, tmp_path):
+    spill = asr.SpillQueue(1, str(tmp_path))
+    spill.put_nowait(task(10, 0))
+    spill.put_nowait(task(10, 1))
+    assert spill.get_nowait()[1] == "meta-0"
+    # Memory has room again, but an older task is still on disk
+    assert spill.put_nowait(task(10, 2)) is True
+    assert [spill.get_nowait()[1] for _ in range(2)] == ["meta-1", "meta-2"]
+    assert spill.stats(16000)["spool_bytes"] == 0
+    spill.close()
+
+
+def test_sentinel_passes_through_the_spool(asr, tmp_path):
+    spill = asr.SpillQueue(1, str(tmp_path))
+    spill.put_nowait(task(10, 0))
+    spill.put_nowait(None)
+    assert spill.get_nowait()[1] == "meta-0"
+    assert spill.get_nowait() is None
+    spill.close()
+
+
+def test_join_waits_for_task_done(asr, tmp_path):
+    spill = asr.SpillQueue(4, str(tmp_path))
+    spill.put_nowait(task(10, 0))
+    assert spill.join(timeout=0.05) is False
+
+    def worker():
+        spill.get()
+        spill.task_done()
+
+    threading.Thread(target=worker).start()
+    assert spill.join(timeout=2.0) is True
+    spill.close()
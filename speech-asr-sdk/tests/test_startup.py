@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from conftest import FAKES_DIR, SDK_DIR, USING_FAKES, speech_like, write_wav
+
+
+def test_models_are_built_in_parallel(asr, make_args, monkeypatch):
+    def slow(name):
+        def build(args):
+            time.sleep(0.3)
+            return name
+
+        return build
+
+    monkeypatch.setattr(asr, "create_first_pass", slow("first"))
+    monkeypatch.setattr(asr, "create_second_pass", slow("second"))
+    monkeypatch.setattr(asr, "create_vad", slow("vad"))
+    started = time.monotonic()
+    first_pass, second_pass, vad_bundle, build_ms = asr.load_models(make_args())
+    assert time.monotonic() - started < 0.8
+    assert (first_pass, second_pass, vad_bundle) == ("first", "second", "vad")
+    assert set(build_ms) == {"first_pass_ms", "second_pass_ms", "vad_ms"}
+    assert asr.load_models(make_args(), need_first_pass=False)[0] is None
+
+
+def test_warm_up_touches_every_model_and_resets_the_vad(asr, make_args):
+    args = make_args()
+    first_pass = asr.create_first_pass(args)
+    vad_bundle = asr.create_vad(args)
+    timings = asr.warm_up(args, first_pass, asr.create_second_pass(args), vad_bundle)
+    assert set(timings) == {"warmup_second_pass_ms", "warmup_first_pass_ms", "warmup_vad_ms"}
+    assert vad_bundle[0].empty() and not vad_bundle[0].is_speech_detected()
+
+
+def test_import_does_not_load_sounddevice():
+    env = dict(os.environ)
+    if USING_FAKES:
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(FAKES_DIR), env.get("PYTHONPATH", "")]))
+    code = "import sys, two_pass_microphone_asr_electron; print('sounddevice' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=SDK_DIR, env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_file_mode_reports_a_startup_breakdown(tmp_path, run_asr):
+    wav = write_wav(tmp_path / "a.wav", np.concatenate([speech_like(1.0), np.zeros(8000, dtype=np.float32)]))
+    returncode, events = run_asr("--wav-input", str(wav), "--warmup")
+    assert returncode == 0
+    startup = next(e for e in events if e.get("name") == "startup")
+    assert {"second_pass_ms", "vad_ms", "import_ms", "load_ms", "total_ms", "warmup_second_pass_ms"} <= set(startup)
+    # File modes never build the streaming first pass
+    assert "first_pass_ms" not in startup and "warmup_first_pass_ms" not in startup
+    assert startup["total_ms"] >= startup["load_ms"]
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+
+def ramp(start, n):
+    return np.arange(start, start + n, dtype=np.float32)
+
+
+def test_context_mode_prepends_tail_only_when_contiguous(asr):
+    carry = ramp(0, 4)
+    audio, next_carry, context = asr.apply_tail_padding(carry, ramp(4, 6), 4, "context", contiguous=True)
+    np.testing.assert_array_equal(audio, ramp(0, 10))
+    np.testing.assert_array_equal(next_carry, ramp(6, 4))
+    assert context == 4
+    audio, _, context = asr.apply_tail_padding(carry, ramp(100, 6), 4, "context", contiguous=False)
+    np.testing.assert_array_equal(audio, ramp(100, 6))
+    assert context == 0
+
+
+def test_duplicate_mode_always_prepends_without_context(asr):
+    audio, _, context = asr.apply_tail_padding(ramp(0, 4), ramp(100, 6), 4, "duplicate", contiguous=False)
+    np.testing.assert_array_equal(audio, np.concatenate([ramp(0, 4), ramp(100, 6)]))
+    assert context == 0
+
+
+def test_short_segments_and_disabled_padding(asr):
+    empty = np.zeros(0, dtype=np.float32)
+    _, next_carry, _ = asr.apply_tail_padding(empty, ramp(0, 3), 4)
+    np.testing.assert_array_equal(next_carry, ramp(0, 3))
+    audio, next_carry, context = asr.apply_tail_padding(ramp(0, 4), ramp(4, 6), 0)
+    assert next_carry.size == 0 and context == 4 and len(audio) == 10
+
+
+ENTRY = {
+    "text": "Hello world.",
+    "tokens": ["<|zh|>", "▁hel", "lo", "▁world"],
+    "timestamps": [0.0, 0.1, 0.2, 0.3],
+}
+
+
+@pytest.mark.parametrize(
+    "entry, context, expected",
+    [
+        (ENTRY, 0.0, "Hello world."),
+        (ENTRY, 0.25, "world"),
+        (ENTRY, 0.15, "lo world"),
+        (ENTRY, 0.05, "hello world"),
+        (dict(ENTRY, timestamps=[0.0]), 0.25, "Hello world."),
+        ({"text": "ok"}, 0.5, "ok"),
+    ],
+)
+def test_drop_context_tokens(asr, entry, context, expected):
+    assert asr.drop_context_tokens(entry, context) == expected
+
+
+def test_context_tokens_are_dropped_after_decoding(asr, monkeypatch):
+    # The fake second pass times a token every 0.1 s, so 0.25 s of context drops three
+    monkeypatch.setattr(asr, "second_pass_cache", None)
+    recognizer = asr.sherpa_onnx.OfflineRecognizer.from_sense_voice()
+    texts = asr.run_second_pass_batch(recognizer, [np.ones(8000, dtype=np.float32)] * 2, 16000, [0.0, 0.25])
+    assert texts == ["seg8000", "t3t4"]
@@ -0,0 +1,65 @@
+import pytest
+
+
+@pytest.fixture
+def cpus(asr, monkeypatch):
+    """Pretend this process may run on CPUs 0-7 with no cgroup quota."""
+    state = {"cpus": list(range(8)), "quota": None}
+    monkeypatch.setattr(asr.os, "sched_getaffinity", lambda pid: set(state["cpus"]), raising=False)
+    monkeypatch.setattr(asr, "cgroup_cpu_quota", lambda: state["quota"])
+    monkeypatch.setattr(asr, "cpu_sets", {})
+    return state
+
+
+def test_split_cpus_reserves_the_last_cores_for_the_first_pass(asr):
+    assert asr.split_cpus([0, 1, 2, 3], 1) == {"first_pass": [3], "second_pass": [0, 1, 2], "all": [0, 1, 2, 3]}
+    assert asr.split_cpus([0, 1], 4) == {"first_pass": [1], "second_pass": [0], "all": [0, 1]}
+    assert asr.split_cpus([5], 1) == {"all": [5]}
+    assert asr.split_cpus([0, 1, 2], 0) == {"all": [0, 1, 2]}
+
+
+def test_cgroup_quota_caps_the_budget(asr, cpus):
+    assert asr.available_cpus() == (list(range(8)), 8)
+    cpus["quota"] = 2.5
+    assert asr.available_cpus() == (list(range(8)), 3)
+    cpus["quota"] = 0.2
+    assert asr.available_cpus()[1] == 1
+
+
+def test_auto_plan_splits_the_budget(asr, cpus, make_args, events):
+    args = make_args("--thread-allocation", "auto")
+    asr.plan_threads(args, need_first_pass=True)
+    assert (args.num_threads_first, args.num_threads_second) == (2, 6)
+    assert asr.cpu_sets["first_pass"] == [6, 7]
+    report = next(e for e in events if e.get("name") == "threads")
+    assert report["budget"] == 8 and report["second_cpus"] == list(range(6))
+
+    cpus["quota"] = 3.0
+    asr.plan_threads(args, need_first_pass=True)
+    assert (args.num_threads_first, args.num_threads_second) == (1, 2)
+
+
+def test_file_modes_give_the_second_pass_everything(asr, cpus, make_args, events):
+    args = make_args("--thread-allocation", "auto")
+    asr.plan_threads(args, need_first_pass=False)
+    assert args.num_threads_second == 8 and not asr.cpu_sets
+    assert events[-1]["first_threads"] == 0
+
+
+def test_fixed_allocation_is_left_alone(asr, cpus, make_args, events):
+    args = make_args("--num-threads-first", "3", "--num-threads-second", "5")
+    asr.plan_threads(args, need_first_pass=True)
+    assert (args.num_threads_first, args.num_threads_second) == (3, 5)
+    assert not events and not asr.cpu_sets
+
+
+def test_pin_thread_uses_the_role_set(asr, monkeypatch):
+    pinned = []
+    monkeypatch.setattr(asr.os, "sched_setaffinity", lambda pid, cpus: pinned.append(list(cpus)), raising=False)
+    monkeypatch.setattr(asr, "cpu_sets", {"first_pass": [7], "all": [0, 7]})
+    asr.pin_thread("first_pass")
+    asr.pin_thread("vad")
+    assert pinned == [[7], [0, 7]]
+    monkeypatch.setattr(asr, "cpu_sets", {})
+    asr.pin_thread("first_pass")
+    assert len(pinned) == 2
@@ -0,0 +1,152 @@
+import threading
+import types
+
+import numpy as np
+import pytest
+
+from conftest import silence, speech_like, write_wav
+
+RATE = 16000
+
+
+def feed_blocks(chunker, audio, block=1600):
+    pieces = []
+    for i in range(0, len(audio), block):
+        pieces.extend(chunker.feed(audio[i : i + block]))
+    return pieces
+
+
+def test_window_pieces_tile_the_recording(asr):
+    chunker = asr.UtteranceChunker(RATE, "window", window_seconds=2.0, overlap_seconds=0.5)
+    audio = speech_like(7.3)
+    pieces = feed_blocks(chunker, audio) + chunker.finish()
+    position = 0
+    for i, (piece, start, context) in enumerate(pieces):
+        assert start == position
+        own = piece[context:]
+        np.testing.assert_array_equal(own, audio[position : position + len(own)])
+        if i:
+            # Left context is the tail of the previous piece
+            assert context == RATE // 2
+            np.testing.assert_array_equal(piece[:context], audio[position - context : position])
+        else:
+            assert context == 0
+        if i < len(pieces) - 1:
+            assert RATE <= len(own) <= 2 * RATE
+        position += len(own)
+    assert position == len(audio)
+
+
+def test_window_cut_lands_in_the_quiet_part(asr):
+    chunker = asr.UtteranceChunker(RATE, "window", window_seconds=2.0, overlap_seconds=0.0)
+    audio = np.concatenate([speech_like(1.6), silence(0.1), speech_like(1.0)])
+    pieces = feed_blocks(chunker, audio)
+    assert len(pieces) == 1
+    cut = len(pieces[0][0])
+    assert int(1.6 * RATE) <= cut <= int(1.7 * RATE)
+
+
+def test_vad_mode_cuts_at_vad_segments_and_reset_base(asr):
+    chunker = asr.UtteranceChunker(RATE, "vad", 10.0, 0.5, vad_bundle=(asr.sherpa_onnx.VoiceActivityDetector(None), 512))
+    assert chunker.mode == "vad"
+    chunker.reset(base=48000)
+    audio = np.concatenate([silence(0.5), speech_like(1.0), silence(1.0), speech_like(1.0)])
+    pieces = feed_blocks(chunker, audio)
+    assert len(pieces) == 1
+    rest = chunker.finish()
+    assert len(rest) == 1
+    (first, first_start, _), (second, second_start, _) = pieces[0], rest[0]
+    assert first_start >= 48000 + int(0.4 * RATE)
+    assert second_start > first_start + len(first) - RATE
+
+
+def test_falls_back_to_window_mode_without_vad(asr):
+    assert asr.UtteranceChunker(RATE, "vad", 10.0, 0.5).mode == "window"
+
+
+def test_streaming_manual_mode_decodes_pieces_while_recording(tmp_path, run_asr):
+    wav = write_wav(tmp_path / "long.wav", np.concatenate([speech_like(7.0), silence(0.5)]))
+    returncode, events = run_asr(
+        "--source", f"file:{wav}",
+        "--source-speed", "4",
+        "--start-paused",
+        "--manual-chunking", "window",
+        "--manual-chunk-seconds", "2",
+        commands="mode manual\nstart\n",
+    )
+    assert returncode == 0
+    segments = [seg for e in events if e["type"] == "result" for seg in e["segments"]]
+    assert len(segments) >= 4
+    assert segments[0]["start_time"] == 0.0
+    for previous, current in zip(segments, segments[1:]):
+        assert current["start_time"] == previous["end_time"]
+    flushed = [e["message"] for e in events if e.get("message", "").startswith("Flushing buffered audio")]
+    assert len(flushed) == 1
+
+
+class SlowBlock(np.ndarray):
+    """Callback buffer whose reshape() stalls until released, widening the callback's race window."""
+
+    entered = threading.Event()
+    release = threading.Event()
+
+    def reshape(self, *shape):
+        SlowBlock.entered.set()
+        SlowBlock.release.wait(5.0)
+        return np.asarray(self).reshape(*shape)
+
+
+def test_manual_mode_drops_blocks_that_arrive_after_stop(asr, make_args, events, monkeypatch):
+    calls = []
+
+    class RecordingChunker(asr.UtteranceChunker):
+        def feed(self, samples):
+            calls.append("feed")
+            return super().feed(samples)
+
+        def finish(self):
+            calls.append("finish")
+            return super().finish()
+
+    class Stream:
+        def __init__(self, callback=None, **kwargs):
+            streams.append(callback)
+
+        start = stop = close = lambda self: None
+
+    class Controls:
+        def __init__(self, handlers, on_close=None):
+            controls.update(handlers, close=on_close)
+
+        def start(self):
+            ready.set()
+
+    streams, controls, ready = [], {}, threading.Event()
+    device = types.SimpleNamespace(
+        query_devices=lambda *a: [{"name": "mic", "max_input_channels": 1}],
+        default=types.SimpleNamespace(device=[0, 0]),
+        InputStream=Stream,
+    )
+    monkeypatch.setattr(asr, "sd", device)
+    monkeypatch.setattr(asr, "ControlPlane", Controls)
+    monkeypatch.setattr(asr, "UtteranceChunker", RecordingChunker)
+    monkeypatch.setattr(asr, "run_second_pass_batch", lambda rec, pieces, rate, contexts: [""] * len(pieces))
+    args = make_args("--manual-chunking", "window")
+    session = threading.Thread(target=lambda: pytest.raises(SystemExit, asr.run_manual_mode, args, None))
+    session.start()
+    assert ready.wait(5.0)
+    assert controls["start"]("")
+    streams[0](speech_like(0.1).reshape(-1, 1), 1600, None, None)
+
+    late = threading.Thread(target=streams[0], args=(speech_like(0.1).reshape(-1, 1).view(SlowBlock), 1600, None, None))
+    late.start()
+    assert SlowBlock.entered.wait(5.0)
+    controls["stop"]("")  # the remainder is decoded before this returns
+    SlowBlock.release.set()
+    late.join(5.0)
+    # A second recording flushes the worker's queue: a leaked block would be fed before its finish()
+    assert controls["start"]("")
+    controls["stop"]("")
+    controls["close"]()
+    session.join(5.0)
+    assert calls == ["feed", "finish", "finish"]
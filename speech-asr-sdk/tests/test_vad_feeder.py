@@ -0,0 +1,68 @@
+import numpy as np
+
+from conftest import silence, speech_like
+
+
+class RecordingVad:
+    """Wraps the (fake) VAD and records the length of every accept_waveform call."""
+
+    def __init__(self, asr):
+        self.inner = asr.sherpa_onnx.VoiceActivityDetector(asr.sherpa_onnx.VadModelConfig())
+        self.calls = []
+
+    def accept_waveform(self, samples):
+        self.calls.append(len(samples))
+        self.inner.accept_waveform(samples)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+def feed(feeder, audio, block):
+    found = []
+    for i in range(0, len(audio), block):
+        found += feeder.accept(audio[i : i + block])
+    return found
+
+
+def test_whole_windows_are_fed_in_bulk(asr):
+    vad = RecordingVad(asr)
+    feeder = asr.VadFeeder(vad, 512, 16000)
+    feed(feeder, silence(0.5), 1600)
+    assert all(n % 512 == 0 for n in vad.calls)
+    assert sum(vad.calls) == 8000 - 8000 % 512
+    assert len(feeder.carry) == 8000 % 512
+
+
+def test_segments_are_views_of_the_fed_audio(asr):
+    audio = np.concatenate([silence(0.5), speech_like(1.0), silence(1.0)])
+    feeder = asr.VadFeeder(RecordingVad(asr), 512, 16000)
+    (start, segment), = feed(feeder, audio, 1600)
+    np.testing.assert_array_equal(segment, audio[start : start + len(segment)])
+    assert abs(start - 8000) < 512
+    assert np.shares_memory(segment, feeder.history._data)  # pylint: disable=protected-access
+
+
+def test_flush_closes_the_open_segment(asr):
+    audio = np.concatenate([silence(0.2), speech_like(0.7)])
+    feeder = asr.VadFeeder(RecordingVad(asr), 512, 16000)
+    assert feed(feeder, audio, 1000) == []
+    (start, segment), = feeder.flush()
+    # The remainder is zero-padded to a whole window
+    assert start + len(segment) == len(audio) + (-len(audio)) % 512
+    np.testing.assert_array_equal(segment[: len(audio) - start], audio[start:])
+
+
+def test_reset_offsets_later_segments(asr):
+    feeder = asr.VadFeeder(RecordingVad(asr), 512, 16000)
+    feed(feeder, speech_like(0.5), 1600)
+    feeder.reset(base=48000)
+    (start, _), = feed(feeder, np.concatenate([speech_like(0.5), silence(1.0)]), 1600)
+    assert start == 48000
+
+
+def test_history_stays_bounded(asr):
+    feeder = asr.VadFeeder(RecordingVad(asr), 512, 16000, keep_seconds=2.0)
+    for seed in range(6):
+        feed(feeder, np.concatenate([speech_like(0.5, seed=seed), silence(1.0)]), 1600)
+    assert len(feeder.history) <= 3 * 16000
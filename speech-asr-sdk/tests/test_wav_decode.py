@@ -0,0 +1,59 @@
+import random
+import time
+
+import numpy as np
+
+from conftest import silence, speech_like, write_wav
+
+
+class JitteryRecognizer:
+    """Fake SenseVoice whose decodes finish in random order."""
+
+    def __init__(self, asr):
+        self.inner = asr.sherpa_onnx.OfflineRecognizer.from_sense_voice()
+        self.random = random.Random(0)
+
+    def create_stream(self):
+        return self.inner.create_stream()
+
+    def decode_stream(self, stream):
+        time.sleep(self.random.uniform(0.0, 0.03))
+        self.inner.decode_stream(stream)
+
+    def decode_streams(self, streams):
+        for stream in streams:
+            self.decode_stream(stream)
+
+
+def utterances(count):
+    parts = []
+    for i in range(count):
+        parts += [silence(0.6, seed=i), speech_like(0.4 + 0.1 * i, seed=i)]
+    return np.concatenate(parts + [silence(0.6)])
+
+
+def results(events):
+    return [seg for e in events if e["type"] == "result" for seg in e["segments"]]
+
+
+def test_parallel_workers_keep_timestamp_order(asr, events, make_args, tmp_path):
+    wav = write_wav(tmp_path / "long.wav", utterances(8))
+    outputs = {}
+    for workers in (1, 4):
+        events.clear()
+        args = make_args("--wav-input", str(wav), "--wav-workers", str(workers), "--second-batch-size", "1")
+        asr.transcribe_wav(args, JitteryRecognizer(asr), asr.create_vad(args), wav)
+        outputs[workers] = results(events)
+        assert events[-1]["name"] == "wav-decode" and events[-1]["workers"] == workers
+    assert len(outputs[1]) == 8
+    assert outputs[4] == outputs[1]
+    starts = [seg["start_time"] for seg in outputs[4]]
+    assert starts == sorted(starts)
+
+
+def test_without_vad_the_file_is_one_segment(asr, events, make_args, tmp_path):
+    wav = write_wav(tmp_path / "short.wav", speech_like(1.25))
+    args = make_args("--wav-input", str(wav))
+    asr.transcribe_wav(args, asr.sherpa_onnx.OfflineRecognizer.from_sense_voice(), None, wav)
+    assert results(events) == [{"start_time": 0.0, "end_time": 1.25, "text": "seg20000", "speaker": "PushToTalk"}]
+    assert events[-1]["audio_seconds"] == 1.25
@@ -0,0 +1,49 @@
+import wave
+
+import numpy as np
+import pytest
+
+from conftest import speech_like, write_wav
+
+
+def test_blocks_are_fixed_size_and_match_the_file(asr, tmp_path):
+    audio = speech_like(1.0, amplitude=0.1)
+    wav = write_wav(tmp_path / "a.wav", audio)
+    blocks = list(asr.iter_wav_float_mono(wav, 16000, 3000))
+    assert [len(b) for b in blocks] == [3000] * 5 + [1000]
+    assert all(b.dtype == np.float32 for b in blocks)
+    np.testing.assert_allclose(np.concatenate(blocks), audio, atol=1e-4)
+
+
+def test_blocks_are_produced_lazily(asr, tmp_path, monkeypatch):
+    wav = write_wav(tmp_path / "a.wav", speech_like(2.0))
+    reads = []
+    original = wave.Wave_read.readframes
+    monkeypatch.setattr(wave.Wave_read, "readframes", lambda self, n: reads.append(n) or original(self, n))
+    blocks = asr.iter_wav_float_mono(wav, 16000, 1600)
+    next(blocks)
+    assert reads == [1600]
+    blocks.close()
+
+
+def test_read_wav_float_mono_returns_the_whole_file(asr, tmp_path):
+    audio = speech_like(2.5, amplitude=0.1)
+    wav = write_wav(tmp_path / "a.wav", audio)
+    out = asr.read_wav_float_mono(wav, 16000)
+    assert out.dtype == np.float32 and len(out) == len(audio)
+    np.testing.assert_allclose(out, audio, atol=1e-4)
+
+
+class StubReader:
+    def __init__(self, channels, sampwidth):
+        self.getnchannels = lambda: channels
+        self.getsampwidth = lambda: sampwidth
+        self.getframerate = lambda: 16000
+
+
+def test_check_wav_format(asr):
+    assert asr.check_wav_format(StubReader(2, 3)) == (2, 3, 16000)
+    with pytest.raises(ValueError, match="sample width"):
+        asr.check_wav_format(StubReader(1, 5))
+    with pytest.raises(ValueError, match="channel count"):
+        asr.check_wav_format(StubReader(0, 2))
@@ -13,32 +13,50 @@ events to the renderer. Event types:
   - {"type": "error", "message": "..."}          # unrecoverable error
   - {"type": "first-pass", "text": "..."}        # streaming partial text
   - {"type": "result", "stage": "second-pass",
-     "segments": [{"start_time": 0.0, "end_time": 1.2, "text": "..."}]}
+     "segments": [{"start_time": 0.0, "end_time": 1.2, "text": "..."}],
+     "timings": {"endpoint_to_final_ms": 180.0, ...}}  # streaming mode only
+  - {"type": "complete", "message": "..."}       # job / session finished
+  - {"type": "metrics", "name": "...", ...}      # queue depth / spool size / lag
+  - {"type": "benchmark", "rtf": 0.1, ...}       # --benchmark report
+
+Commands arrive on stdin as plain lines ("start", "mode manual") or JSON
+({"id": "7", "cmd": "device", "arg": "2"}); JSON commands with an id are
+acknowledged with {"type": "ack", "id": "7", "cmd": "device", "ok": true}.
+
+In --serve mode every per-file event additionally carries "job_id"; with
+--sessions-listen events carry "session" and {"type": "session", "state": ...}
+marks connections opening and closing.
 """
 
+import abc
 import argparse
+import asyncio
+import atexit
+import collections
+import hashlib
 import json
+import math
+import os
 import sys
 import queue
+import socket
+import stat
+import tempfile
 import threading
+import time
+import wave
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
-import numpy as np
+# Start of the startup clock reported in the "startup" metrics event
+STARTED_AT = time.monotonic()
 
-try:
-    import sounddevice as sd
-except ImportError:
-    sys.stdout.write(
-        json.dumps(
-            {
-                "type": "error",
-                "message": "sounddevice is required. Install with: pip install sounddevice",
-            }
-        )
-        + "\n"
-    )
-    sys.exit(1)
+import numpy as np  # pylint: disable=wrong-import-position
+
+# sounddevice (and PortAudio behind it) is imported by require_sounddevice()
+# only when a microphone is actually used
+sd = None
 
 try:
     import sherpa_onnx
@@ -58,13 +76,128 @@ except ImportError:
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 
 
-def emit(payload: dict):
-    """Emit a single JSON line for Electron."""
-    sys.stdout.write(json.dumps(payload, ensure_ascii=False) + "\n")
-    sys.stdout.flush()
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+_log_threshold = LOG_LEVELS["info"]
+
+
+def encode_event(payload: dict) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload) + b"\n"
+        except TypeError:
+            pass  # e.g. numpy scalars; the stdlib encoder is the reference anyway
+    return (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class EventWriter:
+    """Serialise and write NDJSON events on a dedicated thread.
+
+    Callers only append to a deque, so a slow pipe never stalls the audio
+    callback or a decoder. Everything queued since the last wakeup goes out in
+    one write + flush. Once `limit` events are pending, lossy events (logs,
+    partials, metrics) are dropped and counted; results, errors and acks are
+    always kept. `partials_dropped` only ever grows, so diff-mode trackers can
+    tell that the receiver missed an update and resync.
+    """
+
+    LOSSY_TYPES = ("log", "first-pass", "metrics")
+
+    def __init__(self, limit: int = 1024):
+        self.limit = limit
+        self.pending: collections.deque = collections.deque()
+        self.dropped = 0
+        self.partials_dropped = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+
+    def put(self, payload: dict):
+        with self.cond:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="ndjson-writer", daemon=True)
+                self.thread.start()
+            if len(self.pending) >= self.limit and payload.get("type") in self.LOSSY_TYPES:
+                self.dropped += 1
+                if payload["type"] == "first-pass":
+                    self.partials_dropped += 1
+                return
+            self.pending.append(payload)
+            self.cond.notify()
+
+    def close(self, timeout: float = 2.0):
+        """Drain pending events and stop the writer (registered with atexit)."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def _run(self):
+        out = getattr(sys.stdout, "buffer", None)
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                batch, self.pending = self.pending, collections.deque()
+                dropped, self.dropped = self.dropped, 0
+                closed = self.closed
+            if dropped:
+                batch.append({"type": "log", "message": f"Dropped {dropped} event(s) while stdout was backed up"})
+            if batch:
+                data = b"".join(encode_event(payload) for payload in batch)
+                try:
+                    if out is not None:
+                        out.write(data)
+                    else:
+                        sys.stdout.write(data.decode("utf-8"))
+                    sys.stdout.flush()
+                except (OSError, ValueError):
+                    return  # Electron went away; nothing left to report to
+            if closed:
+                return
+
+
+_writer = EventWriter()
+atexit.register(_writer.close)
+
+
+def set_log_level(name: str):
+    global _log_threshold  # pylint: disable=global-statement
+    _log_threshold = LOG_LEVELS[name]
+
+
+def log_enabled(level: str) -> bool:
+    return LOG_LEVELS[level] >= _log_threshold
+
+
+def emit(payload: dict, level: str = "info"):
+    """Queue a single JSON line for Electron; "log" events below --log-level are skipped."""
+    if payload.get("type") == "log" and not log_enabled(level):
+        return
+    _writer.put(payload)
+
+
+def require_sounddevice():
+    """Import sounddevice on first use; file, stdin and socket runs never need it."""
+    global sd  # pylint: disable=global-statement
+    if sd is None:
+        try:
+            import sounddevice  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            emit({"type": "error", "message": "sounddevice is required. Install with: pip install sounddevice"})
+            sys.exit(1)
+        sd = sounddevice
+    return sd
 
 
 def log_devices():
+    require_sounddevice()
     devices = sd.query_devices()
     names = [
         {
@@ -92,6 +225,7 @@ def name_tokens(name: str):
 
 
 def choose_input_device(preferred_name: str, preferred_index: int) -> int:
+    require_sounddevice()
     devices = sd.query_devices()
     default_idx = sd.default.device[0]
     fallback_idx = next(
@@ -174,26 +308,71 @@ def get_args():
     parser.add_argument("--num-threads-first", default=2, type=int, help="Threads for 1st pass")
     parser.add_argument("--provider-first", default="cpu", type=str, help="Inference provider for 1st pass")
 
-    parser.add_argument("--second-model", required=True, type=str, help="SenseVoice model path (model.onnx or model.int8.onnx)")
-    parser.add_argument("--second-tokens", required=True, type=str, help="tokens.txt for SenseVoice")
+    parser.add_argument("--second-model", default="", type=str, help="SenseVoice model path (model.onnx or model.int8.onnx); required unless --model-dir provides one")
+    parser.add_argument("--second-tokens", default="", type=str, help="tokens.txt for SenseVoice")
+    parser.add_argument("--model-dir", default="", type=str, help="Directory holding the model packages; fills in any --first-*/--second-*/--silero-vad-model path not given, choosing between fp32 and int8 variants")
+    parser.add_argument("--model-variant", default="auto", choices=["auto", "int8", "fp32"], help="Variant to use from --model-dir (auto: profiled choice with --model-profile, else int8); a missing variant falls back to the other")
+    parser.add_argument("--model-profile", action="store_true", help="With --model-variant auto, time each variant on a calibration clip (the package's test_wavs, else noise) and keep the fastest within budget")
+    parser.add_argument("--model-max-rtf", default=0.0, type=float, help="RTF budget for --model-profile (0 = no limit, just the fastest)")
+    parser.add_argument("--model-max-cer", default=0.1, type=float, help="Maximum character error rate of a variant against the fp32 transcript for --model-profile")
+    parser.add_argument("--model-profile-cache", default=str(Path.home() / ".cache" / "speech-asr-sdk" / "model-variants.json"), type=str, help="Where --model-profile decisions are cached so later starts skip profiling")
     parser.add_argument("--num-threads-second", default=4, type=int, help="Threads for 2nd pass")
+    parser.add_argument("--thread-allocation", default="fixed", choices=["fixed", "auto", "calibrate"], help="fixed: use --num-threads-*; auto: size both from the CPUs this process may use (affinity + cgroup quota) and pin the 1st pass to reserved cores; calibrate: like auto, but time the models at startup to choose the counts")
     parser.add_argument("--provider-second", default="cpu", type=str, help="Inference provider for 2nd pass")
+    parser.add_argument("--second-batch-size", default=8, type=int, help="Max segments decoded together by the 2nd pass (1 disables batching)")
+    parser.add_argument("--second-queue-size", default=8, type=int, help="Segments held in memory for the 2nd pass; overflow is spooled to disk")
+    parser.add_argument("--second-cache-dir", default="", type=str, help="Cache second-pass results on disk, keyed by segment audio + model + options (empty disables)")
+    parser.add_argument("--second-cache-max-mb", default=256.0, type=float, help="Size cap for --second-cache-dir; least recently used entries are evicted")
+    parser.add_argument("--spool-dir", default="", type=str, help="Directory for the 2nd-pass overflow spool (default: system temp dir)")
+    parser.add_argument("--second-batch-wait-ms", default=0.0, type=float, help="Extra time the 2nd pass waits for more queued segments before decoding a batch")
 
     parser.add_argument("--tail-padding", default=4000, type=int, help="Samples kept as right context for the next segment")
+    parser.add_argument("--speculative-pause", default=0.0, type=float, help="Start the 2nd pass after this many seconds without new first-pass tokens and commit it if the segment ends there (0 disables)")
+    parser.add_argument("--tail-padding-mode", default="context", choices=["context", "duplicate"], help="context: prepend the tail only to a directly following segment and drop its tokens there; duplicate: always prepend and transcribe it twice")
     parser.add_argument("--sample-rate", default=16000, type=int, help="Audio sample rate")
     parser.add_argument("--device", default="", type=str, help="Preferred microphone name fragment")
     parser.add_argument("--device-index", default=-1, type=int, help="Preferred microphone index")
     parser.add_argument("--chunk-duration", default=0.1, type=float, help="Seconds per microphone read (smaller = lower latency)")
+    parser.add_argument("--ring-buffer-seconds", default=10.0, type=float, help="Capture ring buffer size between the audio callback and the recognition loop")
+    parser.add_argument("--manual-chunking", default="none", choices=["none", "vad", "window"], help="Decode long push-to-talk recordings in pieces while the key is held: at VAD segment ends (vad) or fixed windows with overlap (window)")
+    parser.add_argument("--manual-chunk-seconds", default=10.0, type=float, help="Window length for --manual-chunking window")
+    parser.add_argument("--manual-chunk-overlap", default=0.5, type=float, help="Left context (seconds) carried between windows; its tokens are dropped")
+    parser.add_argument("--partial-mode", default="full", choices=["full", "diff"], help="first-pass events carry the whole partial (full) or only the changed suffix plus token timestamps (diff)")
+    parser.add_argument("--partial-max-rate", default=0.0, type=float, help="Maximum first-pass updates per second (0 = every change)")
+    parser.add_argument("--warmup", action="store_true", help="Run a short synthetic decode through every model before emitting 'ready'")
+    parser.add_argument("--log-level", default="info", choices=sorted(LOG_LEVELS, key=LOG_LEVELS.get), help="Minimum level of 'log' events written to stdout (per-chunk capture chatter is debug)")
+    parser.add_argument("--metrics-interval", default=10.0, type=float, help="Seconds between latency percentile 'metrics' events in streaming mode (0 disables)")
+    parser.add_argument("--source", default="mic", type=str, help="Streaming audio source: mic, file:<wav|dir>, stdin (raw PCM per --pcm-*), tcp://host:port or unix:///path")
+    parser.add_argument("--source-speed", default=1.0, type=float, help="Replay speed for file: sources (1.0 = real time, 0 = as fast as possible)")
+    parser.add_argument("--benchmark", default="", type=str, help="Replay a WAV file or directory of WAVs through the streaming pipeline (no audio device) and report RTF/latency/CPU/RSS")
+    parser.add_argument("--benchmark-speed", default=0.0, type=float, help="Replay speed for --benchmark (1.0 = real time, 0 = as fast as possible)")
+    parser.add_argument("--benchmark-output", default="", type=str, help="Also write the --benchmark report as JSON to this path")
     parser.add_argument("--disable-endpoint", action="store_true", help="Disable endpoint detection for 1st pass (requires VAD)")
+    parser.add_argument("--overload-guard", action="store_true", help="Watch per-chunk processing time and capture backlog; when the loop falls behind, step through greedy_search, longer chunks, paused partials and VAD-only segmentation until it catches up")
+    parser.add_argument("--overload-backlog", default=0.5, type=float, help="Seconds of unread capture audio that count as falling behind for --overload-guard")
+    parser.add_argument("--energy-gate", action="store_true", help="Skip first-pass and VAD work on chunks clearly below the adaptive noise floor (auto mode)")
+    parser.add_argument("--energy-gate-margin-db", default=9.0, type=float, help="dB above the noise floor that counts as possible speech")
+    parser.add_argument("--energy-gate-hangover", default=1.0, type=float, help="Seconds the gate stays open after the last loud chunk; closing settles the utterance like an endpoint")
+    parser.add_argument("--energy-gate-preroll", default=0.3, type=float, help="Seconds of gated audio replayed to the models when the gate opens")
     parser.add_argument("--silero-vad-model", default="", type=str, help="Enable VAD segmentation by providing silero_vad.onnx path")
     parser.add_argument("--vad-threshold", default=0.5, type=float, help="Silero VAD speech threshold (0~1)")
     parser.add_argument("--vad-min-silence", default=0.5, type=float, help="Silence duration to close a segment (seconds)")
     parser.add_argument("--vad-min-speech", default=0.25, type=float, help="Minimum speech duration to output (seconds)")
     parser.add_argument("--vad-max-speech", default=8.0, type=float, help="Maximum speech duration before forcing a cut (seconds)")
-    parser.add_argument("--wav-input", default="", type=str, help="If provided, run a single-pass decode on this 16k mono WAV and exit")
+    parser.add_argument("--wav-input", default="", type=str, help="If provided, run a single-pass decode on this PCM WAV (any rate/channels) and exit; '-' reads raw PCM from stdin")
+    parser.add_argument("--pcm-format", default="s16le", choices=sorted(PCM_FORMATS), help="Raw PCM sample format for --wav-input -")
+    parser.add_argument("--pcm-rate", default=16000, type=int, help="Raw PCM sample rate for --wav-input -")
+    parser.add_argument("--pcm-channels", default=1, type=int, help="Raw PCM channel count for --wav-input -")
+    parser.add_argument("--serve", action="store_true", help="Batch server mode: keep models loaded and decode 'transcribe [<job-id>] <path>' commands from stdin")
+    parser.add_argument("--wav-workers", default=1, type=int, help="Parallel 2nd-pass workers for --wav-input/--serve; --num-threads-second is split across them")
+    parser.add_argument("--sessions-listen", default="", type=str, help="Multi-session server: accept concurrent raw-PCM connections on tcp://host:port or unix:///path sharing one set of models")
+    parser.add_argument("--max-sessions", default=16, type=int, help="Maximum concurrent sessions for --sessions-listen")
     parser.add_argument("--manual-mode", action="store_true", help="Push-to-talk mode: record from mic until 'stop' is received on stdin, then run 2nd pass only")
     parser.add_argument("--start-paused", action="store_true", help="Start microphone capture paused until 'start' is received on stdin (streaming mode)")
-    return parser.parse_args()
+    args = parser.parse_args()
+    if not args.model_dir and not (args.second_model and args.second_tokens):
+        parser.error("--second-model and --second-tokens are required unless --model-dir is given")
+    return args
 
 #  recognizer = sherpa_onnx.OnlineRecognizer.from_transducer(
 #         tokens=args.first_tokens,
@@ -231,11 +410,18 @@ def create_first_pass(args) -> sherpa_onnx.OnlineRecognizer:
     )
 
 
+def second_pass_threads(args) -> int:
+    """Per-session thread count; file modes with a worker pool split the budget across workers."""
+    if (args.wav_input or args.serve) and args.wav_workers > 1:
+        return max(1, args.num_threads_second // args.wav_workers)
+    return max(1, args.num_threads_second)
+
+
 def create_second_pass(args) -> sherpa_onnx.OfflineRecognizer:
     return sherpa_onnx.OfflineRecognizer.from_sense_voice(
         model=assert_file(args.second_model, "--second-model"),
         tokens=assert_file(args.second_tokens, "--second-tokens"),
-        num_threads=max(1, args.num_threads_second),
+        num_threads=second_pass_threads(args),
         provider=args.provider_second,
         use_itn=True,
         debug=False,
@@ -279,66 +465,1929 @@ def create_vad(args) -> Optional[Tuple[sherpa_onnx.VoiceActivityDetector, int]]:
         return None
 
 
-def run_second_pass(recognizer: sherpa_onnx.OfflineRecognizer, samples: np.ndarray, sample_rate: int) -> str:
-    if samples.size == 0:
-        return ""
-    stream = recognizer.create_stream()
-    stream.accept_waveform(sample_rate, samples)
-    recognizer.decode_stream(stream)
-    return (stream.result.text or "").strip()
+MODEL_VARIANTS = ("int8", "fp32")
+
+
+def model_variant(path: Path) -> str:
+    return "int8" if ".int8." in path.name else "fp32"
+
+
+def discover_models(root: Path) -> dict:
+    """Find ZipFormer transducer and SenseVoice files under root (up to two levels deep).
+
+    Returns {"first": {"dir", "tokens", "fp32": {"encoder", "decoder", "joiner"}, "int8": {...}},
+    "second": {"dir", "tokens", "fp32": {"model"}, "int8": {"model"}}, "vad": path}; kinds
+    or variants that are not found are left out. An int8 transducer uses the
+    fp32 decoder/joiner when only the encoder was quantised.
+    """
+    found: dict = {}
+    directories = [root] + sorted(path for path in root.glob("*") if path.is_dir())
+    directories += sorted(path for path in root.glob("*/*") if path.is_dir())
+    for directory in directories:
+        vad = directory / "silero_vad.onnx"
+        if "vad" not in found and vad.is_file():
+            found["vad"] = vad
+        tokens = directory / "tokens.txt"
+        if not tokens.is_file():
+            continue
+        parts: Dict[str, Dict[str, Path]] = {}
+        for path in sorted(directory.glob("*.onnx")):
+            role = next((name for name in ("encoder", "decoder", "joiner") if path.name.startswith(name)), None)
+            if role is None and path.name.startswith("model"):
+                role = "model"
+            if role is not None:
+                parts.setdefault(model_variant(path), {}).setdefault(role, path)
+        if "first" not in found and any("encoder" in files for files in parts.values()):
+            entry: dict = {"dir": directory, "tokens": tokens}
+            for variant in MODEL_VARIANTS:
+                files = parts.get(variant, {})
+                if "encoder" not in files:
+                    continue
+                fallback = parts.get("fp32", {})
+                picked = {role: files.get(role) or fallback.get(role) for role in ("encoder", "decoder", "joiner")}
+                if all(picked.values()):
+                    entry[variant] = picked
+            if any(variant in entry for variant in MODEL_VARIANTS):
+                found["first"] = entry
+        elif "second" not in found and any("model" in parts.get(variant, {}) for variant in MODEL_VARIANTS):
+            entry = {"dir": directory, "tokens": tokens}
+            for variant in MODEL_VARIANTS:
+                if "model" in parts.get(variant, {}):
+                    entry[variant] = {"model": parts[variant]["model"]}
+            found["second"] = entry
+    return found
+
+
+def apply_model_variant(args, kind: str, entry: dict, variant: str):
+    if kind == "first":
+        args.first_tokens = str(entry["tokens"])
+        args.first_encoder, args.first_decoder, args.first_joiner = (str(entry[variant][role]) for role in ("encoder", "decoder", "joiner"))
+    else:
+        args.second_tokens = str(entry["tokens"])
+        args.second_model = str(entry[variant]["model"])
 
 
-def read_wav_float_mono(path: Path, expected_sr: int) -> np.ndarray:
-    import wave
+def edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
 
-    with wave.open(str(path), "rb") as wf:
-        num_channels = wf.getnchannels()
-        sampwidth = wf.getsampwidth()
-        sr = wf.getframerate()
-        nframes = wf.getnframes()
-        if num_channels != 1:
-            raise ValueError(f"WAV must be mono, got {num_channels} channels")
-        if sr != expected_sr:
-            raise ValueError(f"WAV sample rate must be {expected_sr}, got {sr}")
-        if sampwidth not in (2, 4):
-            raise ValueError(f"Unsupported sample width: {sampwidth} bytes")
-        raw = wf.readframes(nframes)
-
-    if sampwidth == 2:
-        data = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+def calibration_clip(args, directories: List[Path]) -> Tuple[np.ndarray, bool]:
+    """First test_wavs/*.wav shipped with the models (speech), else 4 s of noise (timing only)."""
+    for directory in directories:
+        for path in sorted((directory / "test_wavs").glob("*.wav")):
+            try:
+                blocks = list(iter_wav_float_mono(path, args.sample_rate, args.sample_rate))
+            except (OSError, ValueError, wave.Error):
+                continue
+            if blocks:
+                return np.concatenate(blocks), True
+    return (0.01 * np.random.default_rng(0).standard_normal(4 * args.sample_rate)).astype(np.float32), False
+
+
+def profile_variant(args, kind: str, clip: np.ndarray) -> Tuple[float, str]:
+    """Build the recognizer for the variant currently in args; return (RTF on clip, text)."""
+    if kind == "second":
+        recognizer = create_second_pass(args)
+        run_second_pass(recognizer, clip[: args.sample_rate], args.sample_rate)  # ONNX Runtime warm-up
+        started = time.perf_counter()
+        text = run_second_pass(recognizer, clip, args.sample_rate)
     else:
-        data = np.frombuffer(raw, dtype=np.int32).astype(np.float32) / 2147483648.0
-    return data
+        recognizer = create_first_pass(args)
+        chunk = max(1, int(args.chunk_duration * args.sample_rate))
+        stream = recognizer.create_stream()
+        started = time.perf_counter()
+        for offset in range(0, len(clip), chunk):
+            stream.accept_waveform(args.sample_rate, clip[offset : offset + chunk])
+            while recognizer.is_ready(stream):
+                recognizer.decode_stream(stream)
+        stream.accept_waveform(args.sample_rate, np.zeros(int(0.66 * args.sample_rate), dtype=np.float32))
+        stream.input_finished()
+        while recognizer.is_ready(stream):
+            recognizer.decode_stream(stream)
+        result = recognizer.get_result(stream)
+        text = str(getattr(result, "text", result) or "")
+    elapsed = time.perf_counter() - started
+    return elapsed / (len(clip) / args.sample_rate), text.strip().lower()
+
+
+def profile_variants(args, kind: str, entry: dict, clip: np.ndarray, has_speech: bool) -> Tuple[str, dict]:
+    """Time every variant and pick the fastest one within --model-max-rtf and --model-max-cer.
+
+    CER is measured against the fp32 transcript of the same clip, so it is
+    only available when the clip is real speech (and an fp32 variant exists).
+    """
+    report: dict = {}
+    reference = None
+    for variant in ("fp32", "int8"):
+        if variant not in entry:
+            continue
+        apply_model_variant(args, kind, entry, variant)
+        rtf, text = profile_variant(args, kind, clip)
+        if variant == "fp32":
+            reference = text
+        cer = None
+        if has_speech and reference is not None:
+            cer = edit_distance(reference, text) / max(1, len(reference))
+        report[variant] = {"rtf": round(rtf, 4), "cer": None if cer is None else round(cer, 4)}
+        # Constraints this variant violates, in the form the log and the "models" event show them
+        rejected = []
+        if cer is not None and cer > args.model_max_cer:
+            rejected.append(f"cer {cer:.4f} > --model-max-cer {args.model_max_cer}")
+        if args.model_max_rtf > 0 and rtf > args.model_max_rtf:
+            rejected.append(f"rtf {rtf:.4f} > --model-max-rtf {args.model_max_rtf}")
+        if rejected:
+            report[variant]["rejected"] = rejected
+            emit({"type": "log", "message": f"{kind}-pass {variant} variant rejected: {'; '.join(rejected)}"})
+    accurate = [v for v in report if report[v]["cer"] is None or report[v]["cer"] <= args.model_max_cer]
+    within = [v for v in accurate if args.model_max_rtf <= 0 or report[v]["rtf"] <= args.model_max_rtf]
+    if not accurate:
+        emit({"type": "log", "message": f"No {kind}-pass variant meets --model-max-cer {args.model_max_cer}; using the fastest one"})
+    elif not within:
+        emit({"type": "log", "message": f"No {kind}-pass variant within --model-max-cer meets --model-max-rtf {args.model_max_rtf}; using the fastest accurate one"})
+    choice = min(within or accurate or list(report), key=lambda v: report[v]["rtf"])
+    return choice, report
+
+
+def default_model_variant(args, entry: dict) -> str:
+    # int8 unless fp32 was asked for; fall back to whichever variant exists
+    preferred = "fp32" if args.model_variant == "fp32" else "int8"
+    return preferred if preferred in entry else next(v for v in MODEL_VARIANTS if v in entry)
+
+
+def discover_model_dir(args, need_first_pass: bool) -> Optional[Tuple[Path, dict, List[str]]]:
+    """--model-dir: find the models and fill in the default variant's paths.
+
+    Returns (root, discovered models, kinds whose paths came from the directory),
+    or None without --model-dir. Paths given explicitly on the command line are
+    kept. The defaults let --thread-allocation calibrate build the models before
+    resolve_model_dir profiles the variants on the final thread counts.
+    """
+    if not args.model_dir:
+        return None
+    root = Path(args.model_dir).expanduser()
+    found = discover_models(root)
+    if not args.silero_vad_model and "vad" in found:
+        args.silero_vad_model = str(found["vad"])
+    kinds = []
+    if not args.second_model and "second" in found:
+        kinds.append("second")
+    if need_first_pass and not args.first_encoder and "first" in found:
+        kinds.append("first")
+    if "second" not in found and not args.second_model:
+        raise ValueError(f"No SenseVoice model (model.onnx / model.int8.onnx + tokens.txt) under {root}")
+    for kind in kinds:
+        apply_model_variant(args, kind, found[kind], default_model_variant(args, found[kind]))
+    return root, found, kinds
+
+
+def resolve_model_dir(args, need_first_pass: bool, discovered: Optional[Tuple[Path, dict, List[str]]] = None):
+    """--model-dir: pick one variant per model and fill in the model paths.
+
+    With --model-profile every variant is timed once on a calibration clip
+    and the decision is cached in --model-profile-cache, keyed by the model
+    files, decode options, thread counts and machine, so later starts skip the
+    profiling. Pass what discover_model_dir returned when the thread plan ran
+    in between.
+    """
+    if discovered is None:
+        discovered = discover_model_dir(args, need_first_pass)
+        if discovered is None:
+            return
+    root, found, kinds = discovered
+    choices: Dict[str, str] = {}
+    report: dict = {}
+    cached = False
+    if args.model_profile and args.model_variant == "auto" and kinds:
+        files = sorted(str(path) for kind in kinds for variant in MODEL_VARIANTS for path in found[kind].get(variant, {}).values())
+        key_source = {
+            "files": [[name, os.stat(name).st_size, os.stat(name).st_mtime_ns] for name in files],
+            "threads": [args.num_threads_first, args.num_threads_second],
+            "providers": [args.provider_first, args.provider_second],
+            "budget": [args.model_max_rtf, args.model_max_cer],
+            "chunk_duration": args.chunk_duration,
+            "machine": [sys.platform, os.cpu_count()],
+        }
+        key = hashlib.blake2b(json.dumps(key_source, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+        cache_path = Path(args.model_profile_cache).expanduser()
+        try:
+            decisions = json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            decisions = {}
+        if key in decisions and all(kind in decisions[key]["choices"] for kind in kinds):
+            choices, report, cached = decisions[key]["choices"], decisions[key].get("report", {}), True
+        else:
+            clip, has_speech = calibration_clip(args, [found[kind]["dir"] for kind in ("second", "first") if kind in found])
+            for kind in kinds:
+                choices[kind], report[kind] = profile_variants(args, kind, found[kind], clip, has_speech)
+            decisions[key] = {"choices": choices, "report": report, "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                cache_path.write_text(json.dumps(decisions, indent=2), encoding="utf-8")
+            except OSError as exc:
+                emit({"type": "log", "message": f"Cannot save model profile to {cache_path}: {exc}"})
+    for kind in kinds:
+        if kind not in choices:
+            choices[kind] = default_model_variant(args, found[kind])
+        apply_model_variant(args, kind, found[kind], choices[kind])
+    emit(
+        {
+            "type": "metrics",
+            "name": "models",
+            "model_dir": str(root),
+            "first_variant": choices.get("first"),
+            "second_variant": choices.get("second"),
+            "first_encoder": args.first_encoder or None,
+            "second_model": args.second_model,
+            "profiled": bool(report),
+            "cached": cached,
+            **({"profile": report} if report else {}),
+        }
+    )
 
 
-def process_wav_input(args, first_pass, second_pass, vad_bundle):
-    wav_path = Path(args.wav_input).expanduser()
-    if not wav_path.is_file():
-        emit({"type": "error", "message": f"WAV file not found: {wav_path}"})
-        sys.exit(1)
+def cgroup_cpu_quota() -> Optional[float]:
+    """CPUs' worth of time allowed by the cgroup (v2 cpu.max or v1 CFS quota), or None if unlimited."""
+    candidates = [Path("/sys/fs/cgroup/cpu.max")]
+    try:
+        for line in Path("/proc/self/cgroup").read_text().splitlines():
+            if line.startswith("0::"):
+                candidates.insert(0, Path("/sys/fs/cgroup") / line[3:].lstrip("/") / "cpu.max")
+    except OSError:
+        pass
+    for path in candidates:
+        try:
+            quota, period = path.read_text().split()[:2]
+        except (OSError, ValueError):
+            continue
+        return None if quota == "max" else int(quota) / int(period)
+    try:
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 and period > 0 else None
 
-    emit({"type": "ready"})
-    emit({"type": "log", "message": f"Processing WAV (push-to-talk): {wav_path}"})
 
+def available_cpus() -> Tuple[List[int], int]:
+    """(CPUs in this process's affinity mask, thread budget after the cgroup quota)."""
     try:
-        samples = read_wav_float_mono(wav_path, args.sample_rate)
-    except Exception as exc:  # pylint: disable=broad-except
-        emit({"type": "error", "message": f"Failed to read WAV: {exc}"})
-        sys.exit(1)
+        cpus = sorted(os.sched_getaffinity(0))
+    except AttributeError:  # macOS / Windows
+        cpus = list(range(os.cpu_count() or 1))
+    budget = len(cpus)
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        budget = max(1, min(budget, int(math.ceil(quota))))
+    return cpus, budget
+
+
+# CPU sets per role ("first_pass", "second_pass", "all") for --thread-allocation auto/calibrate
+cpu_sets: Dict[str, List[int]] = {}
+
+
+def pin_thread(role: str):
+    """Restrict the calling thread to the role's CPU set (Linux only; no-op when not planned).
+
+    ONNX Runtime worker threads inherit the affinity of the thread that builds
+    the session, so recognizers are built from a pinned thread too.
+    """
+    cpus = cpu_sets.get(role) or cpu_sets.get("all")
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        return
+    try:
+        os.sched_setaffinity(0, cpus)
+    except OSError as exc:
+        emit({"type": "log", "message": f"Cannot pin {role} thread to CPUs {cpus}: {exc}"}, level="debug")
+
+
+def split_cpus(cpus: List[int], first_threads: int) -> Dict[str, List[int]]:
+    # The first pass gets the last cores: CPU 0 tends to take interrupts and the audio callback
+    if first_threads <= 0 or len(cpus) < 2:
+        return {"all": list(cpus)}
+    reserved = cpus[-min(first_threads, len(cpus) - 1) :]
+    return {"first_pass": reserved, "second_pass": [cpu for cpu in cpus if cpu not in reserved], "all": list(cpus)}
+
+
+def calibrate_threads(args, cpus: List[int], budget: int) -> Tuple[int, int, dict]:
+    """Pick thread counts on this machine by timing the real models.
+
+    The first pass gets the fewest threads that decode a chunk in under half of
+    --chunk-duration, which keeps partials real-time. Each candidate second-pass
+    count then decodes a 4 s clip while the first pass streams in the
+    background at real-time pace on its reserved cores, and the count with the
+    lowest median latency wins; that is the endpoint-to-final time a segment
+    would see.
+    """
+    clip = (0.01 * np.random.default_rng(0).standard_normal(4 * args.sample_rate)).astype(np.float32)
+    chunk = max(1, int(args.chunk_duration * args.sample_rate))
+    report: dict = {"first_chunk_ms": {}, "second_ms": {}}
+
+    def run_on(role: str, fn, *fn_args):
+        # Build and decode from a pinned thread so ONNX Runtime's pool inherits the CPU set
+        with ThreadPoolExecutor(max_workers=1, initializer=pin_thread, initargs=(role,)) as pool:
+            return pool.submit(fn, *fn_args).result()
+
+    def first_pass_chunk_ms(recognizer) -> float:
+        stream = recognizer.create_stream()
+        timings = []
+        for offset in range(0, len(clip) - chunk + 1, chunk):
+            started = time.perf_counter()
+            stream.accept_waveform(args.sample_rate, clip[offset : offset + chunk])
+            while recognizer.is_ready(stream):
+                recognizer.decode_stream(stream)
+            timings.append((time.perf_counter() - started) * 1000.0)
+        return float(np.percentile(timings, 95)) if timings else 0.0
+
+    def stream_first_pass(recognizer, stop: threading.Event):
+        stream = recognizer.create_stream()
+        offset = 0
+        while not stop.is_set():
+            started = time.monotonic()
+            if offset + chunk > len(clip):
+                recognizer.reset(stream)
+                offset = 0
+            stream.accept_waveform(args.sample_rate, clip[offset : offset + chunk])
+            offset += chunk
+            while recognizer.is_ready(stream):
+                recognizer.decode_stream(stream)
+            stop.wait(max(0.0, args.chunk_duration - (time.monotonic() - started)))
+
+    def second_pass_ms(recognizer) -> float:
+        timings = []
+        for _ in range(3):
+            started = time.perf_counter()
+            run_second_pass(recognizer, clip, args.sample_rate)
+            timings.append((time.perf_counter() - started) * 1000.0)
+        return float(np.median(timings))
+
+    first_threads = 1
+    first_pass = None
+    for threads in range(1, max(1, min(4, budget - 1)) + 1):
+        args.num_threads_first = threads
+        cpu_sets.clear()
+        cpu_sets.update(split_cpus(cpus, threads))
+        first_pass = run_on("first_pass", create_first_pass, args)
+        p95 = run_on("first_pass", first_pass_chunk_ms, first_pass)
+        report["first_chunk_ms"][str(threads)] = round(p95, 2)
+        first_threads = threads
+        if p95 <= 500.0 * args.chunk_duration:
+            break
+
+    rest = max(1, budget - first_threads)
+    best_threads, best_ms = rest, math.inf
+    stop = threading.Event()
+
+    def background_first_pass():
+        pin_thread("first_pass")
+        stream_first_pass(first_pass, stop)
+
+    background = threading.Thread(target=background_first_pass, daemon=True)
+    background.start()
+    try:
+        for threads in sorted({rest, max(1, rest // 2), max(1, rest * 3 // 4)}):
+            args.num_threads_second = threads
+            recognizer = run_on("second_pass", create_second_pass, args)
+            latency_ms = run_on("second_pass", second_pass_ms, recognizer)
+            report["second_ms"][str(threads)] = round(latency_ms, 1)
+            if latency_ms < best_ms:
+                best_threads, best_ms = threads, latency_ms
+    finally:
+        stop.set()
+        background.join()
+    return first_threads, best_threads, report
+
+
+def plan_threads(args, need_first_pass: bool):
+    """Apply --thread-allocation: size both thread pools and reserve cores for the first pass."""
+    if args.thread_allocation == "fixed":
+        return
+    cpus, budget = available_cpus()
+    report: dict = {}
+    if not need_first_pass:
+        # File modes only run the 2nd pass; it gets the whole budget
+        args.num_threads_second = budget
+        cpu_sets.clear()
+    else:
+        first_threads = 1 if budget <= 4 else 2
+        second_threads = max(1, budget - first_threads)
+        if args.thread_allocation == "calibrate":
+            try:
+                first_threads, second_threads, report = calibrate_threads(args, cpus, budget)
+            except Exception as exc:  # pylint: disable=broad-except
+                emit({"type": "log", "message": f"Thread calibration failed, using the auto split: {exc}"})
+        args.num_threads_first = first_threads
+        args.num_threads_second = second_threads
+        cpu_sets.clear()
+        cpu_sets.update(split_cpus(cpus, first_threads))
+    emit(
+        {
+            "type": "metrics",
+            "name": "threads",
+            "allocation": args.thread_allocation,
+            "cpus": len(cpus),
+            "budget": budget,
+            "first_threads": args.num_threads_first if need_first_pass else 0,
+            "second_threads": args.num_threads_second,
+            "first_cpus": cpu_sets.get("first_pass", []),
+            "second_cpus": cpu_sets.get("second_pass", []),
+            **report,
+        }
+    )
+
+
+def load_models(args, need_first_pass: bool = True):
+    """Build the recognizers and VAD on parallel threads.
+
+    Returns (first_pass, second_pass, vad_bundle, build_ms); first_pass is None
+    when not needed (file modes only run the second pass).
+    """
+    builders = {"second_pass": create_second_pass, "vad": create_vad}
+    if need_first_pass:
+        builders["first_pass"] = create_first_pass
+    build_ms: Dict[str, float] = {}
+
+    def build(name: str):
+        pin_thread(name)
+        started = time.monotonic()
+        model = builders[name](args)
+        build_ms[f"{name}_ms"] = round((time.monotonic() - started) * 1000.0, 1)
+        return model
+
+    with ThreadPoolExecutor(max_workers=len(builders), thread_name_prefix="model-load") as pool:
+        futures = {name: pool.submit(build, name) for name in builders}
+        models = {name: future.result() for name, future in futures.items()}
+    return models.get("first_pass"), models["second_pass"], models["vad"], build_ms
+
+
+def warm_up(args, first_pass, second_pass, vad_bundle) -> Dict[str, float]:
+    """Decode one second of low-level noise through every model before "ready".
+
+    ONNX Runtime allocates and specialises kernels on the first inference;
+    paying that here keeps it off the first real utterance.
+    """
+    audio = (0.01 * np.random.default_rng(0).standard_normal(args.sample_rate)).astype(np.float32)
+    timings: Dict[str, float] = {}
+
+    started = time.monotonic()
+    run_second_pass(second_pass, audio, args.sample_rate)
+    timings["warmup_second_pass_ms"] = round((time.monotonic() - started) * 1000.0, 1)
+
+    if first_pass is not None:
+        started = time.monotonic()
+        stream = first_pass.create_stream()
+        stream.accept_waveform(args.sample_rate, audio)
+        while first_pass.is_ready(stream):
+            first_pass.decode_stream(stream)
+        first_pass.get_result(stream)
+        timings["warmup_first_pass_ms"] = round((time.monotonic() - started) * 1000.0, 1)
 
-    vad = None
-    vad_window_size = None
     if vad_bundle:
-        vad, vad_window_size = vad_bundle
+        started = time.monotonic()
+        vad, window_size = vad_bundle
+        vad.accept_waveform(audio[: len(audio) - len(audio) % window_size])
+        vad.reset()
+        timings["warmup_vad_ms"] = round((time.monotonic() - started) * 1000.0, 1)
+    return timings
+
+
+class PartialTracker:
+    """Turn successive first-pass results into "first-pass" events.
+
+    In "full" mode every change re-sends the whole partial as "text" (what
+    index.js has always consumed). In "diff" mode an update carries
+    {"keep": n, "text": suffix, "token_index": k, "tokens": [...],
+    "timestamps": [...]}: the receiver keeps the first n characters (code
+    points, not UTF-16 units) and k tokens it already has and appends the
+    rest, so an update costs the size of the change rather than of the
+    utterance. Timestamps are seconds since the utterance started. If the
+    event writer has dropped a partial since the last update, the next one is
+    a full resync (keep=0, token_index=0) so the receiver never rebuilds on a
+    prefix it does not have.
+
+    With max_rate > 0, updates closer together than 1/max_rate seconds are
+    held back and the newest one goes out on a later call; the first partial
+    of an utterance is never delayed. While `paused` (overload) the partial is
+    still tracked but only utterance-boundary resets are sent.
+    """
+
+    def __init__(self, mode: str = "full", max_rate: float = 0.0, fields: Optional[dict] = None):
+        self.mode = mode
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.fields = fields or {}
+        self.text = ""
+        self.tokens: List[str] = []
+        self.timestamps: List[float] = []
+        self.sent_text = ""
+        self.sent_tokens: List[str] = []
+        self.sent_at = 0.0
+        self.drops_seen = 0
+        self.paused = False
+
+    def update(self, recognizer, stream) -> str:
+        """Read the stream's current partial, emit it if due, and return it."""
+        if self.mode == "diff" and hasattr(recognizer, "get_result_all"):
+            result = recognizer.get_result_all(stream)
+            self.tokens = [str(token).lower() for token in getattr(result, "tokens", [])]
+            self.timestamps = [round(float(ts), 2) for ts in getattr(result, "timestamps", [])]
+        else:
+            result = recognizer.get_result(stream)
+        self.text = str(getattr(result, "text", result) or "").lower().strip()
+        if (self.text == self.sent_text and not self._resync_due()) or self.paused:
+            return self.text
+        now = time.monotonic()
+        if self.sent_text and now - self.sent_at < self.min_interval:
+            return self.text
+        self.sent_at = now
+        self._send()
+        return self.text
+
+    def reset(self):
+        """Clear the partial at an utterance boundary (always emitted)."""
+        self.text = ""
+        self.tokens = []
+        self.timestamps = []
+        self._send()
+
+    def _resync_due(self) -> bool:
+        return self.mode == "diff" and _writer.partials_dropped != self.drops_seen
+
+    def _send(self):
+        if self.mode != "diff":
+            emit({"type": "first-pass", **self.fields, "text": self.text})
+        else:
+            if self._resync_due():
+                self.sent_text, self.sent_tokens = "", []
+            # Read before emitting: if this update is dropped too, the next one resyncs again.
+            self.drops_seen = _writer.partials_dropped
+            keep = len(os.path.commonprefix([self.sent_text, self.text]))
+            token_index = len(os.path.commonprefix([self.sent_tokens, self.tokens]))
+            emit(
+                {
+                    "type": "first-pass",
+                    **self.fields,
+                    "keep": keep,
+                    "text": self.text[keep:],
+                    "token_index": token_index,
+                    "tokens": self.tokens[token_index:],
+                    "timestamps": self.timestamps[token_index:],
+                }
+            )
+        self.sent_text = self.text
+        self.sent_tokens = list(self.tokens)
 
-    def decode_segment(segment_audio: np.ndarray, start_sample: int):
-        """Run 2nd pass for a segment and emit result."""
-        duration = len(segment_audio) / args.sample_rate
-        start_time = max(0.0, start_sample / args.sample_rate)
-        end_time = start_time + duration
-        text = run_second_pass(second_pass, segment_audio, args.sample_rate)
-        emit(
-            {
+
+def first_token_seconds(recognizer, stream) -> float:
+    """Start of the first token in the stream's current result, in seconds since the stream was reset.
+
+    Returns 0.0 when the recognizer does not report token timestamps.
+    """
+    try:
+        timestamps = getattr(recognizer.get_result_all(stream), "timestamps", None)
+    except (AttributeError, RuntimeError):
+        return 0.0
+    return max(0.0, float(timestamps[0])) if timestamps else 0.0
+
+
+def apply_tail_padding(
+    carry_over: np.ndarray, chunk_audio: np.ndarray, tail_padding: int, mode: str = "context", contiguous: bool = True
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Prepend the previous segment's tail as left context.
+
+    Returns (second-pass audio, carry for the next segment, context samples at
+    the front of the audio). In "duplicate" mode the carried samples are always
+    prepended and transcribed again with this segment. In "context" mode they
+    are only prepended when this segment starts where the previous one ended
+    (an endpoint or max-speech split, where a word may straddle the cut), and
+    the caller drops tokens timed inside the context, so every sample is
+    transcribed once; after a silence gap the tail is not context at all and
+    is not decoded again.
+    """
+    if mode == "context" and not contiguous:
+        carry_over = carry_over[:0]
+    combined = np.concatenate([carry_over, chunk_audio]) if carry_over.size > 0 else chunk_audio
+    context = len(carry_over) if mode == "context" else 0
+    keep_tail = max(0, tail_padding)
+    if keep_tail > 0 and combined.size > keep_tail:
+        return combined, combined[-keep_tail:], context
+    return combined, combined if keep_tail > 0 else np.zeros(0, dtype=np.float32), context
+
+
+def drop_context_tokens(entry: dict, context_seconds: float) -> str:
+    """Rebuild a second-pass text without the tokens that start inside the left context.
+
+    Falls back to the decoder's own text (which has ITN applied) when nothing
+    falls inside the context or the result carries no usable timestamps.
+    """
+    tokens, timestamps = entry.get("tokens") or [], entry.get("timestamps") or []
+    if context_seconds <= 0 or not tokens or len(tokens) != len(timestamps):
+        return entry["text"]
+    kept = [token for token, ts in zip(tokens, timestamps) if ts >= context_seconds]
+    if len(kept) == len(tokens):
+        return entry["text"]
+    kept = [token for token in kept if not (token.startswith("<|") and token.endswith("|>"))]
+    return "".join(kept).replace("\u2581", " ").strip()
+
+
+class UtteranceChunker:
+    """Cut a long push-to-talk recording into sub-segments while it is being recorded.
+
+    feed() takes each captured block and returns the pieces that are complete
+    so far; finish() returns the rest when the key is released, so only the
+    last piece is left to decode on stop. Pieces are (audio, start_sample,
+    context_samples) with start_sample counted from reset(base).
+
+    "vad" mode cuts where a dedicated VAD instance closes a speech segment.
+    "window" mode cuts roughly every window_seconds at the quietest 20 ms in
+    the last second of the window, and prepends overlap_seconds of the
+    previous piece as left context whose tokens the 2nd pass drops (as with
+    --tail-padding-mode context).
+    """
+
+    def __init__(self, sample_rate: int, mode: str, window_seconds: float, overlap_seconds: float, vad_bundle=None):
+        self.sample_rate = sample_rate
+        self.vad = VadFeeder(vad_bundle[0], vad_bundle[1], sample_rate) if mode == "vad" and vad_bundle else None
+        self.mode = "vad" if self.vad is not None else "window"
+        self.window = max(sample_rate, int(window_seconds * sample_rate))
+        self.overlap = max(0, int(overlap_seconds * sample_rate))
+        self.pending = SegmentBuffer(self.window + sample_rate)
+        self.reset()
+
+    def reset(self, base: int = 0):
+        self.base = base
+        self.offset = 0  # samples already handed out as pieces
+        self.carry = np.zeros(0, dtype=np.float32)
+        self.pending.clear()
+        if self.vad is not None:
+            self.vad.reset()
+
+    def _cut_point(self, audio: np.ndarray) -> int:
+        """Index near self.window where the signal is quietest, so words are rarely split."""
+        frame = self.sample_rate // 50
+        search = min(self.sample_rate, self.window // 2)
+        region = audio[self.window - search : self.window]
+        frames = len(region) // frame
+        if frames < 2:
+            return self.window
+        energy = np.square(region[: frames * frame].reshape(frames, frame)).sum(axis=1)
+        return self.window - search + int(np.argmin(energy)) * frame + frame // 2
+
+    def _window_piece(self, piece: np.ndarray) -> Tuple[np.ndarray, int, int]:
+        audio, self.carry, context = apply_tail_padding(self.carry, piece, self.overlap)
+        start = self.base + self.offset
+        self.offset += len(piece)
+        return audio, start, context
+
+    def _vad_pieces(self, segments: List[Tuple[int, np.ndarray]]) -> List[Tuple[np.ndarray, int, int]]:
+        return [(audio, self.base + start, 0) for start, audio in segments]
+
+    def feed(self, samples: np.ndarray) -> List[Tuple[np.ndarray, int, int]]:
+        if self.mode == "vad":
+            return self._vad_pieces(self.vad.accept(samples))
+
+        self.pending.append(samples)
+        if len(self.pending) < self.window:
+            return []
+        audio = self.pending.detach()
+        pieces = []
+        while len(audio) >= self.window:
+            cut = self._cut_point(audio)
+            pieces.append(self._window_piece(audio[:cut]))
+            audio = audio[cut:]
+        self.pending.append(audio)
+        return pieces
+
+    def finish(self) -> List[Tuple[np.ndarray, int, int]]:
+        """Return every remaining piece and reset for the next recording."""
+        if self.mode == "vad":
+            pieces = self._vad_pieces(self.vad.flush())
+        else:
+            rest = self.pending.detach()
+            pieces = [self._window_piece(rest)] if rest.size else []
+        self.reset()
+        return pieces
+
+
+class SecondPassCache:
+    """On-disk, content-addressed cache of second-pass results.
+
+    Keys hash the segment's float32 samples together with the model files
+    (path, size, mtime) and decode options, so a different model or option
+    never returns a stale hit. Entries are small JSON files fanned out by key
+    prefix; a hit refreshes the file's mtime and the oldest files are evicted
+    once the directory grows past ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, options: dict):
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max(0, max_bytes)
+        self.prefix = json.dumps(options, sort_keys=True).encode("utf-8")
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.total_bytes = sum(path.stat().st_size for path in self.directory.glob("*/*.json"))
+
+    @classmethod
+    def from_args(cls, args) -> Optional["SecondPassCache"]:
+        if not args.second_cache_dir:
+            return None
+        options = {"sample_rate": args.sample_rate, "use_itn": True}
+        for name in ("second_model", "second_tokens"):
+            path = Path(getattr(args, name)).expanduser().resolve()
+            st = path.stat()
+            options[name] = [str(path), st.st_size, st.st_mtime_ns]
+        return cls(args.second_cache_dir, int(args.second_cache_max_mb * 1024 * 1024), options)
+
+    def key(self, samples: np.ndarray) -> str:
+        digest = hashlib.blake2b(self.prefix, digest_size=20)
+        digest.update(np.ascontiguousarray(samples, dtype=np.float32).tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: dict) -> None:
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        path = self._path(key)
+        try:
+            replaced = path.stat().st_size  # an overwrite only adds the difference
+        except OSError:
+            replaced = 0
+        try:
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            emit({"type": "log", "message": f"Second-pass cache write failed: {exc}"})
+            return
+        with self.lock:
+            self.total_bytes += len(data) - replaced
+            over = self.total_bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is at 90% of its cap."""
+        with self.lock:
+            entries = []
+            for path in self.directory.glob("*/*.json"):
+                try:
+                    entry_stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, path))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            target = int(self.max_bytes * 0.9)
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= size
+            self.total_bytes = total
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self.total_bytes}
+
+
+def second_pass_entry(result) -> dict:
+    """Plain-data view of an offline result: text plus per-token timestamps (seconds)."""
+    return {
+        "text": (getattr(result, "text", "") or "").strip(),
+        "tokens": [str(token) for token in getattr(result, "tokens", []) or []],
+        "timestamps": [round(float(ts), 3) for ts in getattr(result, "timestamps", []) or []],
+    }
+
+
+# Set by main() when --second-cache-dir is given; consulted by every second-pass decode
+second_pass_cache: Optional[SecondPassCache] = None
+
+
+def run_second_pass(recognizer: sherpa_onnx.OfflineRecognizer, samples: np.ndarray, sample_rate: int) -> str:
+    return run_second_pass_batch(recognizer, [samples], sample_rate)[0]
+
+
+def run_second_pass_batch(
+    recognizer: sherpa_onnx.OfflineRecognizer,
+    batch: List[np.ndarray],
+    sample_rate: int,
+    contexts: Optional[List[float]] = None,
+) -> List[str]:
+    """Decode several segments with one decode_streams call; results keep input order.
+
+    Segments found in second_pass_cache are answered from it and left out of
+    the decode. ``contexts`` gives, per segment, the seconds of left context
+    whose tokens are dropped from the text (see apply_tail_padding).
+    """
+    cache = second_pass_cache
+    entries: List[dict] = [{"text": ""} for _ in batch]
+    keys: List[Optional[str]] = [None] * len(batch)
+    streams = []
+    indices = []
+    for idx, samples in enumerate(batch):
+        if samples.size == 0:
+            continue
+        if cache is not None:
+            keys[idx] = cache.key(samples)
+            entry = cache.get(keys[idx])
+            if entry is not None:
+                entries[idx] = entry
+                continue
+        stream = recognizer.create_stream()
+        stream.accept_waveform(sample_rate, samples)
+        streams.append(stream)
+        indices.append(idx)
+    if len(streams) == 1:
+        recognizer.decode_stream(streams[0])
+    elif streams:
+        recognizer.decode_streams(streams)
+    for idx, stream in zip(indices, streams):
+        entries[idx] = second_pass_entry(stream.result)
+        if cache is not None:
+            cache.put(keys[idx], entries[idx])
+    if contexts is None:
+        return [entry["text"] for entry in entries]
+    return [drop_context_tokens(entry, context) for entry, context in zip(entries, contexts)]
+
+
+def collect_batch(task_queue: "queue.Queue", max_items: int, max_wait: float) -> Tuple[list, bool]:
+    """Block for one task, then drain up to max_items, waiting at most max_wait seconds.
+
+    Returns (tasks, stop) where stop is True once the None sentinel was taken.
+    """
+    first = task_queue.get()
+    if first is None:
+        return [], True
+    tasks = [first]
+    deadline = time.monotonic() + max_wait
+    while len(tasks) < max_items:
+        remaining = deadline - time.monotonic()
+        try:
+            task = task_queue.get(timeout=remaining) if remaining > 0 else task_queue.get_nowait()
+        except queue.Empty:
+            break
+        if task is None:
+            return tasks, True
+        tasks.append(task)
+    return tasks, False
+
+
+class SpillQueue:
+    """Bounded in-memory task queue that spills overflow audio to disk instead of dropping it.
+
+    Covers the queue.Queue calls used by the decode worker. Tasks are tuples
+    whose first item is a float32 audio array (or the None sentinel). Once
+    ``maxsize`` tasks are held in memory, later tasks are appended to a float32
+    spool file and read back through ``np.memmap`` in FIFO order.
+    """
+
+    def __init__(self, maxsize: int, spool_dir: str = ""):
+        self.maxsize = max(1, maxsize)
+        self.spilled_total = 0
+        self._memory: "collections.deque" = collections.deque()
+        self._spooled: "collections.deque" = collections.deque()  # (offset, length, rest) or None
+        self._cond = threading.Condition()
+        self._spool_dir = spool_dir or None
+        self._spool_path: Optional[str] = None
+        self._spool_file = None
+        self._write_offset = 0  # samples
+        self._spooled_samples = 0
+        self._unfinished = 0
+
+    def put_nowait(self, task) -> bool:
+        """Enqueue without blocking; returns True when the task went to the disk spool."""
+        with self._cond:
+            spilled = bool(self._spooled) or len(self._memory) >= self.maxsize
+            if spilled:
+                self._spill(task)
+            else:
+                self._memory.append(task)
+            self._unfinished += 1
+            self._cond.notify_all()
+        return spilled
+
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self._memory or self._spooled, timeout=timeout if block else 0
+            )
+            if not ready:
+                raise queue.Empty
+            if self._memory:
+                return self._memory.popleft()
+            return self._unspill()
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def task_done(self):
+        with self._cond:
+            self._unfinished = max(0, self._unfinished - 1)
+            if not self._unfinished:
+                self._cond.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued task has been marked done; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._unfinished, timeout=timeout)
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._memory) + len(self._spooled)
+
+    def stats(self, sample_rate: int) -> dict:
+        with self._cond:
+            return {
+                "queue_depth": len(self._memory),
+                "spooled_segments": len(self._spooled),
+                "spool_seconds": round(self._spooled_samples / sample_rate, 2),
+                "spool_bytes": self._write_offset * 4,
+                "spilled_total": self.spilled_total,
+            }
+
+    def close(self):
+        with self._cond:
+            if self._spool_file is not None:
+                try:
+                    self._spool_file.close()
+                    os.unlink(self._spool_path)
+                except OSError:
+                    pass
+            self._spool_file = None
+            self._spool_path = None
+
+    def _spill(self, task):
+        if task is None:
+            self._spooled.append(None)
+            return
+        audio = np.ascontiguousarray(task[0], dtype=np.float32)
+        if self._spool_file is None:
+            fd, self._spool_path = tempfile.mkstemp(prefix="asr-spool-", suffix=".f32", dir=self._spool_dir)
+            self._spool_file = os.fdopen(fd, "w+b")
+        self._spool_file.seek(self._write_offset * 4)
+        self._spool_file.write(audio.tobytes())
+        self._spool_file.flush()
+        self._spooled.append((self._write_offset, audio.size, task[1:]))
+        self._write_offset += audio.size
+        self._spooled_samples += audio.size
+        self.spilled_total += 1
+
+    def _unspill(self):
+        entry = self._spooled.popleft()
+        if entry is not None:
+            offset, length, rest = entry
+            if length:
+                view = np.memmap(self._spool_path, dtype=np.float32, mode="r", offset=offset * 4, shape=(length,))
+                audio = np.array(view)
+                del view
+            else:
+                audio = np.zeros(0, dtype=np.float32)
+            self._spooled_samples -= length
+        if not self._spooled and self._spool_file is not None:
+            # Spool drained: rewind so the file does not grow without bound
+            self._spool_file.truncate(0)
+            self._write_offset = 0
+        return None if entry is None else (audio, *rest)
+
+
+# (name, from mark, to mark) spans reported per segment, in milliseconds
+LATENCY_SPANS = [
+    ("endpoint_ms", "capture", "endpoint"),
+    ("enqueue_ms", "endpoint", "enqueue"),
+    ("queue_wait_ms", "enqueue", "second_pass_start"),
+    ("second_pass_ms", "second_pass_start", "second_pass_end"),
+    ("emit_ms", "second_pass_end", "emit"),
+    ("endpoint_to_final_ms", "endpoint", "emit"),
+    ("capture_to_final_ms", "capture", "emit"),
+]
+
+
+def segment_timings(marks: dict) -> dict:
+    """Turn time.monotonic() marks recorded along the pipeline into per-stage durations (ms)."""
+    return {
+        name: round((marks[end] - marks[start]) * 1000.0, 1)
+        for name, start, end in LATENCY_SPANS
+        if start in marks and end in marks
+    }
+
+
+class LatencyStats:
+    """Thread-safe latency samples per stage, summarised as percentiles per reporting window."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: "collections.defaultdict[str, List[float]]" = collections.defaultdict(list)
+        self._window_start = time.monotonic()
+
+    def record(self, stage: str, value_ms: float):
+        with self._lock:
+            self._samples[stage].append(value_ms)
+
+    def record_timings(self, timings: dict):
+        with self._lock:
+            for stage, value_ms in timings.items():
+                self._samples[stage].append(value_ms)
+
+    def summary(self, reset: bool = True) -> dict:
+        with self._lock:
+            samples, now = self._samples, time.monotonic()
+            window = now - self._window_start
+            if reset:
+                self._samples = collections.defaultdict(list)
+                self._window_start = now
+        stages = {}
+        for stage, values in samples.items():
+            arr = np.asarray(values, dtype=np.float64)
+            p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+            stages[stage] = {
+                "count": int(arr.size),
+                "mean": round(float(arr.mean()), 1),
+                "p50": round(float(p50), 1),
+                "p95": round(float(p95), 1),
+                "p99": round(float(p99), 1),
+                "max": round(float(arr.max()), 1),
+            }
+        return {"window_seconds": round(window, 1), "stages": stages}
+
+
+class SegmentBuffer:
+    """Growable float32 buffer holding the audio of the segment being captured.
+
+    append() copies into preallocated storage that doubles when full
+    (amortised O(1)); detach() hands the filled region out as a zero-copy view
+    and starts fresh storage, so the view stays valid for the 2nd pass.
+    """
+
+    def __init__(self, initial_capacity: int):
+        self._initial = max(1, initial_capacity)
+        self._data = np.empty(self._initial, dtype=np.float32)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, samples: np.ndarray):
+        n = len(samples)
+        needed = self._size + n
+        if needed > len(self._data):
+            capacity = len(self._data)
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty(capacity, dtype=np.float32)
+            grown[: self._size] = self._data[: self._size]
+            self._data = grown
+        self._data[self._size : needed] = samples
+        self._size = needed
+
+    def view(self) -> np.ndarray:
+        """Zero-copy view of the buffered audio; invalidated by later append()/clear()."""
+        return self._data[: self._size]
+
+    def detach(self) -> np.ndarray:
+        """Return the buffered audio and reset; the returned array is never written again."""
+        if self._size == 0:
+            return np.zeros(0, dtype=np.float32)
+        out = self._data[: self._size]
+        self._data = np.empty(self._initial, dtype=np.float32)
+        self._size = 0
+        return out
+
+    def clear(self):
+        self._size = 0
+
+
+class VadFeeder:
+    """Bulk front end for a sherpa-onnx VoiceActivityDetector.
+
+    accept() passes every whole VAD window of a block in one accept_waveform
+    call and carries the remainder (less than one window) over to the next
+    block. The fed audio is kept in a history buffer, so finished segments come
+    back as (start_sample, view) where the view slices that history instead of
+    rebuilding an array from the binding's per-sample list. History that no
+    future segment can reach (before the last returned segment, or more than
+    `keep_seconds` behind the newest sample) is dropped in amortised batches.
+    """
+
+    def __init__(self, vad: sherpa_onnx.VoiceActivityDetector, window_size: int, sample_rate: int, keep_seconds: float = 30.0):
+        self.vad = vad
+        self.window = max(1, int(window_size or 1))
+        self.keep = int(keep_seconds * sample_rate)
+        self.carry = np.zeros(0, dtype=np.float32)
+        self.history = SegmentBuffer(self.keep)
+        self.history_start = 0  # VAD sample index of history[0]
+        self.consumed = 0  # history before this VAD sample index is no longer needed
+        self.base = 0  # added to VAD sample indices in returned segment starts
+
+    @classmethod
+    def from_args(cls, args, vad_bundle) -> Optional["VadFeeder"]:
+        if not vad_bundle:
+            return None
+        vad, window_size = vad_bundle
+        # A segment never spans more than max_speech plus the VAD's own padding
+        return cls(vad, window_size or args.sample_rate, args.sample_rate, max(30.0, args.vad_max_speech + 10.0))
+
+    def accept(self, samples: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        self.history.append(samples)
+        data = np.concatenate([self.carry, samples]) if len(self.carry) else samples
+        usable = len(data) - len(data) % self.window
+        if usable:
+            self.vad.accept_waveform(data[:usable])
+        self.carry = data[usable:].copy()
+        found = self._segments()
+        self._trim()
+        return found
+
+    def flush(self) -> List[Tuple[int, np.ndarray]]:
+        """Feed the remainder (zero-padded to a whole window) and close any open segment."""
+        if len(self.carry):
+            padding = np.zeros(self.window - len(self.carry), dtype=np.float32)
+            self.history.append(padding)
+            self.vad.accept_waveform(np.concatenate([self.carry, padding]))
+            self.carry = np.zeros(0, dtype=np.float32)
+        self.vad.flush()
+        return self._segments()
+
+    def reset(self, base: int = 0):
+        """Restart the VAD; segments fed from now on start counting at `base`."""
+        self.vad.reset()
+        self.base = base
+        self.carry = np.zeros(0, dtype=np.float32)
+        self.history.detach()  # views already handed out stay valid
+        self.history_start = 0
+        self.consumed = 0
+
+    def _segments(self) -> List[Tuple[int, np.ndarray]]:
+        found = []
+        while not self.vad.empty():
+            segment = self.vad.front
+            start = segment.start
+            samples = segment.samples
+            offset = start - self.history_start
+            if offset >= 0 and offset + len(samples) <= len(self.history):
+                audio = self.history.view()[offset : offset + len(samples)]
+            else:
+                audio = np.asarray(samples, dtype=np.float32).reshape(-1)
+            found.append((self.base + start, audio))
+            self.consumed = max(self.consumed, start + len(samples))
+            self.vad.pop()
+        return found
+
+    def _trim(self):
+        newest = self.history_start + len(self.history)
+        drop = max(self.consumed, newest - self.keep) - self.history_start
+        if drop < self.keep:
+            return
+        # detach() keeps the storage behind returned views untouched
+        rest = self.history.detach()[drop:]
+        self.history.append(rest)
+        self.history_start += drop
+
+
+class EnergyGate:
+    """Energy / zero-crossing gate that keeps clear silence away from the models.
+
+    Each chunk is split into 10 ms frames and scored in one vectorised pass: it
+    counts as speech when a frame rises margin_db above the noise floor, or
+    margin_db / 2 with a high zero-crossing rate (unvoiced consonants are
+    quiet but noisy). The floor is the minimum frame energy over the last few
+    seconds, so it follows fans and room noise without a calibration step.
+    The gate stays open for hangover_seconds after the last speech chunk and,
+    when it opens, returns the last preroll_seconds of gated audio in front of
+    the chunk so word onsets are not clipped.
+    """
+
+    FLOOR_SECONDS = 5.0
+    MIN_FLOOR_DB = -90.0
+
+    def __init__(self, sample_rate: int, chunk_samples: int, margin_db: float, hangover_seconds: float, preroll_seconds: float):
+        self.frame = max(1, sample_rate // 100)
+        self.chunk_seconds = chunk_samples / sample_rate
+        self.margin_db = margin_db
+        self.hangover_chunks = max(1, int(math.ceil(hangover_seconds / self.chunk_seconds)))
+        self.preroll: "collections.deque[np.ndarray]" = collections.deque(maxlen=max(0, int(math.ceil(preroll_seconds / self.chunk_seconds))))
+        self.minima: "collections.deque[float]" = collections.deque(maxlen=max(1, int(self.FLOOR_SECONDS / self.chunk_seconds)))
+        self.open_chunks = 0
+        self.gated_chunks = 0
+        self.openings = 0
+        self.cpu_seconds = 0.0
+        self.reset()
+
+    def reset(self):
+        # Start open: the first chunks may already be speech and the floor is still unknown
+        self.remaining = self.hangover_chunks
+        self.preroll.clear()
+        self.minima.clear()
+
+    @property
+    def is_open(self) -> bool:
+        return self.remaining > 0
+
+    @property
+    def floor_db(self) -> float:
+        return min(self.minima) if self.minima else self.MIN_FLOOR_DB
+
+    def _is_speech(self, samples: np.ndarray) -> bool:
+        count = len(samples) // self.frame
+        if count == 0:
+            return self.is_open
+        frames = samples[: count * self.frame].reshape(count, self.frame)
+        energy_db = 10.0 * np.log10(np.mean(np.square(frames), axis=1) + 1e-10)
+        zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+        floor = self.floor_db if self.minima else float(energy_db.min())
+        self.minima.append(max(self.MIN_FLOOR_DB, float(energy_db.min())))
+        loud = energy_db > floor + self.margin_db
+        fricative = (energy_db > floor + self.margin_db / 2) & (zcr > 0.3)
+        return bool(np.any(loud | fricative))
+
+    def process(self, samples: np.ndarray) -> Optional[np.ndarray]:
+        """Return the audio to feed the models (pre-roll included on opening), or None while gated."""
+        cpu_start = time.thread_time()
+        was_open = self.is_open
+        if self._is_speech(samples):
+            self.remaining = self.hangover_chunks
+        elif self.remaining > 0:
+            self.remaining -= 1
+        if self.is_open:
+            self.open_chunks += 1
+            out = samples
+            if not was_open:
+                self.openings += 1
+                if self.preroll:
+                    out = np.concatenate(list(self.preroll) + [samples])
+                    self.preroll.clear()
+        else:
+            self.gated_chunks += 1
+            self.preroll.append(samples)
+            out = None
+        self.cpu_seconds += time.thread_time() - cpu_start
+        return out
+
+    def stats(self, model_cpu_seconds: float) -> dict:
+        """Counters plus CPU saved, estimated from the models' CPU per open chunk."""
+        per_chunk = model_cpu_seconds / self.open_chunks if self.open_chunks else 0.0
+        total = self.open_chunks + self.gated_chunks
+        return {
+            "open_seconds": round(self.open_chunks * self.chunk_seconds, 2),
+            "gated_seconds": round(self.gated_chunks * self.chunk_seconds, 2),
+            "gated_ratio": round(self.gated_chunks / total, 3) if total else 0.0,
+            "openings": self.openings,
+            "noise_floor_db": round(self.floor_db, 1),
+            "gate_cpu_seconds": round(self.cpu_seconds, 3),
+            "cpu_saved_seconds": round(max(0.0, per_chunk * self.gated_chunks - self.cpu_seconds), 3),
+        }
+
+
+class OverloadGuard:
+    """Deadline monitor for the streaming loop with a fixed degradation ladder.
+
+    observe() is called once per chunk with the time the loop spent on it and
+    the audio still waiting in the capture ring. The loop is overloaded when
+    the backlog exceeds backlog_limit or the smoothed busy/real-time ratio
+    exceeds 1. After escalate_chunks overloaded chunks in a row the next action
+    in `ladder` is switched on; after relax_chunks comfortable chunks in a row
+    (backlog under a quarter of the limit, ratio under 0.6) the last one is
+    switched off again. Counting chunks rather than wall time makes the same
+    load produce the same sequence of steps.
+    """
+
+    def __init__(self, ladder: List[str], chunk_seconds: float, backlog_limit: float, escalate_seconds: float = 0.5, relax_seconds: float = 3.0):
+        self.ladder = ladder
+        self.backlog_limit = backlog_limit
+        self.escalate_chunks = max(1, int(round(escalate_seconds / chunk_seconds)))
+        self.relax_chunks = max(1, int(round(relax_seconds / chunk_seconds)))
+        self.level = 0
+        self.ratio = 0.0
+        self.backlog = 0.0
+        self.hot = 0
+        self.cool = 0
+        self.deadline_misses = 0
+        self.escalations = 0
+        self.peak_backlog = 0.0
+
+    def active(self, action: str) -> bool:
+        return action in self.ladder[: self.level]
+
+    def observe(self, busy_seconds: float, audio_seconds: float, backlog_seconds: float) -> bool:
+        """Record one chunk; return True when the degradation level changed."""
+        if audio_seconds <= 0:
+            return False
+        ratio = busy_seconds / audio_seconds
+        self.ratio = 0.8 * self.ratio + 0.2 * ratio
+        self.backlog = backlog_seconds
+        self.peak_backlog = max(self.peak_backlog, backlog_seconds)
+        if ratio > 1.0:
+            self.deadline_misses += 1
+        if backlog_seconds > self.backlog_limit or self.ratio > 1.0:
+            self.hot += 1
+            self.cool = 0
+        elif backlog_seconds < self.backlog_limit / 4 and self.ratio < 0.6:
+            self.cool += 1
+            self.hot = 0
+        else:
+            self.hot = self.cool = 0
+        if self.hot >= self.escalate_chunks and self.level < len(self.ladder):
+            self.level += 1
+            self.escalations += 1
+            self.hot = 0
+            return True
+        if self.cool >= self.relax_chunks and self.level > 0:
+            self.level -= 1
+            self.cool = 0
+            return True
+        return False
+
+    def event(self) -> dict:
+        return {
+            "type": "overload",
+            "state": "degraded" if self.level else "recovered",
+            "level": self.level,
+            "actions": self.ladder[: self.level],
+            "backlog_ms": round(self.backlog * 1000.0, 1),
+            "load": round(self.ratio, 3),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "level": self.level,
+            "escalations": self.escalations,
+            "deadline_misses": self.deadline_misses,
+            "peak_backlog_ms": round(self.peak_backlog * 1000.0, 1),
+        }
+
+
+class AudioRingBuffer:
+    """Preallocated single-producer/single-consumer float32 ring buffer.
+
+    The audio callback writes and the recognition loop reads; each side only
+    advances its own counter, so no lock is shared between them. When the
+    consumer falls behind, incoming samples that do not fit are dropped and
+    counted as an overflow instead of blocking the callback.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._data = np.zeros(self.capacity, dtype=np.float32)
+        self._write_pos = 0
+        self._read_pos = 0
+        self._ready = threading.Event()
+        self.overflows = 0
+        self.dropped_samples = 0
+        self.underflows = 0
+
+    def available(self) -> int:
+        return self._write_pos - self._read_pos
+
+    def free(self) -> int:
+        return self.capacity - self.available()
+
+    def write(self, samples: np.ndarray):
+        n = len(samples)
+        free = self.capacity - self.available()
+        if n > free:
+            self.overflows += 1
+            self.dropped_samples += n - free
+            samples = samples[:free]
+            n = free
+        if n:
+            start = self._write_pos % self.capacity
+            first = min(n, self.capacity - start)
+            self._data[start : start + first] = samples[:first]
+            if first < n:
+                self._data[: n - first] = samples[first:]
+            self._write_pos += n
+        self._ready.set()
+
+    def read(self, n: int, timeout: float) -> Optional[np.ndarray]:
+        """Return a copy of the next n samples, or None if they did not arrive within timeout."""
+        deadline = time.monotonic() + timeout
+        while self.available() < n:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.underflows += 1
+                return None
+            self._ready.clear()
+            if self.available() >= n:
+                break
+            self._ready.wait(remaining)
+        start = self._read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        if first == n:
+            out = self._data[start : start + n].copy()
+        else:
+            out = np.concatenate([self._data[start:], self._data[: n - first]])
+        self._read_pos += n
+        return out
+
+    def clear(self):
+        self._read_pos = self._write_pos
+
+    def stats(self) -> dict:
+        return {
+            "overflows": self.overflows,
+            "dropped_samples": self.dropped_samples,
+            "underflows": self.underflows,
+            "buffered_samples": self.available(),
+        }
+
+
+class AudioSource(abc.ABC):
+    """Push-style audio input driving the streaming loop.
+
+    start() delivers mono float32 blocks at the configured sample rate to
+    callback(indata, frames, time_info, status) -- the sounddevice
+    InputStream callback signature -- from a background thread. Finite
+    sources set ``finished`` once their last block has been delivered.
+    """
+
+    name = "source"
+
+    def __init__(self, sample_rate: int, blocksize: int):
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.fed_samples = 0
+        self.finished = threading.Event()
+
+    @abc.abstractmethod
+    def start(self, callback, has_room):
+        """Begin delivering blocks to callback; has_room(n) says whether the consumer can take n samples."""
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class MicrophoneSource(AudioSource):
+    """sounddevice InputStream; real time, so it never waits for ring space."""
+
+    name = "microphone"
+
+    def __init__(self, sample_rate: int, blocksize: int, device_index: Optional[int]):
+        super().__init__(sample_rate, blocksize)
+        self.device_index = device_index
+        self._stream: Optional[sd.InputStream] = None
+
+    def start(self, callback, has_room):  # pylint: disable=unused-argument
+        require_sounddevice()
+        self._stream = sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype="float32",
+            device=self.device_index,
+            blocksize=self.blocksize,
+            callback=callback,
+        )
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+
+class BlockSource(AudioSource):
+    """Feeds blocks from blocks() on a thread.
+
+    speed=1.0 paces blocks in real time; speed<=0 delivers as fast as the
+    consumer keeps up (has_room gates each write so nothing is dropped, which
+    also back-pressures pipes and sockets).
+    """
+
+    def __init__(self, sample_rate: int, blocksize: int, speed: float = 0.0, gap_seconds: float = 1.0):
+        super().__init__(sample_rate, blocksize)
+        self.speed = speed
+        self.gap_samples = int(gap_seconds * sample_rate)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._callback = None
+        self._has_room = None
+
+    @abc.abstractmethod
+    def blocks(self) -> Iterator[np.ndarray]:
+        """Mono float32 blocks at sample_rate until the input ends."""
+
+    def silence(self) -> Iterator[np.ndarray]:
+        """Trailing silence so endpointing/VAD close the segment at a file or connection boundary."""
+        for _ in range(-(-self.gap_samples // self.blocksize)):
+            yield np.zeros(self.blocksize, dtype=np.float32)
+
+    def start(self, callback, has_room):
+        self._callback = callback
+        self._has_room = has_room
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+
+    def _run(self):
+        started = time.monotonic()
+        try:
+            for block in self.blocks():
+                if not self._feed(block, started):
+                    return
+        except Exception as exc:  # pylint: disable=broad-except
+            if not self._stop.is_set():
+                emit({"type": "error", "message": f"Audio source '{self.name}' failed: {exc}"})
+        finally:
+            self.finished.set()
+
+    def _feed(self, block: np.ndarray, started: float) -> bool:
+        if self.speed > 0:
+            due = started + self.fed_samples / self.sample_rate / self.speed
+            delay = due - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                return False
+        else:
+            while not self._has_room(len(block)):
+                if self._stop.wait(0.001):
+                    return False
+        self._callback(block.reshape(-1, 1), len(block), None, None)
+        self.fed_samples += len(block)
+        return not self._stop.is_set()
+
+
+class FileSource(BlockSource):
+    """Replays WAV files (any PCM format) separated by gap_seconds of silence."""
+
+    name = "file"
+
+    def __init__(self, files: List[Path], sample_rate: int, blocksize: int, speed: float, gap_seconds: float = 1.0):
+        super().__init__(sample_rate, blocksize, speed, gap_seconds)
+        self.files = files
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        for path in self.files:
+            yield from iter_wav_float_mono(path, self.sample_rate, self.blocksize)
+            yield from self.silence()
+
+
+class PcmStreamSource(BlockSource):
+    """Raw interleaved PCM from a binary stream (stdin by default) until EOF."""
+
+    name = "stdin"
+
+    def __init__(self, stream, fmt: str, channels: int, in_rate: int, sample_rate: int, blocksize: int):
+        super().__init__(sample_rate, blocksize)
+        self.stream = stream
+        self.fmt = fmt
+        self.channels = channels
+        self.in_rate = in_rate
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        yield from iter_pcm_float_mono(self.stream, self.fmt, self.channels, self.in_rate, self.sample_rate, self.blocksize)
+        yield from self.silence()
+
+
+def listen_socket(address: str, backlog: int = 1) -> socket.socket:
+    """Listening socket for tcp://host:port or unix:///path with a short accept timeout."""
+    if address.startswith("unix://"):
+        path = address[len("unix://"):]
+        if os.path.exists(path):
+            os.unlink(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+    elif address.startswith("tcp://"):
+        host, _, port = address[len("tcp://"):].rpartition(":")
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((host or "127.0.0.1", int(port)))
+    else:
+        raise ValueError(f"Unsupported socket address: {address}")
+    server.listen(backlog)
+    server.settimeout(0.5)
+    return server
+
+
+class SocketSource(BlockSource):
+    """Raw PCM pushed over tcp://host:port or unix:///path, one connection at a time.
+
+    Runs until stopped; each closed connection is followed by a silence gap so
+    its last segment is finalised before the next client's audio.
+    """
+
+    name = "socket"
+
+    def __init__(self, address: str, fmt: str, channels: int, in_rate: int, sample_rate: int, blocksize: int):
+        super().__init__(sample_rate, blocksize)
+        self.address = address
+        self.fmt = fmt
+        self.channels = channels
+        self.in_rate = in_rate
+        self._server: Optional[socket.socket] = None
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        self._server = listen_socket(self.address)
+        emit({"type": "log", "message": f"Waiting for PCM on {self.address}"})
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn, _ = self._server.accept()
+                except socket.timeout:
+                    continue
+                emit({"type": "log", "message": f"Audio client connected on {self.address}"})
+                conn.settimeout(None)
+                with conn, conn.makefile("rb") as reader:
+                    yield from iter_pcm_float_mono(reader, self.fmt, self.channels, self.in_rate, self.sample_rate, self.blocksize)
+                emit({"type": "log", "message": f"Audio client disconnected from {self.address}"})
+                yield from self.silence()
+        finally:
+            self.close()
+
+    def stop(self):
+        self._stop.set()
+        self.close()
+        super().stop()
+
+    def close(self):
+        server, self._server = self._server, None
+        if server is not None:
+            server.close()
+            if self.address.startswith("unix://"):
+                try:
+                    os.unlink(self.address[len("unix://"):])
+                except OSError:
+                    pass
+
+
+def create_audio_source(args, blocksize: int, device_index: Optional[int]) -> AudioSource:
+    """Build the AudioSource selected by --benchmark/--source."""
+    spec = args.source
+    if args.benchmark:
+        return FileSource(benchmark_corpus(args.benchmark), args.sample_rate, blocksize, args.benchmark_speed)
+    if spec == "mic":
+        return MicrophoneSource(args.sample_rate, blocksize, device_index)
+    if spec.startswith("file:"):
+        return FileSource(benchmark_corpus(spec[len("file:"):]), args.sample_rate, blocksize, args.source_speed)
+    if spec == "stdin":
+        return PcmStreamSource(sys.stdin.buffer, args.pcm_format, args.pcm_channels, args.pcm_rate, args.sample_rate, blocksize)
+    if spec.startswith(("tcp://", "unix://")):
+        return SocketSource(spec, args.pcm_format, args.pcm_channels, args.pcm_rate, args.sample_rate, blocksize)
+    raise ValueError(f"Unknown --source: {spec}")
+
+
+def benchmark_corpus(path: str) -> List[Path]:
+    """WAV files under a directory (recursive, sorted) or a single file."""
+    corpus = Path(path).expanduser()
+    files = sorted(corpus.rglob("*.wav")) if corpus.is_dir() else [corpus]
+    return [f for f in files if f.is_file()]
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+class StreamingResampler:
+    """Stateful polyphase resampler (rational L/M) for float32 blocks.
+
+    Output is aligned with the input (filter delay compensated) and block
+    boundaries do not affect the result, so files can be converted block by
+    block. Call flush() once after the last block. Output is computed
+    OUTPUT_BLOCK samples at a time, so the per-sample tap gather stays a few
+    MB however long the input block is.
+    """
+
+    OUTPUT_BLOCK = 4096
+
+    def __init__(self, in_rate: int, out_rate: int, zero_crossings: int = 10):
+        g = math.gcd(in_rate, out_rate)
+        self.up = out_rate // g
+        self.down = in_rate // g
+        self.passthrough = self.up == self.down
+        if self.passthrough:
+            return
+        factor = max(self.up, self.down)
+        num_taps = 2 * zero_crossings * factor + 1
+        cutoff = 0.5 / factor  # cycles per sample at the upsampled rate
+        n = np.arange(num_taps) - (num_taps - 1) / 2
+        proto = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(num_taps, 8.0) * self.up
+        self.taps = -(-num_taps // self.up)
+        padded = np.zeros(self.taps * self.up)
+        padded[:num_taps] = proto
+        # phases[p, k] = h[p + k*L]
+        self.phases = padded.reshape(self.taps, self.up).T.astype(np.float32)
+        self.delay = (num_taps - 1) // 2
+        self._buf = np.zeros(self.taps - 1, dtype=np.float32)
+        self._base = -(self.taps - 1)  # absolute input index of _buf[0]
+        self._consumed = 0
+        self._produced = 0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        if self.passthrough:
+            return block
+        self._buf = np.concatenate([self._buf, block.astype(np.float32, copy=False)])
+        self._consumed += len(block)
+        return self._run()
+
+    def flush(self) -> np.ndarray:
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        wanted = -(-self._consumed * self.up // self.down)
+        self._buf = np.concatenate([self._buf, np.zeros(self.taps + self.delay // self.up + 1, dtype=np.float32)])
+        available = self._base + len(self._buf)
+        out = self._run(available)
+        return out[: max(0, wanted - (self._produced - len(out)))]
+
+    def _run(self, available: Optional[int] = None) -> np.ndarray:
+        available = self._consumed if available is None else available
+        end = (available * self.up - 1 - self.delay) // self.down + 1
+        if end <= self._produced:
+            return np.zeros(0, dtype=np.float32)
+        out = np.empty(end - self._produced, dtype=np.float32)
+        offsets = np.arange(self.taps)[None, :]
+        for start in range(self._produced, end, self.OUTPUT_BLOCK):
+            stop = min(end, start + self.OUTPUT_BLOCK)
+            u = np.arange(start, stop, dtype=np.int64) * self.down + self.delay
+            idx = (u // self.up - self._base)[:, None] - offsets
+            out[start - self._produced : stop - self._produced] = np.einsum("nk,nk->n", self._buf[idx], self.phases[u % self.up])
+        self._produced = end
+        keep_from = (end * self.down + self.delay) // self.up - (self.taps - 1)
+        drop = max(0, min(keep_from - self._base, len(self._buf)))
+        self._buf = self._buf[drop:]
+        self._base += drop
+        return out
+
+
+def check_wav_format(wf: "wave.Wave_read") -> Tuple[int, int, int]:
+    """Validate an open WAV reader and return (channels, sample_width, sample_rate)."""
+    num_channels = wf.getnchannels()
+    sampwidth = wf.getsampwidth()
+    sr = wf.getframerate()
+    if num_channels < 1:
+        raise ValueError(f"Invalid channel count: {num_channels}")
+    if sampwidth not in (1, 2, 3, 4):
+        raise ValueError(f"Unsupported sample width: {sampwidth} bytes")
+    return num_channels, sampwidth, sr
+
+
+def pcm_to_float32(raw: bytes, sampwidth: int, channels: int = 1, is_float: bool = False) -> np.ndarray:
+    """Convert interleaved little-endian PCM to mono float32 in [-1, 1)."""
+    if is_float:
+        data = np.frombuffer(raw, dtype="<f4").astype(np.float32)
+    elif sampwidth == 1:
+        data = np.frombuffer(raw, dtype=np.uint8).astype(np.float32)
+        data -= 128.0
+        data *= 1.0 / 128.0
+    elif sampwidth == 2:
+        data = np.frombuffer(raw, dtype="<i2").astype(np.float32)
+        data *= 1.0 / 32768.0
+    elif sampwidth == 3:
+        packed = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        widened = np.zeros((len(packed), 4), dtype=np.uint8)
+        widened[:, 1:] = packed
+        data = widened.view("<i4").reshape(-1).astype(np.float32)
+        data *= 1.0 / 2147483648.0
+    else:
+        data = np.frombuffer(raw, dtype="<i4").astype(np.float32)
+        data *= 1.0 / 2147483648.0
+    if channels > 1:
+        usable = len(data) - len(data) % channels
+        data = data[:usable].reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    return data
+
+
+def resample_blocks(blocks: Iterator[np.ndarray], in_rate: int, out_rate: int) -> Iterator[np.ndarray]:
+    resampler = StreamingResampler(in_rate, out_rate)
+    for block in blocks:
+        out = resampler.process(block)
+        if out.size:
+            yield out
+    tail = resampler.flush()
+    if tail.size:
+        yield tail
+
+
+def iter_wav_float_mono(path: Path, target_sr: int, block_frames: int) -> Iterator[np.ndarray]:
+    """Yield mono float32 blocks at target_sr; memory use is independent of file length.
+
+    Stereo/multi-channel input is downmixed and other sample rates are
+    resampled block by block, so any PCM WAV can be decoded directly.
+    """
+    with wave.open(str(path), "rb") as wf:
+        channels, sampwidth, sr = check_wav_format(wf)
+
+        def blocks():
+            while True:
+                raw = wf.readframes(block_frames)
+                if not raw:
+                    break
+                yield pcm_to_float32(raw, sampwidth, channels)
+
+        yield from resample_blocks(blocks(), sr, target_sr)
+
+
+# --pcm-format -> (bytes per sample, is_float)
+PCM_FORMATS = {"s16le": (2, False), "s32le": (4, False), "f32le": (4, True), "u8": (1, False)}
+
+
+def iter_pcm_float_mono(stream, fmt: str, channels: int, in_rate: int, target_sr: int, block_frames: int) -> Iterator[np.ndarray]:
+    """Yield mono float32 blocks at target_sr from raw interleaved PCM (e.g. ffmpeg piped to stdin)."""
+    if fmt not in PCM_FORMATS:
+        raise ValueError(f"Unsupported PCM format: {fmt}")
+    sampwidth, is_float = PCM_FORMATS[fmt]
+    frame_bytes = sampwidth * max(1, channels)
+
+    def blocks():
+        leftover = b""
+        while True:
+            raw = stream.read(block_frames * frame_bytes)
+            if not raw:
+                break
+            raw = leftover + raw
+            usable = len(raw) - len(raw) % frame_bytes
+            leftover = raw[usable:]
+            if usable:
+                yield pcm_to_float32(raw[:usable], sampwidth, channels, is_float)
+
+    yield from resample_blocks(blocks(), in_rate, target_sr)
+
+
+def open_audio_blocks(args, wav_path: Path, block_frames: int) -> Iterator[np.ndarray]:
+    """Audio blocks for a file job; '-' reads raw PCM from stdin as described by --pcm-*."""
+    if str(wav_path) == "-":
+        return iter_pcm_float_mono(
+            sys.stdin.buffer, args.pcm_format, args.pcm_channels, args.pcm_rate, args.sample_rate, block_frames
+        )
+    return iter_wav_float_mono(wav_path, args.sample_rate, block_frames)
+
+
+def read_wav_float_mono(path: Path, expected_sr: int) -> np.ndarray:
+    """Read a whole WAV into one mono float32 array at expected_sr without a full PCM copy."""
+    with wave.open(str(path), "rb") as wf:
+        _, _, sr = check_wav_format(wf)
+        nframes = wf.getnframes()
+    out = np.empty(-(-nframes * expected_sr // sr), dtype=np.float32)
+    pos = 0
+    for block in iter_wav_float_mono(path, expected_sr, sr * 10):
+        n = min(len(block), len(out) - pos)
+        out[pos : pos + n] = block[:n]
+        pos += n
+    return out[:pos]
+
+
+def transcribe_wav(args, second_pass, vad_bundle, wav_path: Path, job_id: Optional[str] = None):
+    """Decode a WAV file with VAD segmentation (if available) and emit results.
+
+    Raises on read/VAD failures so callers can decide whether to exit.
+    """
+    started = time.perf_counter()
+
+    vad_feeder = VadFeeder.from_args(args, vad_bundle)
+    if vad_feeder is not None:
+        vad_feeder.reset()
+
+    pending: List[Tuple[np.ndarray, int]] = []
+    max_batch = max(1, args.second_batch_size)
+    workers = max(1, args.wav_workers)
+    # Batches handed to the pool, oldest first, so results are emitted in timestamp order
+    inflight: "collections.deque[Tuple[List[Tuple[np.ndarray, int]], Future]]" = collections.deque()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="second-pass") if workers > 1 else None
+
+    def emit_batch(batch: List[Tuple[np.ndarray, int]], texts: List[str]):
+        for (segment_audio, start_sample), text in zip(batch, texts):
+            duration = len(segment_audio) / args.sample_rate
+            start_time = max(0.0, start_sample / args.sample_rate)
+            end_time = start_time + duration
+            payload = {
                 "type": "result",
                 "stage": "second-pass",
                 "segments": [
@@ -350,28 +2399,511 @@ def process_wav_input(args, first_pass, second_pass, vad_bundle):
                     }
                 ],
             }
-        )
+            if job_id is not None:
+                payload["job_id"] = job_id
+            emit(payload)
+
+    def drain_inflight(block: bool):
+        while inflight and (block or inflight[0][1].done()):
+            batch, future = inflight.popleft()
+            emit_batch(batch, future.result())
+
+    def decode_pending():
+        """Run 2nd pass for the buffered segments (inline or on the pool)."""
+        if not pending:
+            return
+        batch = list(pending)
+        pending.clear()
+        if executor is None:
+            emit_batch(batch, run_second_pass_batch(second_pass, [audio for audio, _ in batch], args.sample_rate))
+            return
+        future = executor.submit(run_second_pass_batch, second_pass, [audio for audio, _ in batch], args.sample_rate)
+        inflight.append((batch, future))
+        drain_inflight(block=False)
+        # Cap queued work so memory stays proportional to the pool, not the file
+        while len(inflight) > workers * 2:
+            batch, future = inflight.popleft()
+            emit_batch(batch, future.result())
+
+    def decode_segment(segment_audio: np.ndarray, start_sample: int):
+        pending.append((segment_audio, start_sample))
+        if len(pending) >= max_batch:
+            decode_pending()
+
+    total_samples = 0
+    try:
+        if vad_feeder is not None:
+            # Whole VAD windows per block (~10s); the feeder carries any remainder
+            block_frames = vad_feeder.window * max(1, args.sample_rate * 10 // vad_feeder.window)
+            for block in open_audio_blocks(args, wav_path, block_frames):
+                total_samples += len(block)
+                for start_sample, segment_audio in vad_feeder.accept(block):
+                    decode_segment(segment_audio, start_sample)
+            # 文件结尾没有静音时，VAD 不会自动闭合最后一段
+            for start_sample, segment_audio in vad_feeder.flush():
+                decode_segment(segment_audio, start_sample)
+            vad_feeder.reset()
+        else:
+            # Without VAD the whole file is one segment, so it has to be materialised once
+            if str(wav_path) == "-":
+                blocks = list(open_audio_blocks(args, wav_path, args.sample_rate))
+                samples = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+            else:
+                samples = read_wav_float_mono(wav_path, args.sample_rate)
+            total_samples = len(samples)
+            decode_segment(samples, 0)
+        decode_pending()
+        drain_inflight(block=True)
+    finally:
+        if executor is not None:
+            for _, future in inflight:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    audio_seconds = total_samples / args.sample_rate
+    wall_seconds = time.perf_counter() - started
+    payload = {
+        "type": "metrics",
+        "name": "wav-decode",
+        "audio_seconds": round(audio_seconds, 2),
+        "wall_seconds": round(wall_seconds, 3),
+        "rtf": round(wall_seconds / audio_seconds, 4) if audio_seconds > 0 else 0.0,
+        "workers": workers,
+    }
+    if second_pass_cache is not None:
+        payload["cache"] = second_pass_cache.stats()
+    if job_id is not None:
+        payload["job_id"] = job_id
+    emit(payload)
 
-    if vad:
+
+def process_wav_input(args, first_pass, second_pass, vad_bundle):
+    wav_path = Path(args.wav_input).expanduser()
+    if args.wav_input != "-" and not wav_path.is_file():
+        emit({"type": "error", "message": f"WAV file not found: {wav_path}"})
+        sys.exit(1)
+
+    emit({"type": "ready"})
+    emit({"type": "log", "message": f"Processing WAV (push-to-talk): {wav_path}"})
+
+    try:
+        transcribe_wav(args, second_pass, vad_bundle, wav_path)
+    except Exception as exc:  # pylint: disable=broad-except
+        emit({"type": "error", "message": f"WAV decoding failed: {exc}"})
+        sys.exit(1)
+
+    emit({"type": "complete", "message": "Push-to-talk WAV decoding done"})
+    sys.exit(0)
+
+
+class ControlPlane:
+    """Own the stdin command channel with an asyncio event loop.
+
+    Each line is either a plain command as sent by Electron ("start",
+    "mode manual", "device 2") or a JSON object such as
+    {"id": "7", "cmd": "device", "arg": "2"}. JSON commands carrying an "id"
+    are answered with {"type": "ack", "id": "7", "cmd": "device", "ok": true}
+    once their handler has returned. Handlers run one at a time, in arrival
+    order, on a worker thread; returning False (or raising) marks the command
+    as failed. "quit"/"exit" and end of input call on_close and end the loop,
+    and `wake` is set after every command so waiters re-check their state
+    instead of polling for it.
+    """
+
+    QUIT_COMMANDS = ("quit", "exit")
+
+    def __init__(
+        self,
+        handlers: Dict[str, Callable[[str], Optional[bool]]],
+        on_close: Callable[[], None],
+        wake: Optional[threading.Event] = None,
+    ):
+        self.handlers = handlers
+        self.on_close = on_close
+        self.wake = wake
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._main()), daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    @staticmethod
+    def parse(line: str) -> Tuple[str, str, Optional[str]]:
+        """Return (command, argument, request id) for one input line."""
+        raw = line.strip()
+        if raw.startswith("{"):
+            try:
+                payload = json.loads(raw)
+            except ValueError:
+                payload = None
+            if isinstance(payload, dict):
+                req_id = payload.get("id")
+                arg = payload.get("arg")
+                return (
+                    str(payload.get("cmd", "")).strip().lower(),
+                    "" if arg is None else str(arg).strip(),
+                    None if req_id is None else str(req_id),
+                )
+        cmd, _, arg = raw.partition(" ")
+        return cmd.lower(), arg.strip(), None
+
+    def dispatch(self, line: str) -> str:
+        cmd, arg, req_id = self.parse(line)
+        if not cmd:
+            return cmd
+        ok, message = True, ""
+        handler = self.handlers.get(cmd)
+        if handler is not None:
+            try:
+                ok = handler(arg) is not False
+            except Exception as exc:  # pylint: disable=broad-except
+                ok, message = False, str(exc)
+                emit({"type": "log", "message": f"Command '{cmd}' failed: {exc}"})
+        elif cmd not in self.QUIT_COMMANDS:
+            ok, message = False, "unknown command"
+            emit({"type": "log", "message": f"Unknown command: {line.strip()}"})
+        if req_id is not None:
+            ack = {"type": "ack", "id": req_id, "cmd": cmd, "ok": ok}
+            if message:
+                ack["message"] = message
+            emit(ack)
+        if self.wake is not None:
+            self.wake.set()
+        return cmd
+
+    async def _open_reader(self, loop) -> Optional[asyncio.StreamReader]:
+        # Pipes (how Electron spawns us) are watched by the loop directly; a tty
+        # shares its file description with stdout, and files or /dev/null cannot
+        # be polled, so those fall back to a blocking readline
+        if sys.platform == "win32" or sys.stdin.isatty():
+            return None
+        try:
+            mode = os.fstat(sys.stdin.fileno()).st_mode
+        except (OSError, ValueError):
+            return None
+        if not (stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode)):
+            return None
+        reader = asyncio.StreamReader()
+        try:
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        except (ValueError, OSError, NotImplementedError):
+            return None
+        return reader
+
+    async def _main(self):
+        loop = asyncio.get_running_loop()
+        worker = ThreadPoolExecutor(max_workers=1)
+        try:
+            reader = await self._open_reader(loop)
+            while True:
+                if reader is not None:
+                    line = (await reader.readline()).decode("utf-8", errors="replace")
+                else:
+                    line = await loop.run_in_executor(None, sys.stdin.readline)
+                if not line:
+                    break
+                if await loop.run_in_executor(worker, self.dispatch, line) in self.QUIT_COMMANDS:
+                    break
+        finally:
+            worker.shutdown(wait=False)
+            self.on_close()
+            if self.wake is not None:
+                self.wake.set()
+
+
+def parse_transcribe_command(payload: str, next_id: int) -> Tuple[str, str]:
+    """Split 'transcribe [<job-id>] <path>' into (job_id, path).
+
+    The whole payload is treated as a path when it names an existing file,
+    so paths containing spaces work without a job id.
+    """
+    payload = payload.strip()
+    if Path(payload).expanduser().is_file() or " " not in payload:
+        return f"job-{next_id}", payload
+    job_id, path = payload.split(" ", 1)
+    return job_id, path.strip()
+
+
+def serve_batch(args, second_pass, vad_bundle):
+    """Long-lived batch mode: keep models warm and decode files sent on stdin.
+
+    Commands (one per line, plain or as ControlPlane JSON):
+      transcribe [<job-id>] <path>   # decode a WAV, emit result/complete with job_id
+      quit | exit                    # leave the loop
+    """
+    emit({"type": "ready"})
+    emit({"type": "log", "message": "Batch server mode: send 'transcribe [<job-id>] <path>' via stdin; 'quit' to exit"})
+
+    jobs_done = 0
+    exit_event = threading.Event()
+
+    def transcribe(payload: str) -> bool:
+        nonlocal jobs_done
+        job_id, path = parse_transcribe_command(payload, jobs_done + 1)
+        jobs_done += 1
+        wav_path = Path(path).expanduser()
+        if not path or not wav_path.is_file():
+            emit({"type": "error", "job_id": job_id, "message": f"WAV file not found: {wav_path}"})
+            return False
+
+        emit({"type": "log", "job_id": job_id, "message": f"Processing WAV: {wav_path}"})
         try:
-            offset = 0
-            window = vad_window_size or max(1, len(samples))
-            while offset < len(samples):
-                end = min(offset + window, len(samples))
-                vad.accept_waveform(samples[offset:end])
-                offset = end
-                while not vad.empty():
-                    segment = vad.front
-                    segment_audio = np.asarray(segment.samples, dtype=np.float32).reshape(-1)
-                    decode_segment(segment_audio, segment.start)
-                    vad.pop()
+            transcribe_wav(args, second_pass, vad_bundle, wav_path, job_id=job_id)
         except Exception as exc:  # pylint: disable=broad-except
-            emit({"type": "error", "message": f"VAD processing failed: {exc}"})
-            sys.exit(1)
-    else:
-        decode_segment(samples, 0)
+            emit({"type": "error", "job_id": job_id, "message": f"WAV decoding failed: {exc}"})
+            return False
+        emit({"type": "complete", "job_id": job_id, "message": "WAV decoding done"})
+        return True
 
-    emit({"type": "complete", "message": "Push-to-talk WAV decoding done"})
+    ControlPlane({"transcribe": transcribe}, on_close=exit_event.set).start()
+    try:
+        exit_event.wait()
+    except KeyboardInterrupt:
+        pass
+
+    emit({"type": "complete", "message": f"Batch server stopped after {jobs_done} job(s)"})
+    sys.exit(0)
+
+
+class StreamSession:
+    """Per-connection state for the multi-session server; models are shared."""
+
+    def __init__(self, session_id: str, first_pass: sherpa_onnx.OnlineRecognizer, args):
+        self.id = session_id
+        self.stream = first_pass.create_stream()
+        self.vad_feeder = VadFeeder.from_args(args, create_vad(args))
+        self.ring = AudioRingBuffer(int(max(1.0, args.ring_buffer_seconds) * args.sample_rate))
+        self.segment_buffer = SegmentBuffer(int(max(args.vad_max_speech, 10.0) * args.sample_rate))
+        self.carry_over = np.zeros(0, dtype=np.float32)
+        self.carry_end = 0  # sample index where carry_over ends
+        self.partials = PartialTracker(args.partial_mode, args.partial_max_rate, {"session": session_id})
+        self.total_samples_seen = 0
+        self.last_chunk_at = time.monotonic()
+        self.tick_audio: List[np.ndarray] = []
+        self.eof = False
+
+
+def run_session_server(args, first_pass, second_pass):
+    """Serve many concurrent audio sessions with one OnlineRecognizer and one OfflineRecognizer.
+
+    Each connection to --sessions-listen (tcp://host:port or unix:///path)
+    pushes raw PCM (--pcm-*) and becomes a session with its own online stream
+    and VAD. Every tick all sessions with pending frames are decoded together
+    with decode_streams, and finished segments from all sessions share one
+    batching 2nd-pass queue. Events carry "session"; send 'quit' on stdin to stop.
+    """
+    samples_per_read = max(1, int(args.chunk_duration * args.sample_rate))
+    sessions: Dict[str, StreamSession] = {}
+    sessions_lock = threading.Lock()
+    data_ready = threading.Event()
+    exit_event = threading.Event()
+    decode_queue = SpillQueue(args.second_queue_size, args.spool_dir)
+    latency = LatencyStats()
+
+    def decode_worker():
+        pin_thread("second_pass")
+        max_batch = max(1, args.second_batch_size)
+        max_wait = max(0.0, args.second_batch_wait_ms / 1000.0)
+        while True:
+            tasks, stop = collect_batch(decode_queue, max_batch, max_wait)
+            try:
+                if tasks:
+                    decode_start = time.monotonic()
+                    texts = run_second_pass_batch(
+                        second_pass, [task[0] for task in tasks], args.sample_rate, [task[4] for task in tasks]
+                    )
+                    decode_end = time.monotonic()
+                    for (_, start_time, end_time, marks, _, session_id), text in zip(tasks, texts):
+                        marks.update(second_pass_start=decode_start, second_pass_end=decode_end, emit=time.monotonic())
+                        timings = segment_timings(marks)
+                        emit(
+                            {
+                                "type": "result",
+                                "stage": "second-pass",
+                                "session": session_id,
+                                "segments": [
+                                    {
+                                        "start_time": round(start_time, 2),
+                                        "end_time": round(end_time, 2),
+                                        "text": text,
+                                        "speaker": session_id,
+                                    }
+                                ],
+                                "timings": timings,
+                            }
+                        )
+                        latency.record_timings(timings)
+            except Exception as exc:  # pylint: disable=broad-except
+                emit({"type": "error", "message": f"Second-pass decode failed: {exc}"})
+            finally:
+                for _ in range(len(tasks) + (1 if stop else 0)):
+                    decode_queue.task_done()
+            if stop:
+                break
+
+    def reader(session: StreamSession, conn: socket.socket):
+        try:
+            with conn, conn.makefile("rb") as pcm:
+                for block in iter_pcm_float_mono(
+                    pcm, args.pcm_format, args.pcm_channels, args.pcm_rate, args.sample_rate, samples_per_read
+                ):
+                    # Back-pressure the client instead of dropping its audio
+                    while session.ring.free() < len(block) and not exit_event.is_set():
+                        time.sleep(0.001)
+                    session.ring.write(block)
+                    data_ready.set()
+        except Exception as exc:  # pylint: disable=broad-except
+            emit({"type": "log", "session": session.id, "message": f"Session read failed: {exc}"})
+        finally:
+            session.eof = True
+            data_ready.set()
+
+    def acceptor(server: socket.socket):
+        counter = 0
+        while not exit_event.is_set():
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            conn.settimeout(None)
+            with sessions_lock:
+                if len(sessions) >= args.max_sessions:
+                    emit({"type": "log", "message": f"Rejecting connection: {args.max_sessions} sessions active"})
+                    conn.close()
+                    continue
+                counter += 1
+                session = StreamSession(f"s{counter}", first_pass, args)
+                sessions[session.id] = session
+            emit({"type": "session", "session": session.id, "state": "open"})
+            threading.Thread(target=reader, args=(session, conn), daemon=True).start()
+
+    def finalize(session: StreamSession, segment_audio: np.ndarray, start_sample: int):
+        endpoint_at = time.monotonic()
+        session.partials.reset()
+        if segment_audio.size > 0:
+            second_audio, session.carry_over, context = apply_tail_padding(
+                session.carry_over,
+                segment_audio,
+                args.tail_padding,
+                args.tail_padding_mode,
+                contiguous=abs(start_sample - session.carry_end) <= samples_per_read,
+            )
+            session.carry_end = start_sample + len(segment_audio)
+            start_time = max(0.0, start_sample / args.sample_rate)
+            end_time = start_time + len(segment_audio) / args.sample_rate
+            marks = {"capture": session.last_chunk_at, "endpoint": endpoint_at, "enqueue": time.monotonic()}
+            decode_queue.put_nowait((second_audio, start_time, end_time, marks, context / args.sample_rate, session.id))
+        session.segment_buffer.clear()
+        first_pass.reset(session.stream)
+
+    def update_session(session: StreamSession):
+        """Partials, VAD and endpointing for one session after the shared decode."""
+        partial = session.partials.update(first_pass, session.stream)
+
+        new_audio, session.tick_audio = session.tick_audio, []
+        if session.vad_feeder is not None:
+            vad_segmented = False
+            for samples in new_audio:
+                for start_sample, segment_audio in session.vad_feeder.accept(samples):
+                    finalize(session, segment_audio, start_sample)
+                    vad_segmented = True
+            if vad_segmented:
+                return
+        if first_pass.is_endpoint(session.stream):
+            chunk_audio = session.segment_buffer.detach()
+            finalize(session, chunk_audio, max(0, session.total_samples_seen - len(chunk_audio)))
+
+    def close_session(session: StreamSession):
+        remainder = session.ring.available()
+        tail = session.ring.read(remainder, timeout=0) if remainder else np.zeros(0, dtype=np.float32)
+        session.total_samples_seen += len(tail)
+        if session.vad_feeder is not None:
+            # Close the VAD's open segment instead of dropping speech at end of stream
+            closing = session.vad_feeder.accept(tail) if tail.size else []
+            for start_sample, segment_audio in closing + session.vad_feeder.flush():
+                finalize(session, segment_audio, start_sample)
+        else:
+            session.segment_buffer.append(tail)
+            chunk_audio = session.segment_buffer.detach()
+            if chunk_audio.size:
+                finalize(session, chunk_audio, max(0, session.total_samples_seen - len(chunk_audio)))
+        with sessions_lock:
+            sessions.pop(session.id, None)
+        emit({"type": "session", "session": session.id, "state": "closed", "audio_seconds": round(session.total_samples_seen / args.sample_rate, 2)})
+
+    def on_close():
+        exit_event.set()
+        data_ready.set()
+
+    try:
+        server = listen_socket(args.sessions_listen, backlog=args.max_sessions)
+    except Exception as exc:  # pylint: disable=broad-except
+        emit({"type": "error", "message": f"Failed to listen on {args.sessions_listen}: {exc}"})
+        sys.exit(1)
+
+    decoder_thread = threading.Thread(target=decode_worker, daemon=True)
+    decoder_thread.start()
+    threading.Thread(target=acceptor, args=(server,), daemon=True).start()
+    ControlPlane({}, on_close=on_close).start()
+    emit({"type": "ready"})
+    emit({"type": "log", "message": f"Multi-session server listening on {args.sessions_listen} (max {args.max_sessions} sessions)"})
+
+    # The tick loop runs the shared first pass; keep it on the reserved cores
+    pin_thread("first_pass")
+    try:
+        while not exit_event.is_set():
+            with sessions_lock:
+                active = list(sessions.values())
+            # A tick advances every session with a full chunk by exactly one chunk,
+            # so endpointing sees the same granularity as the single-stream loop
+            stepped = []
+            for session in active:
+                if session.ring.available() >= samples_per_read:
+                    samples = session.ring.read(samples_per_read, timeout=0)
+                    session.last_chunk_at = time.monotonic()
+                    session.total_samples_seen += len(samples)
+                    session.stream.accept_waveform(args.sample_rate, samples)
+                    session.segment_buffer.append(samples)
+                    session.tick_audio.append(samples)
+                    stepped.append(session)
+
+            # One batched first-pass decode for every session with pending frames
+            decode_started = time.monotonic()
+            ready = [session for session in stepped if first_pass.is_ready(session.stream)]
+            if ready:
+                while ready:
+                    first_pass.decode_streams([session.stream for session in ready])
+                    ready = [session for session in ready if first_pass.is_ready(session.stream)]
+                latency.record("first_pass_decode_ms", (time.monotonic() - decode_started) * 1000.0)
+
+            for session in stepped:
+                update_session(session)
+            for session in active:
+                if session.eof and session.ring.available() < samples_per_read:
+                    close_session(session)
+
+            if not stepped:
+                # Readers, session EOFs and quit all set this; idle servers never wake
+                data_ready.wait()
+                data_ready.clear()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        exit_event.set()
+        server.close()
+        with sessions_lock:
+            remaining = list(sessions.values())
+        for session in remaining:
+            close_session(session)
+        decode_queue.put_nowait(None)
+        decoder_thread.join(timeout=5)
+        decode_queue.close()
+        summary = latency.summary()
+        if summary["stages"]:
+            emit({"type": "metrics", "name": "latency", **summary})
+
+    emit({"type": "complete", "message": "Multi-session server stopped"})
     sys.exit(0)
 
 
@@ -381,19 +2913,82 @@ def run_manual_mode(args, second_pass, first_pass: Optional[sherpa_onnx.OnlineRe
 
     record_event = threading.Event()
     exit_event = threading.Event()
-    buffer: List[np.ndarray] = []
+    buffer = SegmentBuffer(30 * args.sample_rate)
     buffer_lock = threading.Lock()
     stream_lock = threading.Lock()
     stream_handle: Optional[sd.InputStream] = None
     first_stream = first_pass.create_stream() if first_pass else None
-    last_partial = ""
+    partials = PartialTracker(args.partial_mode, args.partial_max_rate)
     device_index = choose_input_device(args.device, args.device_index)
     blocksize = max(1, int(args.chunk_duration * args.sample_rate))
 
+    chunker: Optional[UtteranceChunker] = None
+    if args.manual_chunking != "none":
+        chunker = UtteranceChunker(
+            args.sample_rate,
+            args.manual_chunking,
+            args.manual_chunk_seconds,
+            args.manual_chunk_overlap,
+            create_vad(args) if args.manual_chunking == "vad" else None,
+        )
+    chunk_blocks: "queue.Queue" = queue.Queue()
+
+    def emit_piece(audio: np.ndarray, start_sample: int, context: int):
+        text = run_second_pass_batch(second_pass, [audio], args.sample_rate, [context / args.sample_rate])[0]
+        start_time = start_sample / args.sample_rate
+        emit(
+            {
+                "type": "result",
+                "stage": "second-pass",
+                "segments": [
+                    {
+                        "start_time": round(start_time, 2),
+                        "end_time": round(start_time + (len(audio) - context) / args.sample_rate, 2),
+                        "text": text,
+                        "speaker": "PushToTalk",
+                    }
+                ],
+            }
+        )
+
+    def chunk_worker():
+        """Decode finished pieces while the key is held; an Event item asks for the remainder."""
+        while True:
+            item = chunk_blocks.get()
+            if item is None:
+                return
+            try:
+                if isinstance(item, threading.Event):
+                    for piece in chunker.finish():
+                        emit_piece(*piece)
+                else:
+                    for piece in chunker.feed(item):
+                        emit_piece(*piece)
+            except Exception as exc:  # pylint: disable=broad-except
+                emit({"type": "error", "message": f"Second-pass decode failed: {exc}"})
+            finally:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    if chunker is not None:
+        threading.Thread(target=chunk_worker, daemon=True).start()
+        emit({"type": "log", "message": f"Push-to-talk chunking: {chunker.mode}"})
+
     def flush_and_decode():
+        if chunker is not None:
+            if first_pass and first_stream:
+                try:
+                    first_pass.reset(first_stream)
+                except Exception:
+                    pass
+            # Everything but the last piece was decoded while recording
+            done = threading.Event()
+            chunk_blocks.put(done)
+            done.wait()
+            emit({"type": "log", "message": "Second-pass decode finished"})
+            return
         with buffer_lock:
-            samples = np.concatenate(buffer) if buffer else np.zeros(0, dtype=np.float32)
-            buffer.clear()
+            samples = buffer.detach()
         if samples.size == 0:
             emit({"type": "log", "message": "No audio captured in this segment"})
             return
@@ -421,23 +3016,26 @@ def run_manual_mode(args, second_pass, first_pass: Optional[sherpa_onnx.OnlineRe
         emit({"type": "log", "message": "Second-pass decode finished"})
 
     def audio_callback(indata, frames, time_info, status):  # pylint: disable=unused-argument
-        if record_event.is_set():
-            with buffer_lock:
-                buffer.append(indata.copy().reshape(-1))
-            if first_pass and first_stream is not None:
-                try:
-                    first_stream.accept_waveform(args.sample_rate, indata.copy().reshape(-1))
-                    while first_pass.is_ready(first_stream):
-                        first_pass.decode_stream(first_stream)
-                    raw_partial = first_pass.get_result(first_stream)
-                    partial = getattr(raw_partial, "text", raw_partial)
-                    partial = str(partial or "").lower().strip()
-                    nonlocal last_partial
-                    if partial != last_partial:
-                        emit({"type": "first-pass", "text": partial})
-                        last_partial = partial
-                except Exception as exc:  # pylint: disable=broad-except
-                    emit({"type": "log", "message": f"First-pass update failed: {exc}"})
+        block = indata.reshape(-1)
+        with buffer_lock:
+            # stop_recording clears the flag under this lock before posting the
+            # chunker's sentinel, so no block can land after it
+            if not record_event.is_set():
+                return
+            if chunker is not None:
+                # The callback's buffer is reused by PortAudio, so hand the worker a copy
+                chunk_blocks.put(block.copy())
+            else:
+                buffer.append(block)
+        if first_pass and first_stream is not None:
+            try:
+                # accept_waveform consumes the samples synchronously, so the callback's view is enough
+                first_stream.accept_waveform(args.sample_rate, block)
+                while first_pass.is_ready(first_stream):
+                    first_pass.decode_stream(first_stream)
+                partials.update(first_pass, first_stream)
+            except Exception as exc:  # pylint: disable=broad-except
+                emit({"type": "log", "message": f"First-pass update failed: {exc}"})
 
     def stop_stream():
         nonlocal stream_handle
@@ -475,49 +3073,51 @@ def run_manual_mode(args, second_pass, first_pass: Optional[sherpa_onnx.OnlineRe
                 emit({"type": "error", "message": f"Failed to start microphone: {exc}"})
                 return False
 
-    def stdin_listener():
-        for line in sys.stdin:
-            cmd = line.strip().lower()
-            if cmd == "start":
-                with buffer_lock:
-                    buffer.clear()
-                if first_pass:
-                    try:
-                        nonlocal first_stream, last_partial
-                        first_stream = first_pass.create_stream()
-                        last_partial = ""
-                    except Exception as exc:  # pylint: disable=broad-except
-                        emit({"type": "log", "message": f"Failed to reset first-pass stream: {exc}"})
-                if start_stream():
-                    record_event.set()
-                    emit({"type": "log", "message": "Recording started"})
-            elif cmd == "stop":
-                if record_event.is_set():
-                    record_event.clear()
-                    flush_and_decode()
-                    emit({"type": "log", "message": "Recording stopped"})
-                else:
-                    emit({"type": "log", "message": "Stop received but not recording; closing microphone if open"})
-                stop_stream()
-            elif cmd in ("quit", "exit"):
-                exit_event.set()
-                record_event.clear()
-                stop_stream()
-                break
+    def start_recording(_arg: str) -> bool:
+        nonlocal first_stream, partials
+        with buffer_lock:
+            buffer.clear()
+        if first_pass:
+            try:
+                first_stream = first_pass.create_stream()
+                partials = PartialTracker(args.partial_mode, args.partial_max_rate)
+            except Exception as exc:  # pylint: disable=broad-except
+                emit({"type": "log", "message": f"Failed to reset first-pass stream: {exc}"})
+        if not start_stream():
+            return False
+        record_event.set()
+        emit({"type": "log", "message": "Recording started"})
+        return True
+
+    def stop_capture() -> bool:
+        """Stop taking callback blocks; True if a recording was in progress."""
+        with buffer_lock:
+            recording = record_event.is_set()
+            record_event.clear()
+        return recording
+
+    def stop_recording(_arg: str):
+        if stop_capture():
+            flush_and_decode()
+            emit({"type": "log", "message": "Recording stopped"})
+        else:
+            emit({"type": "log", "message": "Stop received but not recording; closing microphone if open"})
+        stop_stream()
+
+    def on_close():
         exit_event.set()
+        record_event.clear()
+        stop_stream()
 
-    listener_thread = threading.Thread(target=stdin_listener, daemon=True)
-    listener_thread.start()
+    ControlPlane({"start": start_recording, "stop": stop_recording}, on_close=on_close).start()
 
     try:
-        while not exit_event.is_set():
-            exit_event.wait(timeout=0.05)
+        exit_event.wait()
     except Exception as exc:  # pylint: disable=broad-except
         emit({"type": "error", "message": f"Recording failed: {exc}"})
         sys.exit(1)
     finally:
-        if record_event.is_set():
-            record_event.clear()
+        if stop_capture():
             flush_and_decode()
         stop_stream()
 
@@ -527,24 +3127,53 @@ def run_manual_mode(args, second_pass, first_pass: Optional[sherpa_onnx.OnlineRe
 
 def main():
     args = get_args()
+    set_log_level(args.log_level)
     if args.sample_rate != 16000:
         emit({"type": "error", "message": "Only 16 kHz sample_rate is supported"})
         sys.exit(1)
 
+    main_started = time.monotonic()
     try:
         emit({"type": "log", "message": "Creating recognizers. Please wait..."})
         emit({"type": "log", "message": f"Args: {json.dumps(vars(args), ensure_ascii=False)}"})
-        second_pass = create_second_pass(args)
-        first_pass = create_first_pass(args)
-        vad_bundle = create_vad(args)
+        # File modes never run the streaming first pass, so skip building it
+        need_first_pass = not (args.serve or args.wav_input)
+        # Profile the variants with the thread counts they will actually run with
+        discovered = discover_model_dir(args, need_first_pass)
+        plan_threads(args, need_first_pass)
+        resolve_model_dir(args, need_first_pass, discovered)
+        first_pass, second_pass, vad_bundle, startup = load_models(args, need_first_pass)
     except Exception as exc:  # pylint: disable=broad-except
         emit({"type": "error", "message": f"Failed to create recognizers: {exc}"})
         sys.exit(1)
+    startup["import_ms"] = round((main_started - STARTED_AT) * 1000.0, 1)
+    startup["load_ms"] = round((time.monotonic() - main_started) * 1000.0, 1)
+    if args.warmup:
+        try:
+            startup.update(warm_up(args, first_pass, second_pass, vad_bundle))
+        except Exception as exc:  # pylint: disable=broad-except
+            emit({"type": "log", "message": f"Warm-up decode failed (continuing): {exc}"})
+    # Enabled after the warm-up so its synthetic audio is neither cached nor answered from the cache
+    global second_pass_cache  # pylint: disable=global-statement
+    try:
+        second_pass_cache = SecondPassCache.from_args(args)
+    except OSError as exc:
+        emit({"type": "log", "message": f"Second-pass cache disabled: {exc}"})
+    startup["total_ms"] = round((time.monotonic() - STARTED_AT) * 1000.0, 1)
+    emit({"type": "metrics", "name": "startup", **startup})
+
+    if args.serve:
+        serve_batch(args, second_pass, vad_bundle)
+        return
 
     if args.wav_input:
         process_wav_input(args, first_pass, second_pass, vad_bundle)
         return
 
+    if args.sessions_listen:
+        run_session_server(args, first_pass, second_pass)
+        return
+
     if args.disable_endpoint and not vad_bundle and not args.manual_mode:
         emit({"type": "error", "message": "Endpoint detection is disabled but no VAD is enabled; cannot segment audio."})
         sys.exit(1)
@@ -562,20 +3191,59 @@ def main():
         }
     )
 
-    devices = log_devices()
-    if not devices:
-        emit({"type": "error", "message": "No microphone devices found"})
-        sys.exit(1)
-
-    device_index = choose_input_device(args.device, args.device_index)
+    benchmark_files: List[Path] = []
+    use_microphone = args.source == "mic" and not args.benchmark
+    # stdin carries audio (not commands) for --source stdin; benchmarks run unattended
+    stdin_control = args.source != "stdin" and not args.benchmark
+    if args.benchmark or args.source.startswith("file:"):
+        corpus = args.benchmark or args.source[len("file:"):]
+        benchmark_files = benchmark_corpus(corpus)
+        if not benchmark_files:
+            emit({"type": "error", "message": f"No WAV files found: {corpus}"})
+            sys.exit(1)
+    if not use_microphone:
+        # Headless input: no device and always streaming
+        args.manual_mode = False
+        if not stdin_control:
+            args.start_paused = False
+        device_index = None
+        emit({"type": "log", "message": f"Audio source: {'benchmark' if args.benchmark else args.source}"})
+    else:
+        devices = log_devices()
+        if not devices:
+            emit({"type": "error", "message": "No microphone devices found"})
+            sys.exit(1)
+        device_index = choose_input_device(args.device, args.device_index)
     samples_per_read = max(1, int(args.chunk_duration * args.sample_rate))
     carry_over = np.zeros(0, dtype=np.float32)
-    vad = None
-    vad_window_size = None
-    if vad_bundle:
-        vad, vad_window_size = vad_bundle
-    current_chunks: List[np.ndarray] = []
-    last_partial = ""
+    carry_end = 0  # sample index where carry_over ends
+    vad_feeder = VadFeeder.from_args(args, vad_bundle)
+    segment_buffer = SegmentBuffer(int(max(args.vad_max_speech, 10.0) * args.sample_rate))
+    energy_gate: Optional[EnergyGate] = None
+    if args.energy_gate:
+        energy_gate = EnergyGate(
+            args.sample_rate,
+            samples_per_read,
+            args.energy_gate_margin_db,
+            args.energy_gate_hangover,
+            args.energy_gate_preroll,
+        )
+    overload_guard: Optional[OverloadGuard] = None  # set up next to the read loop
+    primary_first_pass = first_pass
+    greedy_future: Optional[Future] = None
+    chunker: Optional[UtteranceChunker] = None
+    if args.manual_chunking != "none":
+        chunker = UtteranceChunker(
+            args.sample_rate,
+            args.manual_chunking,
+            args.manual_chunk_seconds,
+            args.manual_chunk_overlap,
+            create_vad(args) if args.manual_chunking == "vad" else None,
+        )
+        emit({"type": "log", "message": f"Push-to-talk chunking: {chunker.mode}"})
+    chunked_samples = 0  # manual utterance audio held by the chunker instead of segment_buffer
+    stream_origin: Optional[int] = None  # sample index of the first audio fed since the 1st-pass stream was reset
+    partials = PartialTracker(args.partial_mode, args.partial_max_rate)
     total_samples_seen = 0
     stream = first_pass.create_stream()
     record_event = threading.Event()
@@ -590,7 +3258,30 @@ def main():
         emit({"type": "log", "message": "Capture is paused; waiting for 'start' command"})
 
     # Offload 2nd-pass decoding to a worker to avoid blocking the audio loop
-    decode_queue: "queue.Queue[Tuple[np.ndarray, float, float]]" = queue.Queue(maxsize=8)
+    latency = LatencyStats()
+    last_chunk_at = time.monotonic()  # when the newest chunk left the capture ring
+    cpu_seconds = {"first_pass": 0.0, "vad": 0.0, "second_pass": 0.0}  # thread CPU time per stage
+
+    def gate_stats() -> dict:
+        return energy_gate.stats(cpu_seconds["first_pass"] + cpu_seconds["vad"])
+
+    segments_enqueued = 0
+    benchmark_started = time.monotonic()
+
+    # Overflow beyond --second-queue-size is spooled to disk rather than dropped
+    decode_queue = SpillQueue(args.second_queue_size, args.spool_dir)
+
+    # --speculative-pause: decode the open segment as soon as the first pass stops
+    # producing tokens, and commit that text if the segment then ends without new speech
+    speculator = (
+        ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculative", initializer=pin_thread, initargs=("second_pass",))
+        if args.speculative_pause > 0
+        else None
+    )
+    speculation: Optional[Tuple[Future, int, str]] = None  # (decode, segment start sample, partial it covers)
+    watched_partial = ""
+    partial_changed_at = 0  # total_samples_seen when the partial last changed
+    speculation_stats = {"launched": 0, "committed": 0, "discarded": 0}
 
     def get_mode() -> str:
         with mode_lock:
@@ -609,45 +3300,108 @@ def main():
         stop_audio_stream("mode-switch")
 
     def decode_worker():
+        pin_thread("second_pass")
+        max_batch = max(1, args.second_batch_size)
+        max_wait = max(0.0, args.second_batch_wait_ms / 1000.0)
         while True:
-            task = decode_queue.get()
-            if task is None:
-                decode_queue.task_done()
-                break
+            tasks, stop = collect_batch(decode_queue, max_batch, max_wait)
             try:
-                second_audio, start_time, end_time = task
+                if not tasks:
+                    continue
+                total = sum(len(task[0]) for task in tasks) / args.sample_rate
                 emit(
-                  {
-                      "type": "log",
-                      "message": f"Second-pass decoding {len(second_audio)/args.sample_rate:.2f}s [{start_time:.2f},{end_time:.2f}]",
-                  }
+                    {
+                        "type": "log",
+                        "message": f"Second-pass decoding {len(tasks)} segment(s), {total:.2f}s "
+                        f"[{tasks[0][1]:.2f},{tasks[-1][2]:.2f}]",
+                    }
                 )
-                second_text = run_second_pass(second_pass, second_audio, args.sample_rate)
+                # Segments committed from a speculative decode carry a Future with their text
+                speculated = {}
+                for idx, task in enumerate(tasks):
+                    if len(task) > 5:
+                        try:
+                            speculated[idx] = task[5].result()
+                        except Exception:  # pylint: disable=broad-except
+                            pass  # cancelled or failed: decode it normally below
+                pending = [task for idx, task in enumerate(tasks) if idx not in speculated]
+                decode_start = time.monotonic()
+                cpu_start = time.thread_time()
+                decoded = iter(
+                    run_second_pass_batch(
+                        second_pass, [task[0] for task in pending], args.sample_rate, [task[4] for task in pending]
+                    )
+                )
+                cpu_seconds["second_pass"] += time.thread_time() - cpu_start
+                decode_end = time.monotonic()
+                for idx, task in enumerate(tasks):
+                    _, start_time, end_time, marks = task[:4]
+                    if idx in speculated:
+                        # Only the part of a speculative decode after the endpoint adds latency
+                        second_text, started, ended = speculated[idx]
+                        marks["second_pass_start"] = max(started, marks["enqueue"])
+                        marks["second_pass_end"] = max(ended, marks["second_pass_start"])
+                    else:
+                        second_text = next(decoded)
+                        marks["second_pass_start"] = decode_start
+                        marks["second_pass_end"] = decode_end
+                    marks["emit"] = time.monotonic()
+                    timings = segment_timings(marks)
+                    emit(
+                        {
+                            "type": "result",
+                            "stage": "second-pass",
+                            "segments": [
+                                {
+                                    "start_time": round(start_time, 2),
+                                    "end_time": round(end_time, 2),
+                                    "text": second_text,
+                                    "speaker": "Microphone",
+                                }
+                            ],
+                            "timings": timings,
+                        }
+                    )
+                    latency.record_timings(timings)
                 emit(
                     {
-                        "type": "result",
-                        "stage": "second-pass",
-                        "segments": [
-                            {
-                                "start_time": round(start_time, 2),
-                                "end_time": round(end_time, 2),
-                                "text": second_text,
-                                "speaker": "Microphone",
-                            }
-                        ],
+                        "type": "metrics",
+                        "name": "second-pass-queue",
+                        "lag": round(time.monotonic() - tasks[0][3]["enqueue"], 3),
+                        **decode_queue.stats(args.sample_rate),
+                        **({"cache": second_pass_cache.stats()} if second_pass_cache is not None else {}),
+                        **({"speculative": dict(speculation_stats)} if speculator is not None else {}),
                     }
                 )
             except Exception as exc:  # pylint: disable=broad-except
                 emit({"type": "error", "message": f"Second-pass decode failed: {exc}"})
             finally:
-                decode_queue.task_done()
+                for _ in range(len(tasks) + (1 if stop else 0)):
+                    decode_queue.task_done()
+            if stop:
+                break
 
     decoder_thread = threading.Thread(target=decode_worker, daemon=True)
     decoder_thread.start()
 
-    def switch_device(target: str):
+    def metrics_reporter():
+        interval = args.metrics_interval
+        while not exit_event.wait(timeout=interval):
+            summary = latency.summary()
+            if summary["stages"]:
+                emit({"type": "metrics", "name": "latency", **summary})
+            if energy_gate is not None:
+                emit({"type": "metrics", "name": "energy-gate", **gate_stats()})
+
+    if args.metrics_interval > 0 and not args.benchmark:
+        threading.Thread(target=metrics_reporter, daemon=True).start()
+
+    def switch_device(target: str) -> bool:
         """Switch microphone without restarting models."""
         nonlocal device_index
+        if not use_microphone:
+            emit({"type": "log", "message": f"Device switch ignored: audio source is {args.source}"})
+            return False
         target = (target or "").strip()
         name = ""
         idx = -1
@@ -660,118 +3414,266 @@ def main():
             new_idx = choose_input_device(name, idx)
         except Exception as exc:  # pylint: disable=broad-except
             emit({"type": "log", "message": f"Switch device failed: {exc}"})
-            return
+            return False
 
         devices = sd.query_devices()
         if new_idx is None or new_idx < 0 or new_idx >= len(devices):
             emit({"type": "log", "message": f"Device not found for target '{target}'"})
-            return
+            return False
         if new_idx == device_index:
             emit({"type": "log", "message": f"Device unchanged: {devices[new_idx]['name']} (index {new_idx})"})
-            return
+            return True
 
         device_index = new_idx
         stop_audio_stream("device-switch")
         flush_current_segment("device-switch")
         emit({"type": "log", "message": f"Microphone switched to: {devices[new_idx].get('name','')} (index {new_idx})"})
+        return True
 
     def reset_state():
-        nonlocal carry_over, current_chunks, last_partial, total_samples_seen, stream, vad, vad_window_size
+        nonlocal carry_over, carry_end, partials, total_samples_seen, stream, vad_feeder, chunked_samples
         with state_lock:
             carry_over = np.zeros(0, dtype=np.float32)
-            current_chunks = []
-            last_partial = ""
+            carry_end = 0
+            if chunker is not None:
+                chunker.reset()
+            chunked_samples = 0
+            discard_speculation()
+            segment_buffer.clear()
+            partials = PartialTracker(args.partial_mode, args.partial_max_rate)
+            partials.paused = overload_guard is not None and overload_guard.active("pause-partials")
             total_samples_seen = 0
-            first_pass.reset(stream)
+            reset_first_pass_stream()
             if vad_bundle:
-                vad, vad_window_size = create_vad(args) or (None, None)
+                vad_feeder = VadFeeder.from_args(args, create_vad(args))
+            if energy_gate is not None:
+                energy_gate.reset()
         emit({"type": "log", "message": "Capture state reset"})
 
+    def reset_first_pass_stream():
+        """Start a new 1st-pass utterance; the next sample fed becomes its time origin."""
+        nonlocal stream_origin
+        first_pass.reset(stream)
+        stream_origin = None
+
     def flush_current_segment(reason: str = "stop"):
-        nonlocal current_chunks
         with state_lock:
-            if not current_chunks:
+            pending = len(segment_buffer) or chunked_samples
+            if not pending:
                 return
-            chunk_audio = np.concatenate(current_chunks)
-            start_sample = max(0, total_samples_seen - len(chunk_audio))
-            emit({"type": "log", "message": f"Flushing buffered audio on {reason} ({len(chunk_audio)/args.sample_rate:.2f}s)"})
+            chunk_audio = segment_buffer.detach()
+            start_sample = max(0, total_samples_seen - pending)
+            emit({"type": "log", "message": f"Flushing buffered audio on {reason} ({pending/args.sample_rate:.2f}s)"})
             finalize_segment(chunk_audio, start_sample)
-            current_chunks = []
+
+    def speculate():
+        """Start a 2nd-pass decode of the open segment on the speculative thread."""
+        nonlocal speculation
+        audio = segment_buffer.view().copy()
+        start_sample = max(0, total_samples_seen - len(audio))
+        second_audio, _, context = apply_tail_padding(
+            carry_over,
+            audio,
+            args.tail_padding,
+            args.tail_padding_mode,
+            contiguous=abs(start_sample - carry_end) <= samples_per_read,
+        )
+
+        def decode() -> Tuple[str, float, float]:
+            started = time.monotonic()
+            text = run_second_pass_batch(second_pass, [second_audio], args.sample_rate, [context / args.sample_rate])[0]
+            return text, started, time.monotonic()
+
+        speculation = (speculator.submit(decode), start_sample, partials.text)
+        speculation_stats["launched"] += 1
+
+    def discard_speculation():
+        nonlocal speculation
+        if speculation is not None:
+            speculation[0].cancel()
+            speculation_stats["discarded"] += 1
+            speculation = None
+
+    def take_speculation(start_sample: int) -> Optional[Future]:
+        """Hand over the speculative decode if nothing was recognised after it started."""
+        nonlocal speculation
+        if speculation is None:
+            return None
+        future, spec_start, spec_partial = speculation
+        if partials.text != spec_partial or start_sample < spec_start - samples_per_read:
+            discard_speculation()
+            return None
+        speculation = None
+        speculation_stats["committed"] += 1
+        return future
+
+    def enqueue_segment(
+        second_audio: np.ndarray,
+        start_sample: int,
+        context: int,
+        endpoint_at: float,
+        length: Optional[int] = None,
+        speculative: Optional[Future] = None,
+    ):
+        """Queue audio for the 2nd pass; the first `context` samples are left context only.
+
+        ``length`` is the segment's own sample count when it differs from the
+        audio minus context (prepended tail in duplicate mode). A ``speculative``
+        decode, when given, supplies the text instead of decoding again.
+        """
+        nonlocal segments_enqueued
+        start_time = max(0.0, start_sample / args.sample_rate)
+        end_time = start_time + (len(second_audio) - context if length is None else length) / args.sample_rate
+        marks = {"capture": last_chunk_at, "endpoint": endpoint_at, "enqueue": time.monotonic()}
+        segments_enqueued += 1
+        task = (second_audio, start_time, end_time, marks, context / args.sample_rate)
+        if speculative is not None:
+            task += (speculative,)
+        if decode_queue.put_nowait(task):
+            emit({"type": "log", "message": f"Second-pass queue full, spooled segment to disk ({decode_queue.qsize()} pending)"})
 
     def finalize_segment(segment_audio: np.ndarray, start_sample: int):
         """Run the 2nd pass for a completed speech segment and reset state."""
-        nonlocal carry_over, current_chunks, last_partial
+        nonlocal carry_over, carry_end, chunked_samples
+        endpoint_at = time.monotonic()
+        speculative = take_speculation(start_sample)
 
-        emit({"type": "first-pass", "text": ""})
-        last_partial = ""
+        partials.reset()
 
         chunk_audio = segment_audio if segment_audio is not None else np.zeros(0, dtype=np.float32)
-        if chunk_audio.size > 0:
+        next_carry = np.zeros(0, dtype=np.float32)
+        if get_mode() == "manual" and chunker is not None:
+            # Earlier pieces were queued while recording; only the remainder is left
+            for piece in chunker.finish():
+                enqueue_segment(*piece, endpoint_at)
+            chunker.reset(total_samples_seen)
+            chunked_samples = 0
+        elif chunk_audio.size > 0:
             if get_mode() == "manual":
-                combined = chunk_audio
-                next_carry = np.zeros(0, dtype=np.float32)
-                second_audio = combined
+                enqueue_segment(chunk_audio, start_sample, 0, endpoint_at)
             else:
-                combined = np.concatenate([carry_over, chunk_audio]) if carry_over.size > 0 else chunk_audio
-                keep_tail = max(0, args.tail_padding)
-                if keep_tail > 0 and combined.size > keep_tail:
-                    next_carry = combined[-keep_tail:]
-                    # 为当前段解码时去掉预留给下一段的 tail，避免重复解码
-                    second_audio = combined
-                else:
-                    next_carry = combined if keep_tail > 0 else np.zeros(0, dtype=np.float32)
-                    second_audio = combined
+                second_audio, next_carry, context = apply_tail_padding(
+                    carry_over,
+                    chunk_audio,
+                    args.tail_padding,
+                    args.tail_padding_mode,
+                    contiguous=abs(start_sample - carry_end) <= samples_per_read,
+                )
+                enqueue_segment(second_audio, start_sample, context, endpoint_at, len(chunk_audio), speculative)
 
-            duration = len(chunk_audio) / args.sample_rate
-            start_time = max(0.0, start_sample / args.sample_rate)
-            end_time = start_time + duration
+        # next_carry is a view into detached/VAD audio that is never written again
+        carry_over = next_carry
+        carry_end = start_sample + len(chunk_audio)
+        segment_buffer.clear()
+        reset_first_pass_stream()
+
+    def close_gate(end_sample: int):
+        """The energy gate shut after its hangover: settle the open utterance as an endpoint would."""
+        segments = vad_feeder.flush() if vad_feeder is not None else []
+        for segment_start, segment_audio in segments:
+            finalize_segment(segment_audio, segment_start)
+        if not segments and partials.text and len(segment_buffer):
+            chunk_audio = segment_buffer.detach()
+            finalize_segment(chunk_audio, max(0, end_sample - len(chunk_audio)))
+        elif not segments:
+            # Only noise reached the models; nothing worth a 2nd pass
+            if partials.text or partials.sent_text:
+                partials.reset()
+            segment_buffer.clear()
+            reset_first_pass_stream()
+        if vad_feeder is not None:
+            vad_feeder.reset()
+
+    def build_greedy_first_pass() -> Optional[sherpa_onnx.OnlineRecognizer]:
+        try:
+            return create_first_pass(argparse.Namespace(**{**vars(args), "first_decoding_method": "greedy_search"}))
+        except Exception as exc:  # pylint: disable=broad-except
+            emit({"type": "log", "message": f"Cannot build greedy_search fallback for the 1st pass: {exc}"})
+            return None
 
-            try:
-                decode_queue.put_nowait((second_audio, start_time, end_time))
-            except queue.Full:
-                emit({"type": "log", "message": "Second-pass queue full, dropping segment"})
-        else:
-            next_carry = np.zeros(0, dtype=np.float32)
+    def on_overload_change():
+        """Apply the guard's current degradation level and report it."""
+        nonlocal greedy_future
+        emit(overload_guard.event())
+        if overload_guard.active("greedy-search") and greedy_future is None:
+            # Built once in the background; the loop swaps recognizers at the next utterance boundary
+            builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="greedy-load", initializer=pin_thread, initargs=("first_pass",))
+            greedy_future = builder.submit(build_greedy_first_pass)
+            builder.shutdown(wait=False)
+        partials.paused = overload_guard.active("pause-partials")
+        if overload_guard.active("vad-only") and overload_guard.ladder[overload_guard.level - 1] == "vad-only":
+            # Just switched to VAD-only segmentation: drop the half-decoded partial
+            reset_first_pass_stream()
+            partials.reset()
+
+    def start_capture(_arg: str):
+        reset_state()
+        record_event.set()
+        emit({"type": "log", "message": "Capture started (start command received)"})
 
-        carry_over = next_carry
-        current_chunks = []
-        first_pass.reset(stream)
+    def stop_capture(_arg: str):
+        record_event.clear()
+        flush_current_segment("stop")
+        emit({"type": "log", "message": "Capture stopped (models kept alive)"})
 
-    def stdin_listener():
-        for line in sys.stdin:
-            cmd = line.strip().lower()
-            if cmd == "start":
-                reset_state()
-                record_event.set()
-                emit({"type": "log", "message": "Capture started (start command received)"})
-            elif cmd == "stop":
-                record_event.clear()
-                flush_current_segment("stop")
-                emit({"type": "log", "message": "Capture stopped (models kept alive)"})
-            elif cmd in ("mode manual", "manual"):
-                record_event.clear()
-                flush_current_segment("mode-switch")
-                request_mode("manual")
-            elif cmd in ("mode auto", "auto"):
-                record_event.clear()
-                flush_current_segment("mode-switch")
-                request_mode("auto")
-            elif cmd.startswith("device"):
-                payload = cmd.split(" ", 1)[1] if " " in cmd else ""
-                switch_device(payload)
-            elif cmd in ("quit", "exit"):
-                exit_event.set()
-                record_event.clear()
-                break
+    def switch_mode(target: str) -> bool:
+        target = target.lower()
+        if target not in ("auto", "manual"):
+            emit({"type": "log", "message": f"Unknown mode: {target}"})
+            return False
+        record_event.clear()
+        flush_current_segment("mode-switch")
+        request_mode(target)
+        return True
+
+    def on_close():
         exit_event.set()
+        record_event.clear()
 
-    listener_thread = threading.Thread(target=stdin_listener, daemon=True)
-    listener_thread.start()
+    # Every command sets wake_event, so a paused loop sleeps until one arrives
+    wake_event = threading.Event()
+    if stdin_control:
+        ControlPlane(
+            {
+                "start": start_capture,
+                "stop": stop_capture,
+                "mode": switch_mode,
+                "manual": lambda _arg: switch_mode("manual"),
+                "auto": lambda _arg: switch_mode("auto"),
+                "device": switch_device,
+            },
+            on_close=on_close,
+            wake=wake_event,
+        ).start()
 
     emit({"type": "ready"})
     emit({"type": "log", "message": "Started! Speak into the microphone..."})
 
-    stream_handle: Optional[sd.InputStream] = None
+    stream_handle: Optional[AudioSource] = None
+    # The PortAudio callback fills this ring; the loop below consumes it, so a slow
+    # decode no longer delays the next device read
+    ring = AudioRingBuffer(int(max(1.0, args.ring_buffer_seconds) * args.sample_rate))
+    device_status = {"input_overflow": 0, "input_underflow": 0}
+    reported_capture_stats: dict = {}
+
+    def capture_callback(indata, frames, time_info, status):  # pylint: disable=unused-argument
+        if status:
+            if status.input_overflow:
+                device_status["input_overflow"] += 1
+            if status.input_underflow:
+                device_status["input_underflow"] += 1
+        ring.write(indata.reshape(-1))
+
+    def capture_stats() -> dict:
+        return {**ring.stats(), **{f"device_{k}": v for k, v in device_status.items()}}
+
+    def report_capture_stats(force: bool = False):
+        nonlocal reported_capture_stats
+        current = capture_stats()
+        counts = {k: v for k, v in current.items() if k != "buffered_samples"}
+        if force or counts != reported_capture_stats:
+            reported_capture_stats = counts
+            emit({"type": "metrics", "name": "capture", **current})
 
     def stop_audio_stream(reason: str = "idle"):
         """Close the microphone stream so the OS stops listening."""
@@ -781,10 +3683,12 @@ def main():
         try:
             stream_handle.stop()
             stream_handle.close()
-            emit({"type": "log", "message": f"Microphone stream closed ({reason})"})
+            emit({"type": "log", "message": f"Audio stream closed ({reason})"})
         except Exception as exc:  # pylint: disable=broad-except
             emit({"type": "log", "message": f"Failed to close microphone stream: {exc}"})
         stream_handle = None
+        ring.clear()
+        report_capture_stats(force=True)
 
     def ensure_audio_stream() -> bool:
         """Lazily open the microphone stream only when capturing."""
@@ -792,15 +3696,10 @@ def main():
         if stream_handle is not None:
             return True
         try:
-            stream_handle = sd.InputStream(
-                samplerate=args.sample_rate,
-                channels=1,
-                dtype="float32",
-                device=device_index,
-                blocksize=samples_per_read,
-            )
-            stream_handle.start()
-            emit({"type": "log", "message": "Microphone stream opened"})
+            stream_handle = create_audio_source(args, samples_per_read, device_index)
+            ring.clear()
+            stream_handle.start(capture_callback, lambda n: ring.free() >= n)
+            emit({"type": "log", "message": f"Audio stream opened ({stream_handle.name})"})
             return True
         except Exception as exc:  # pylint: disable=broad-except
             stream_handle = None
@@ -808,9 +3707,70 @@ def main():
             emit({"type": "error", "message": f"Failed to start microphone stream: {exc}"})
             return False
 
+    def finish_source():
+        """Drain the 2nd pass after a finite source ends; benchmarks also emit (and save) a report."""
+        fed_samples = stream_handle.fed_samples if stream_handle is not None else 0
+        if stream_origin is not None:
+            # No more audio: let the 1st pass decode its last frames before the segment is flushed
+            stream.input_finished()
+            while first_pass.is_ready(stream):
+                first_pass.decode_stream(stream)
+            partials.update(first_pass, stream)
+        flush_current_segment("end-of-input")
+        decode_queue.join()
+        if not args.benchmark:
+            emit({"type": "complete", "message": f"Audio source finished ({fed_samples / args.sample_rate:.2f}s)"})
+            return
+        wall = time.monotonic() - benchmark_started
+        audio_seconds = fed_samples / args.sample_rate
+        report = {
+            "files": len(benchmark_files),
+            "segments": segments_enqueued,
+            "speed": args.benchmark_speed,
+            "audio_seconds": round(audio_seconds, 2),
+            "wall_seconds": round(wall, 3),
+            "rtf": round(wall / audio_seconds, 4) if audio_seconds > 0 else 0.0,
+            "cpu_seconds": {k: round(v, 3) for k, v in cpu_seconds.items()},
+            "peak_rss_mb": peak_rss_mb(),
+            "latency": latency.summary(reset=False)["stages"],
+            "capture": capture_stats(),
+            "args": vars(args),
+        }
+        if speculator is not None:
+            report["speculative"] = dict(speculation_stats)
+        if energy_gate is not None:
+            report["energy_gate"] = gate_stats()
+        if overload_guard is not None:
+            report["overload"] = overload_guard.stats()
+        if args.benchmark_output:
+            Path(args.benchmark_output).expanduser().write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        emit({"type": "benchmark", **report})
+
+    # Unpaced replay never stalls, so a short timeout keeps end-of-corpus detection out of the
+    # wall time; paced replay waits for its next block like a device would
+    replay_speed = args.benchmark_speed if args.benchmark else args.source_speed
+    unpaced = bool(benchmark_files) and replay_speed <= 0
+    read_timeout = min(0.05, args.chunk_duration) if unpaced else max(0.5, 5 * args.chunk_duration)
     energy_log_last_ts = 0.0
+    load_chunk_seconds = 0.0  # audio in the chunk being processed, for the overload guard
+    if args.overload_guard and not unpaced:
+        ladder = ["greedy-search"] if args.first_decoding_method != "greedy_search" else []
+        ladder += ["long-chunks", "pause-partials"]
+        if vad_feeder is not None:
+            ladder.append("vad-only")
+        overload_guard = OverloadGuard(ladder, args.chunk_duration, args.overload_backlog)
+        emit({"type": "log", "message": f"Overload guard enabled (backlog limit {args.overload_backlog:.2f}s, ladder: {', '.join(ladder)})"})
+    # The recognition loop runs the first pass; keep it (and the capture threads it starts) on the reserved cores
+    pin_thread("first_pass")
     try:
         while not exit_event.is_set():
+            if load_chunk_seconds:
+                # Time since the last chunk left the ring is what the loop spent on it
+                busy = time.monotonic() - last_chunk_at
+                if overload_guard.observe(busy, load_chunk_seconds, ring.available() / args.sample_rate):
+                    on_overload_change()
+                load_chunk_seconds = 0.0
+
             if mode_changed.is_set():
                 mode_changed.clear()
                 reset_state()
@@ -820,66 +3780,146 @@ def main():
 
             if not record_event.is_set():
                 stop_audio_stream("paused")
-                exit_event.wait(timeout=0.05)
+                wake_event.wait()
+                wake_event.clear()
                 continue
 
             if not ensure_audio_stream():
                 exit_event.wait(timeout=0.2)
                 continue
 
-            data, _ = stream_handle.read(samples_per_read)
-            emit({"type": "log", "message": f"Mic chunk read: {len(data)} samples"})
-            samples = data.reshape(-1)
-            total_samples_seen += len(samples)
-
-            # 简单能量监测，帮助判断是否采到声音
-            now_ts = total_samples_seen / args.sample_rate
-            if now_ts - energy_log_last_ts >= 0.8:
-                energy_log_last_ts = now_ts
-                if samples.size:
-                    rms = float(np.sqrt(np.mean(samples ** 2)))
-                    rms_db = 20 * np.log10(max(rms, 1e-6))
-                    emit({"type": "log", "message": f"Mic RMS {rms_db:.1f} dBFS"})
-
-            stream.accept_waveform(args.sample_rate, samples)
-            current_chunks.append(samples)
-
-            # 先把当前缓存的音频解码出来，再做端点判定（与官方示例保持一致）
-            while first_pass.is_ready(stream):
-                first_pass.decode_stream(stream)
+            if stream_handle.finished.is_set() and ring.available() < samples_per_read:
+                if not ring.available():
+                    finish_source()
+                    break
+                # Last block of a finite source, shorter than a chunk: process it too
+                samples = ring.read(ring.available(), timeout=0)
+            else:
+                read_size = samples_per_read
+                if overload_guard is not None and overload_guard.active("long-chunks") and not stream_handle.finished.is_set():
+                    # Fewer, larger iterations: same model work, less per-chunk overhead
+                    read_size *= 2
+                samples = ring.read(read_size, timeout=read_timeout)
+            if samples is None:
+                # Device stalled (or is being reopened); re-check state instead of blocking
+                report_capture_stats()
+                continue
+            with state_lock:
+                # Control commands (stop, flush, device and mode switches) take this lock
+                # too, so they only ever see the state between two chunks
+                if not record_event.is_set():
+                    continue  # read before a stop landed; it belongs to no capture
+                last_chunk_at = time.monotonic()
+                if overload_guard is not None:
+                    load_chunk_seconds = len(samples) / args.sample_rate
+                if log_enabled("debug"):
+                    emit({"type": "log", "message": f"Mic chunk read: {len(samples)} samples"}, level="debug")
+                total_samples_seen += len(samples)
+                report_capture_stats()
+
+                # 简单能量监测，帮助判断是否采到声音
+                now_ts = total_samples_seen / args.sample_rate
+                if now_ts - energy_log_last_ts >= 0.8 and log_enabled("debug"):
+                    energy_log_last_ts = now_ts
+                    if samples.size:
+                        rms = float(np.sqrt(np.mean(samples ** 2)))
+                        rms_db = 20 * np.log10(max(rms, 1e-6))
+                        emit({"type": "log", "message": f"Mic RMS {rms_db:.1f} dBFS"}, level="debug")
+
+                if energy_gate is not None and get_mode() == "auto":
+                    was_open = energy_gate.is_open
+                    gated = energy_gate.process(samples)
+                    if gated is None:
+                        # 明显低于噪声底时不送模型；关门时按端点收尾
+                        if was_open:
+                            close_gate(total_samples_seen - len(samples))
+                        continue
+                    if not was_open:
+                        emit({"type": "log", "message": f"Energy gate opened ({len(gated)/args.sample_rate:.2f}s with pre-roll)"}, level="debug")
+                        if vad_feeder is not None:
+                            vad_feeder.reset(total_samples_seen - len(gated))
+                    samples = gated
+
+                if overload_guard is not None and not len(segment_buffer):
+                    # Between utterances: switch to (or back from) the greedy_search fallback
+                    wanted = primary_first_pass
+                    if overload_guard.active("greedy-search") and greedy_future is not None and greedy_future.done():
+                        wanted = greedy_future.result() or primary_first_pass
+                    if wanted is not first_pass:
+                        first_pass = wanted
+                        stream = first_pass.create_stream()
+                        stream_origin = None
+                        method = "greedy_search" if first_pass is not primary_first_pass else args.first_decoding_method
+                        emit({"type": "log", "message": f"1st pass decoding method: {method}"})
+                skip_first_pass = (
+                    overload_guard is not None and overload_guard.active("vad-only") and vad_feeder is not None and get_mode() == "auto"
+                )
 
-            # 更新第一遍文本（使用最新解码结果）
-            raw_partial = first_pass.get_result(stream)
-            partial = getattr(raw_partial, "text", raw_partial)
-            partial = str(partial or "").lower().strip()
-
-            if partial != last_partial:
-                emit({"type": "first-pass", "text": partial})
-                last_partial = partial
-
-            current_mode = get_mode()
-
-            # 当 partial 为空且没有 VAD 时，至少每 0.8s 发一次 keepalive，帮助 UI 判断流是否活着
-            # 避免“无日志以为挂掉”
-            if current_mode == "auto" and not partial and not vad and (total_samples_seen % int(args.sample_rate * 0.8) == 0):
-                emit({"type": "log", "message": "Keepalive: streaming, waiting for speech..."})
-
-            if current_mode == "auto":
-                if vad:
-                    vad_segmented = False
-                    try:
-                        # 使用 VAD 分割语音段
-                        window = vad_window_size or len(samples)
-                        offset = 0
-                        while offset < len(samples):
-                            end = min(offset + window, len(samples))
-                            vad.accept_waveform(samples[offset:end])
-                            offset = end
-
-                            while not vad.empty():
-                                segment = vad.front
-                                segment_start = segment.start  # in samples
-                                segment_audio = np.asarray(segment.samples, dtype=np.float32).reshape(-1)
+                if not skip_first_pass:
+                    if stream_origin is None:
+                        # samples may carry the energy gate's pre-roll, so count back from the chunk's end
+                        stream_origin = total_samples_seen - len(samples)
+                    if len(samples) < samples_per_read:
+                        # Zero-pad the short final block so the 1st pass has whole frames to decode
+                        stream.accept_waveform(args.sample_rate, np.pad(samples, (0, samples_per_read - len(samples))))
+                    else:
+                        stream.accept_waveform(args.sample_rate, samples)
+                if chunker is not None and get_mode() == "manual":
+                    # The chunker keeps the utterance's audio; only its length is needed here
+                    chunked_samples += len(samples)
+                else:
+                    segment_buffer.append(samples)
+
+                # 先把当前缓存的音频解码出来，再做端点判定（与官方示例保持一致）
+                decode_started = time.monotonic()
+                cpu_start = time.thread_time()
+                had_partial = bool(partials.sent_text)
+                if skip_first_pass:
+                    # 过载降级：第一遍不解码，只靠 VAD 分段
+                    partial = partials.text
+                else:
+                    while first_pass.is_ready(stream):
+                        first_pass.decode_stream(stream)
+
+                    # 更新第一遍文本（使用最新解码结果）
+                    partial = partials.update(first_pass, stream)
+                    latency.record("first_pass_decode_ms", (time.monotonic() - decode_started) * 1000.0)
+                cpu_seconds["first_pass"] += time.thread_time() - cpu_start
+
+                if partials.sent_text and not had_partial:
+                    # From the first voiced sample (first token) to the end of this chunk on the audio
+                    # timeline, plus the time spent on the chunk
+                    voiced_at = stream_origin + first_token_seconds(first_pass, stream) * args.sample_rate
+                    lag_ms = max(0.0, total_samples_seen - voiced_at) * 1000.0 / args.sample_rate
+                    latency.record("first_partial_ms", lag_ms + (time.monotonic() - last_chunk_at) * 1000.0)
+
+                current_mode = get_mode()
+
+                if speculator is not None and current_mode == "auto":
+                    if partial != watched_partial:
+                        # New tokens: speech resumed, so an in-flight speculation is stale
+                        watched_partial = partial
+                        partial_changed_at = total_samples_seen
+                        discard_speculation()
+                    elif (
+                        speculation is None
+                        and partial
+                        and total_samples_seen - partial_changed_at >= args.speculative_pause * args.sample_rate
+                    ):
+                        speculate()
+
+                # 当 partial 为空且没有 VAD 时，至少每 0.8s 发一次 keepalive，帮助 UI 判断流是否活着
+                # 避免“无日志以为挂掉”
+                if current_mode == "auto" and not partial and vad_feeder is None and (total_samples_seen % int(args.sample_rate * 0.8) == 0):
+                    emit({"type": "log", "message": "Keepalive: streaming, waiting for speech..."})
+
+                if current_mode == "auto":
+                    if vad_feeder is not None:
+                        vad_segmented = False
+                        cpu_start = time.thread_time()
+                        try:
+                            # 使用 VAD 分割语音段；整块送入，不足一个窗口的尾巴留到下一块
+                            for segment_start, segment_audio in vad_feeder.accept(samples):
                                 emit(
                                     {
                                         "type": "log",
@@ -887,31 +3927,40 @@ def main():
                                     }
                                 )
                                 finalize_segment(segment_audio, segment_start)
-                                vad.pop()
                                 vad_segmented = True
-                    except Exception as exc:  # pylint: disable=broad-except
-                        emit({"type": "log", "message": f"VAD processing error, disabling VAD: {exc}"})
-                        vad = None
-                    if vad_segmented:
+                        except Exception as exc:  # pylint: disable=broad-except
+                            emit({"type": "log", "message": f"VAD processing error, disabling VAD: {exc}"})
+                            vad_feeder = None
+                        cpu_seconds["vad"] += time.thread_time() - cpu_start
+                        if vad_segmented:
+                            continue
+                        if skip_first_pass and vad_feeder is not None:
+                            # 没有第一遍就没有端点；只保留 VAD 正在跟踪的语音，供 stop 时收尾
+                            if not vad_feeder.vad.is_speech_detected():
+                                segment_buffer.clear()
+                            continue
+                        # VAD 未切出段时，回退到端点检测，避免漏段
+
+                    # 端点检测放在获取最新 partial 之后，避免用到旧结果
+                    is_endpoint = first_pass.is_endpoint(stream)
+
+                    if not is_endpoint:
+                        # 跳过非端点帧，便于调试时在日志中观察判定过程
                         continue
-                    # VAD 未切出段时，回退到端点检测，避免漏段
-
-                # 端点检测放在获取最新 partial 之后，避免用到旧结果
-                is_endpoint = first_pass.is_endpoint(stream)
-
-                if not is_endpoint:
-                    # 跳过非端点帧，便于调试时在日志中观察判定过程
-                    continue
 
-                # Endpoint detected - 获取最终的 partial 用于第二遍
-                emit({"type": "log", "message": f"Endpoint detected with partial='{partial}'"})
-                chunk_audio = np.concatenate(current_chunks) if current_chunks else np.zeros(0, dtype=np.float32)
-                start_sample = max(0, total_samples_seen - len(chunk_audio))
-                emit({"type": "log", "message": f"Endpoint detected, flushing {len(chunk_audio)/args.sample_rate:.2f}s audio"})
-                finalize_segment(chunk_audio, start_sample)
-            else:
-                # 手动模式下不自动分段，等待 stop 指令触发 finalize
-                pass
+                    # Endpoint detected - 获取最终的 partial 用于第二遍
+                    emit({"type": "log", "message": f"Endpoint detected with partial='{partial}'"})
+                    chunk_audio = segment_buffer.detach()
+                    start_sample = max(0, total_samples_seen - len(chunk_audio))
+                    emit({"type": "log", "message": f"Endpoint detected, flushing {len(chunk_audio)/args.sample_rate:.2f}s audio"})
+                    finalize_segment(chunk_audio, start_sample)
+                elif chunker is not None:
+                    # 手动模式下不按端点分段；长录音边录边切块送第二遍，stop 时只剩最后一块
+                    for piece in chunker.feed(samples):
+                        enqueue_segment(*piece, time.monotonic())
+                else:
+                    # 手动模式下不自动分段，等待 stop 指令触发 finalize
+                    pass
     except KeyboardInterrupt:
         emit({"type": "complete", "message": "Interrupted by user"})
     except Exception as exc:  # pylint: disable=broad-except
@@ -923,6 +3972,14 @@ def main():
         except Exception:
             pass
         decoder_thread.join(timeout=2)
+        decode_queue.close()
+        if speculator is not None:
+            speculator.shutdown(wait=False)
+        summary = latency.summary()
+        if summary["stages"]:
+            emit({"type": "metrics", "name": "latency", **summary})
+        if energy_gate is not None:
+            emit({"type": "metrics", "name": "energy-gate", **gate_stats()})
         stop_audio_stream("shutdown")
 
 